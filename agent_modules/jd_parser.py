@@ -1,13 +1,28 @@
 # Author: Peng Fei
 # JD parser agent for intelligent job description analysis
 
+import threading
+from typing import Optional
 from agents import Agent
 from tools.llm_tools import LLMTools
 from tools.formatter import format_output
+from tools.chunked_extraction import ChunkedExtractor
+from tools.skill_taxonomy import get_skill_index, normalize_requirements
+from tools.token_estimator import estimate_tokens, fits_in_context
+from config.settings import (
+    CHUNKED_EXTRACTION_ENABLED, CHUNKED_EXTRACTION_THRESHOLD_TOKENS, CHUNK_MAX_TOKENS, CHUNK_MAX_WORKERS
+)
 
 class JDParserAgent:
     def __init__(self):
         self.llm_tools = LLMTools()
+        self.chunked_extractor = ChunkedExtractor(
+            self.llm_tools,
+            max_chunk_tokens=CHUNK_MAX_TOKENS,
+            max_workers=CHUNK_MAX_WORKERS
+        )
+        # Map the skill index at startup rather than on the first request
+        get_skill_index()
         
         self.agent = Agent(
             name="jd_parser",
@@ -34,9 +49,35 @@ class JDParserAgent:
             dict: Standardized job requirements JSON
         """
         # Use LLM to parse job description
-        parsed_data = self.llm_tools.parse_job_description(jd_text)
+        parsed_data = self.extract(jd_text)
         
         # Format output
         formatted_output = format_output(parsed_data, session_id)
         
-        return formatted_output 
\ No newline at end of file
+        return formatted_output
+    
+    def extract(self, jd_text: str, cancel_event: threading.Event = None) -> Optional[dict]:
+        """
+        Extract requirements without formatting; very long inputs are split and extracted in parallel
+        
+        Skills are canonicalized and deduplicated against the local skill taxonomy.
+        
+        Args:
+            jd_text: Job description text
+            cancel_event: Optional event that cancels a speculative extraction
+            
+        Returns:
+            dict: Parsed requirements, or None if cancelled
+        """
+        if self.use_chunked_extraction(jd_text):
+            parsed_data = self.chunked_extractor.extract(jd_text, cancel_event)
+        else:
+            parsed_data = self.llm_tools.parse_job_description(jd_text, cancel_event)
+        return normalize_requirements(parsed_data)
+    
+    def use_chunked_extraction(self, jd_text: str) -> bool:
+        """Whether a job description is long enough for map-reduce extraction"""
+        # Inputs that cannot fit a single parse call are always chunked
+        if not fits_in_context("parse", jd_text):
+            return True
+        return CHUNKED_EXTRACTION_ENABLED and estimate_tokens(jd_text) > CHUNKED_EXTRACTION_THRESHOLD_TOKENS
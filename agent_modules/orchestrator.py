@@ -1,17 +1,45 @@
 # Author: Peng Fei
 # Orchestrator agent for job requirement generation system
 
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from agents import Agent
 from tools.llm_tools import LLMTools
 from tools.streaming_llm import StreamingLLMTools
 from agent_modules.jd_parser import JDParserAgent
-from typing import AsyncGenerator, Dict, Any
+from config.settings import (
+    CHUNK_COALESCE_WINDOW_MS, CHUNK_COALESCE_MAX_BYTES,
+    COMPACTION_ENABLED, COMPACTION_STRIP_BOILERPLATE, COMPACTION_MAX_CHARS,
+    SPECULATION_POLICY, SPECULATION_MIN_CHARS, SPECULATION_MAX_WORKERS,
+    RESULT_STORE_MAX_ENTRIES, RESULT_STORE_PERSIST_PATH, DEGRADED_FALLBACK_ENABLED,
+    FAST_MODE_AUTO_ENABLED, FAST_MODE_DEFAULT_LLM_P50_MS, NEAR_DUPLICATE_ENABLED, NEAR_DUPLICATE_REUSE_SIMILARITY, NEAR_DUPLICATE_VERIFY_SIMILARITY
+)
+from tools.formatter import format_output
+from tools.local_extractor import extract_requirements, find_skills, find_years_of_experience
+from tools.skill_taxonomy import get_skill_index, normalize_requirements
+from tools.text_compactor import compact_job_description
+from tools.token_estimator import estimate_tokens
+from utils.admission import upstream_latency
+from utils.circuit_breaker import CircuitOpenError
+from utils.event_coalescer import coalesce_chunks
+from utils.metrics import metrics
+from utils.result_store import ResultStore, content_hash
+from utils.session_manager import SessionManager
+from utils.usage_tracker import in_current_context, usage_tracker
+from typing import AsyncGenerator, Dict, Any, Optional
 
 class OrchestratorAgent:
-    def __init__(self):
+    def __init__(self, session_manager: SessionManager = None):
         self.llm_tools = LLMTools()
+        self.session_manager = session_manager or SessionManager()
         self.streaming_llm = StreamingLLMTools()
         self.jd_parser = JDParserAgent()
+        self.speculation_executor = ThreadPoolExecutor(max_workers=SPECULATION_MAX_WORKERS)
+        self.result_store = ResultStore(max_entries=RESULT_STORE_MAX_ENTRIES, store_path=RESULT_STORE_PERSIST_PATH)
         
         self.agent = Agent(
             name="orchestrator",
@@ -26,49 +54,191 @@ class OrchestratorAgent:
             tools=[self.llm_tools.determine_scenario, self.handoff_to_jd_parser]
         )
     
-    def process_input(self, user_input: str, session_id: str = None) -> dict:
+    def process_input(self, user_input: str, session_id: str = None, mode: str = "full") -> dict:
         """
         Process user input and determine next steps (synchronous version)
         
         Args:
             user_input: User's job description or conversation
             session_id: Session identifier
+            mode: "full" for the LLM pipeline, "fast" for local extraction only
             
         Returns:
             dict: Processed result or questions for further conversation
         """
+        # Strip boilerplate locally so no LLM call pays for it
+        user_input = self._compact_input(user_input)["text"]
+        
+        if mode == "fast":
+            fast = self._fast_result(user_input)
+            return {"session_id": session_id or "", "requirements": fast["requirements"], "fast": fast["fast"]}
+        
+        # With the upstream down, answer at once instead of waiting for calls that will fail
+        if self._upstream_down("parse"):
+            return self._degraded_response(user_input, session_id)
+        try:
+            return self._process_compacted_input(user_input, session_id)
+        except CircuitOpenError:
+            if not DEGRADED_FALLBACK_ENABLED:
+                raise
+            return self._degraded_response(user_input, session_id)
+    
+    def _process_compacted_input(self, user_input: str, session_id: str = None) -> dict:
+        """Reuse, classify and parse an already compacted input"""
+        # Reposted JDs reuse the earlier result instead of running the pipeline again
+        reused = self._find_previous_result(user_input)
+        if reused:
+            return {"session_id": session_id or "", "requirements": reused["requirements"]}
+        
+        if self._should_speculate(user_input):
+            return self._process_speculatively(user_input, session_id)
+        
         # Use LLM to determine scenario
         scenario = self.llm_tools.determine_scenario(user_input)
         
         if scenario == "detailed_jd":
             # Route to JD parser
-            return self.jd_parser.parse_jd(user_input, session_id)
+            result = self.jd_parser.parse_jd(user_input, session_id)
+            self._remember_result(user_input, result.get("requirements"))
+            return result
         else:
             # Generate questions for conversation
-            return self.llm_tools.generate_questions()
+            return self._start_conversation(session_id)
     
-    async def process_input_stream(self, user_input: str, session_id: str = None) -> AsyncGenerator[Dict[str, Any], None]:
+    def process_user_response(self, session_id: str, response: str, question: str = None) -> dict:
+        """
+        Apply a user's answer to the session's conversation state
+        
+        Args:
+            session_id: Session identifier returned with the questions
+            response: User's answer, e.g. "What is the primary role type?:Technical/Engineering;"
+            question: Question being answered, when known
+            
+        Returns:
+            dict: Final requirements when complete, otherwise the next questions
+            
+        Raises:
+            ValueError: The session is already closed, its requirements are final
+        """
+        if self.session_manager.get_session(session_id).get("status") == "closed":
+            raise ValueError(f"Session {session_id} is closed")
+        conversation = self.session_manager.get_conversation(session_id)
+        if not conversation:
+            session_id = self._open_session(session_id)
+            conversation = self.session_manager.get_conversation(session_id)
+        
+        # Each turn's tokens add up on the session
+        with usage_tracker.scope(session_id=session_id):
+            result = self.llm_tools.parse_user_response(response, conversation["requirements"], question)
+            conversation["requirements"] = normalize_requirements(result["updated_info"])
+            conversation["turns"] += 1
+            
+            if result.get("is_complete"):
+                self.session_manager.close_session(session_id)
+                return {"session_id": session_id, "requirements": conversation["requirements"]}
+            
+            questions = self.llm_tools.generate_questions(conversation["requirements"])
+            questions["session_id"] = session_id
+            return questions
+    
+    def _start_conversation(self, session_id: str = None) -> dict:
+        """Open a conversation session and return its opening questions"""
+        session_id = self._open_session(session_id)
+        usage_tracker.set_session(session_id)
+        questions = self.llm_tools.generate_questions()
+        questions["session_id"] = session_id
+        return questions
+    
+    def _open_session(self, session_id: str = None) -> str:
+        """Reuse a known session or create a new one"""
+        if session_id and self.session_manager.get_session(session_id):
+            return session_id
+        return self.session_manager.create_session()
+    
+    async def process_input_stream(
+        self,
+        user_input: str,
+        session_id: str = None,
+        chunk_window_ms: Optional[float] = None,
+        chunk_max_bytes: Optional[int] = None,
+        mode: str = "full",
+        stream_content: bool = False
+    ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         Process user input with streaming output (asynchronous version)
         
         Args:
             user_input: User's job description or conversation
             session_id: Session identifier
+            chunk_window_ms: Coalescing window for content chunks (0 disables)
+            chunk_max_bytes: Coalesced chunk size that forces a flush
+            mode: "full" for the LLM pipeline, "fast" for local extraction only
+            stream_content: Also yield the parse's token-level output as content_chunk events
             
         Yields:
             Dict: Streaming processing results
         """
+        partial_result = None
+        compaction_stats = None
         try:
+            compaction = self._compact_input(user_input)
+            user_input = compaction["text"]
+            compaction_stats = {key: value for key, value in compaction.items() if key != "text"}
+            
             # Step 1: Start processing
             yield {
                 "event": "progress",
                 "data": {
                     "step": "started",
                     "message": "Starting job description analysis...",
-                    "progress": 5
+                    "progress": 5,
+                    "compaction": compaction_stats
                 }
             }
             
+            if mode == "fast":
+                yield self._fast_complete(user_input, session_id, compaction_stats)
+                return
+            
+            if self._upstream_down("stream_parse"):
+                yield self._degraded_complete(user_input, session_id, compaction_stats)
+                return
+            
+            # Reposted JDs reuse the earlier result; a verification call may block, so run it off the loop
+            reused = await asyncio.get_running_loop().run_in_executor(
+                None, in_current_context(self._find_previous_result), user_input
+            )
+            if reused:
+                yield {
+                    "event": "complete",
+                    "data": {
+                        "step": "complete",
+                        "message": "Reused the result of a matching job description",
+                        "progress": 100,
+                        "result": {"session_id": session_id or "", "requirements": reused["requirements"]},
+                        "compaction": compaction_stats,
+                        "content_hash": reused["content_hash"],
+                        "reused": {key: reused[key] for key in ("content_hash", "similarity", "verified")}
+                    }
+                }
+                return
+            
+            # Route by scenario: vague input starts a conversation instead of a parse
+            scenario = await self._determine_stream_scenario(user_input)
+            yield {
+                "event": "progress",
+                "data": {
+                    "step": "scenario_determined",
+                    "message": f"Scenario: {scenario}",
+                    "progress": 8,
+                    "scenario": scenario
+                }
+            }
+            if scenario != "detailed_jd":
+                async for event in self._stream_conversation_start(session_id, compaction_stats):
+                    yield event
+                return
+            
             # Step 2: Parse job description with real-time result building
             yield {
                 "event": "progress",
@@ -94,50 +264,133 @@ class OrchestratorAgent:
                 }
             }
             
-            # Stream JD parsing with partial result updates
-            parsed_data = {}
-            async for parse_chunk in self.streaming_llm.stream_parse_job_description(user_input):
-                if parse_chunk["type"] == "section_complete":
-                    section = parse_chunk["section"]
-                    content = parse_chunk["content"]
-                    parsed_data[section] = content
-                    
-                    # Update partial result based on section
-                    if section == "title":
-                        partial_result["requirements"]["title"] = content
-                    elif section == "description":
-                        partial_result["requirements"]["description"] = content
-                    elif section == "technical_skills":
-                        partial_result["requirements"]["must_have"]["technical_skills"] = content if isinstance(content, list) else []
-                    elif section == "domain_experience":
-                        partial_result["requirements"]["must_have"]["domain_experience"] = content if isinstance(content, list) else []
-                    elif section == "soft_skills":
-                        partial_result["requirements"]["must_have"]["soft_skills"] = content if isinstance(content, list) else []
-                    elif section == "nice_to_have":
-                        partial_result["requirements"]["nice_to_have"] = content if isinstance(content, list) else []
-                    
-                    # Yield partial result update
+            # Set when the parse stream ends early; what was extracted so far is only kept as partial
+            stream_failure = None
+            if self.jd_parser.use_chunked_extraction(user_input):
+                # Very long input: extract section chunks in parallel and stream the merged result
+                async for chunk_result in self.jd_parser.chunked_extractor.extract_stream(user_input):
+                    partial_result["requirements"] = normalize_requirements(chunk_result["requirements"])
                     yield {
                         "event": "partial_result",
                         "data": {
                             "step": "parsing",
-                            "message": f"Completed analysis of {section}",
-                            "progress": 20 + (len(parsed_data) * 15),
+                            "message": f"Completed chunk {chunk_result['completed']} of {chunk_result['total']}",
+                            "progress": 20 + int(70 * chunk_result["completed"] / chunk_result["total"]),
                             "partial_result": partial_result.copy(),
-                            "completed_section": section
+                            "completed_chunk": chunk_result["chunk"]
                         }
                     }
                 
-                elif parse_chunk["type"] == "analysis_complete":
-                    yield {
-                        "event": "progress",
-                        "data": {
-                            "step": "formatting",
-                            "message": "Finalizing results...",
-                            "progress": 90
+                yield {
+                    "event": "progress",
+                    "data": {
+                        "step": "formatting",
+                        "message": "Finalizing results...",
+                        "progress": 90
+                    }
+                }
+            else:
+                # Stream JD parsing with partial result updates; token-level chunks are batched
+                # and forwarded only on request, since they are not part of the default protocol
+                parsed_data = {}
+                saw_complete = False
+                window_ms = CHUNK_COALESCE_WINDOW_MS if chunk_window_ms is None else chunk_window_ms
+                parse_stream = coalesce_chunks(
+                    self.streaming_llm.stream_parse_job_description(user_input),
+                    window_ms=window_ms if stream_content else 0,
+                    max_bytes=chunk_max_bytes or CHUNK_COALESCE_MAX_BYTES
+                )
+                async for parse_chunk in parse_stream:
+                    if parse_chunk["type"] == "content_chunk":
+                        if not stream_content:
+                            continue
+                        yield {
+                            "event": "content_chunk",
+                            "data": {
+                                "step": "parsing",
+                                "message": parse_chunk["message"],
+                                "content": parse_chunk["content"]
+                            }
+                        }
+                
+                    elif parse_chunk["type"] == "section_complete":
+                        section = parse_chunk["section"]
+                        content = parse_chunk["content"]
+                        parsed_data[section] = content
+                    
+                        # Update partial result based on section
+                        if section == "title":
+                            partial_result["requirements"]["title"] = content
+                        elif section == "description":
+                            partial_result["requirements"]["description"] = content
+                        elif section == "technical_skills":
+                            partial_result["requirements"]["must_have"]["technical_skills"] = content if isinstance(content, list) else []
+                        elif section == "domain_experience":
+                            partial_result["requirements"]["must_have"]["domain_experience"] = content if isinstance(content, list) else []
+                        elif section == "soft_skills":
+                            partial_result["requirements"]["must_have"]["soft_skills"] = content if isinstance(content, list) else []
+                        elif section == "nice_to_have":
+                            partial_result["requirements"]["nice_to_have"] = content if isinstance(content, list) else []
+                    
+                        # Canonicalize skills locally so partial results are already deduplicated
+                        partial_result["requirements"] = normalize_requirements(partial_result["requirements"])
+                    
+                        # Yield partial result update
+                        yield {
+                            "event": "partial_result",
+                            "data": {
+                                "step": "parsing",
+                                "message": f"Completed analysis of {section}",
+                                "progress": 20 + (len(parsed_data) * 15),
+                                "partial_result": partial_result.copy(),
+                                "completed_section": section
+                            }
+                        }
+                
+                    elif parse_chunk["type"] == "error":
+                        if not parsed_data and self._upstream_down("stream_parse"):
+                            # The circuit opened before anything was parsed
+                            yield self._degraded_complete(user_input, session_id, compaction_stats)
+                            return
+                        stream_failure = parse_chunk.get("message") or "Job description analysis failed"
+                        break
+                
+                    elif parse_chunk["type"] == "analysis_complete":
+                        saw_complete = True
+                        yield {
+                            "event": "progress",
+                            "data": {
+                                "step": "formatting",
+                                "message": "Finalizing results...",
+                                "progress": 90
+                            }
                         }
+                        break
+                
+                if not saw_complete and stream_failure is None:
+                    stream_failure = "Job description analysis ended before it completed"
+            
+            if stream_failure is not None:
+                # Never served as a finished result; a retry reuses it only to fill the gaps
+                self._remember_result(user_input, partial_result["requirements"], partial=True)
+                metrics.increment("stream.incomplete_parses")
+                yield {
+                    "event": "complete",
+                    "data": {
+                        "step": "complete",
+                        "message": f"Job description processing incomplete: {stream_failure}",
+                        "progress": 100,
+                        "result": partial_result,
+                        "scenario": scenario,
+                        "compaction": compaction_stats,
+                        "content_hash": None,
+                        "incomplete": True,
+                        "error": stream_failure
                     }
-                    break
+                }
+                return
+            
+            content_hash = self._remember_result(user_input, partial_result["requirements"])
             
             # Final result
             yield {
@@ -146,9 +399,27 @@ class OrchestratorAgent:
                     "step": "complete",
                     "message": "Job description processing completed",
                     "progress": 100,
-                    "result": partial_result
+                    "result": partial_result,
+                    "scenario": scenario,
+                    "compaction": compaction_stats,
+                    "content_hash": content_hash
                 }
             }
+        
+        except CircuitOpenError as e:
+            if DEGRADED_FALLBACK_ENABLED:
+                yield self._degraded_complete(user_input, session_id, compaction_stats)
+            else:
+                yield {
+                    "event": "error",
+                    "data": {"step": "error", "message": f"Error during processing: {str(e)}", "progress": 0, "error": True}
+                }
+        
+        except asyncio.CancelledError:
+            # Cut off mid-parse, e.g. at a shutdown drain deadline: keep what was extracted so a retry only fills the gaps
+            if partial_result is not None:
+                self._remember_result(user_input, partial_result["requirements"], partial=True)
+            raise
                 
         except Exception as e:
             yield {
@@ -161,6 +432,401 @@ class OrchestratorAgent:
                 }
             }
     
+    def choose_mode(self, mode: Optional[str] = None, latency_budget_ms: Optional[float] = None) -> str:
+        """
+        Decide between the LLM pipeline and local extraction for a request
+        
+        An explicit mode wins. Otherwise a latency budget below the recent median LLM call
+        latency selects fast mode, since even one model call would likely overrun it.
+        
+        Args:
+            mode: Requested mode ("fast" or "full"), or None to decide from the budget
+            latency_budget_ms: Time the caller can wait for the result
+            
+        Returns:
+            str: "fast" or "full"
+        """
+        if mode in ("fast", "full"):
+            if mode == "fast":
+                metrics.increment("fast_mode.requests", labels={"reason": "requested"})
+            return mode
+        if latency_budget_ms is None or not FAST_MODE_AUTO_ENABLED:
+            return "full"
+        p50 = upstream_latency.percentile(0.5)
+        llm_p50_ms = p50 * 1000 if p50 is not None else FAST_MODE_DEFAULT_LLM_P50_MS
+        if latency_budget_ms < llm_p50_ms:
+            metrics.increment("fast_mode.requests", labels={"reason": "latency_budget"})
+            return "fast"
+        return "full"
+    
+    def _fast_result(self, user_input: str) -> Dict[str, Any]:
+        """
+        Requirements for fast mode: a stored result of the exact same JD, else local extraction
+        
+        Near-duplicate matching is skipped; it may need a verification call.
+        
+        Args:
+            user_input: Compacted user input
+            
+        Returns:
+            Dict: requirements, content_hash (stored results only) and the fast-mode marker
+        """
+        started = time.perf_counter()
+        key = content_hash(user_input)
+        stored = self.result_store.get(key)
+        if stored is not None and not stored.get("partial"):
+            requirements, source, stored_hash = stored["requirements"], "stored_result", key
+        else:
+            # Lower fidelity than the LLM, so never stored for reuse by full-mode requests
+            requirements = normalize_requirements(extract_requirements(user_input))
+            source, stored_hash = "local_extractor", None
+        seconds = time.perf_counter() - started
+        metrics.observe("fast_mode.extraction_seconds", seconds, {"source": source})
+        return {
+            "requirements": requirements,
+            "content_hash": stored_hash,
+            "fast": {"source": source, "elapsed_ms": round(seconds * 1000, 2)}
+        }
+    
+    def _fast_complete(
+        self,
+        user_input: str,
+        session_id: str = None,
+        compaction_stats: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """Complete event carrying a fast-mode result"""
+        fast = self._fast_result(user_input)
+        return {
+            "event": "complete",
+            "data": {
+                "step": "complete",
+                "message": "Job description extracted locally in fast mode",
+                "progress": 100,
+                "result": {"session_id": session_id or "", "requirements": fast["requirements"]},
+                "scenario": "detailed_jd",
+                "compaction": compaction_stats,
+                "content_hash": fast["content_hash"],
+                "mode": "fast",
+                "fast": fast["fast"]
+            }
+        }
+    
+    def _upstream_down(self, stage: str) -> bool:
+        """Whether a stage should be served degraded because every model in its chain has an open circuit"""
+        return DEGRADED_FALLBACK_ENABLED and not self.llm_tools.router.available(stage)
+    
+    def _degraded_result(self, user_input: str) -> Dict[str, Any]:
+        """
+        Requirements produced without any model call, for when the upstream is unavailable
+        
+        A stored result for the same or a similar JD is preferred, used as is even where
+        it would normally be verified; otherwise requirements are extracted locally.
+        
+        Args:
+            user_input: Compacted user input
+            
+        Returns:
+            Dict: requirements, content_hash (stored results only) and the degraded marker
+        """
+        match = self.result_store.find(user_input, NEAR_DUPLICATE_VERIFY_SIMILARITY) if NEAR_DUPLICATE_ENABLED else None
+        if match is not None:
+            metrics.increment("degraded.responses", labels={"source": "stored_result"})
+            return {
+                "requirements": match["requirements"],
+                "content_hash": None if match.get("partial") else match["content_hash"],
+                "degraded": {
+                    "reason": "upstream_unavailable",
+                    "source": "stored_result",
+                    "similarity": round(match["similarity"], 3),
+                    "partial": bool(match.get("partial"))
+                }
+            }
+        metrics.increment("degraded.responses", labels={"source": "local_extractor"})
+        return {
+            # Local extractions are never stored, so they cannot be reused once the upstream is back
+            "requirements": normalize_requirements(extract_requirements(user_input)),
+            "content_hash": None,
+            "degraded": {"reason": "upstream_unavailable", "source": "local_extractor"}
+        }
+    
+    def _degraded_response(self, user_input: str, session_id: str = None) -> dict:
+        """Degraded result in the shape process_input returns"""
+        degraded = self._degraded_result(user_input)
+        return {"session_id": session_id or "", "requirements": degraded["requirements"], "degraded": degraded["degraded"]}
+    
+    def _degraded_complete(
+        self,
+        user_input: str,
+        session_id: str = None,
+        compaction_stats: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """Complete event carrying a degraded result"""
+        degraded = self._degraded_result(user_input)
+        return {
+            "event": "complete",
+            "data": {
+                "step": "complete",
+                "message": "Upstream model unavailable; served a degraded result",
+                "progress": 100,
+                "result": {
+                    "session_id": session_id or "",
+                    "requirements": degraded["requirements"],
+                    "degraded": degraded["degraded"]
+                },
+                "scenario": "detailed_jd",
+                "compaction": compaction_stats,
+                "content_hash": degraded["content_hash"],
+                "degraded": degraded["degraded"]
+            }
+        }
+    
+    async def _determine_stream_scenario(self, user_input: str) -> str:
+        """Classify the input for the streaming path without blocking the event loop"""
+        if self.jd_parser.use_chunked_extraction(user_input):
+            # Input long enough to need chunking is never a vague request
+            return "detailed_jd"
+        return await asyncio.get_running_loop().run_in_executor(
+            None, in_current_context(self.llm_tools.determine_scenario), user_input
+        )
+    
+    async def _stream_conversation_start(
+        self,
+        session_id: str = None,
+        compaction_stats: Dict[str, Any] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Open a conversation session and stream its opening questions one by one
+        
+        Args:
+            session_id: Session identifier
+            compaction_stats: Input compaction statistics for the complete event
+            
+        Yields:
+            Dict: A "question" event per question as soon as it is generated, then the complete event
+        """
+        session_id = self._open_session(session_id)
+        usage_tracker.set_session(session_id)
+        yield {
+            "event": "progress",
+            "data": {
+                "step": "questions",
+                "message": "Generating questions...",
+                "progress": 10,
+                "session_id": session_id
+            }
+        }
+        
+        questions = None
+        async for question_chunk in self.streaming_llm.stream_generate_questions():
+            if question_chunk["type"] == "question":
+                yield {
+                    "event": "question",
+                    "data": {
+                        "step": "questions",
+                        "message": f"Question {question_chunk['index'] + 1} ready",
+                        "session_id": session_id,
+                        "index": question_chunk["index"],
+                        "question": question_chunk["question"]
+                    }
+                }
+            elif question_chunk["type"] == "questions_complete":
+                questions = question_chunk["questions"]
+            elif question_chunk["type"] == "error":
+                raise RuntimeError(question_chunk["message"])
+        
+        questions = dict(questions or self.streaming_llm._get_default_questions(), session_id=session_id)
+        yield {
+            "event": "complete",
+            "data": {
+                "step": "complete",
+                "message": "Questions generated; answer them to complete the requirements",
+                "progress": 100,
+                "result": questions,
+                "scenario": "need_conversation",
+                "compaction": compaction_stats,
+                # Questions are not a cacheable result
+                "content_hash": None
+            }
+        }
+    
+    def _should_speculate(self, user_input: str) -> bool:
+        """Whether to start extraction before the scenario is known"""
+        if SPECULATION_POLICY == "always":
+            return True
+        if SPECULATION_POLICY == "length":
+            return len(user_input) >= SPECULATION_MIN_CHARS
+        return False
+    
+    def _process_speculatively(self, user_input: str, session_id: str = None) -> dict:
+        """
+        Classify and extract concurrently; cancel the extraction if no detailed JD
+        
+        Args:
+            user_input: Compacted user input
+            session_id: Session identifier
+            
+        Returns:
+            dict: Processed result or questions for further conversation
+        """
+        cancel_event = threading.Event()
+        extraction = self.speculation_executor.submit(in_current_context(self.jd_parser.extract), user_input, cancel_event)
+        metrics.increment("speculation.started")
+        
+        try:
+            scenario = self.llm_tools.determine_scenario(user_input)
+        except Exception:
+            cancel_event.set()
+            raise
+        
+        if scenario == "detailed_jd":
+            metrics.increment("speculation.used")
+            self._record_speculation_rate()
+            result = format_output(extraction.result(), session_id)
+            self._remember_result(user_input, result.get("requirements"))
+            return result
+        
+        # Stop the upstream generation mid-flight; the worker records the wasted tokens
+        cancel_event.set()
+        extraction.add_done_callback(lambda _: self._record_speculation_rate())
+        return self._start_conversation(session_id)
+    
+    def _record_speculation_rate(self):
+        """Publish the share of speculative runs and tokens that were thrown away"""
+        counters = metrics.snapshot()["counters"]
+        
+        def total(prefix: str) -> float:
+            return sum(value for key, value in counters.items() if key == prefix or key.startswith(prefix + "{"))
+        
+        if total("speculation.started"):
+            metrics.set_gauge("speculation.cancelled_rate", total("speculation.cancelled") / total("speculation.started"))
+        if total("speculation.tokens"):
+            metrics.set_gauge("speculation.wasted_token_rate", total("speculation.wasted_tokens") / total("speculation.tokens"))
+    
+    def _find_previous_result(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up requirements stored for an identical or near-duplicate job description
+        
+        Matches above NEAR_DUPLICATE_REUSE_SIMILARITY are returned as stored, unless a
+        local diff shows a skill or year count they do not cover. Weaker matches, and
+        those, seed a verification call that only returns what differs.
+        
+        Args:
+            user_input: Compacted user input
+            
+        Returns:
+            Dict: Requirements, content hash, similarity and whether they were verified, or None
+        """
+        if not NEAR_DUPLICATE_ENABLED:
+            return None
+        
+        match = self.result_store.find(user_input, NEAR_DUPLICATE_VERIFY_SIMILARITY)
+        if match is None:
+            metrics.increment("result_reuse.misses")
+            return None
+        
+        requirements = match["requirements"]
+        content_hash = match["content_hash"]
+        # A cut-off extraction is completed by a verification call instead of a full parse
+        verified = match.get("partial") or not match["exact"] and (
+            match["similarity"] < NEAR_DUPLICATE_REUSE_SIMILARITY or self._differs_from_stored(user_input, requirements)
+        )
+        if verified:
+            requirements = normalize_requirements(self.llm_tools.verify_requirements(user_input, requirements))
+            content_hash = self.result_store.put(user_input, requirements)
+        
+        kind = "resumed" if match.get("partial") else "exact" if match["exact"] else "verified" if verified else "near"
+        metrics.increment("result_reuse.hits", labels={"kind": kind})
+        return {
+            "requirements": requirements,
+            "content_hash": content_hash,
+            "similarity": round(match["similarity"], 3),
+            "verified": verified
+        }
+    
+    def _differs_from_stored(self, user_input: str, requirements: Dict[str, Any]) -> bool:
+        """
+        Whether a near-duplicate JD asks for skills or years its stored requirements do not match
+        
+        A long JD still scores a high similarity when one skill or one number changed, so
+        the skills and years of experience found locally are compared with the stored result.
+        
+        Args:
+            user_input: Compacted user input
+            requirements: Requirements stored for the near-duplicate
+            
+        Returns:
+            bool: True when the stored result must be verified before reuse
+        """
+        stored_text = json.dumps(requirements, ensure_ascii=False).lower()
+        stored_numbers = set(re.findall(r"\d+", stored_text))
+        for phrase in find_years_of_experience(user_input):
+            if not set(re.findall(r"\d+", phrase.split(" years", 1)[0])) <= stored_numbers:
+                return True
+        
+        found = {name for name, _ in find_skills(user_input)}
+        if any(name.lower() not in stored_text for name in found):
+            return True
+        # A known skill in the stored result that this JD no longer mentions
+        must_have = requirements.get("must_have") or {}
+        items = [item for values in must_have.values() if isinstance(values, list) for item in values]
+        items += [item for item in requirements.get("nice_to_have") or [] if isinstance(item, str)]
+        index = get_skill_index()
+        for item in items:
+            match = index.match_exact(item) if isinstance(item, str) else None
+            if match and match[0] not in found:
+                return True
+        return False
+    
+    def _remember_result(
+        self,
+        user_input: str,
+        requirements: Optional[Dict[str, Any]],
+        partial: bool = False
+    ) -> Optional[str]:
+        """
+        Store extracted requirements so reposts of this JD can reuse them and clients can fetch them by hash
+        
+        Args:
+            user_input: Compacted user input
+            requirements: Extracted requirements
+            partial: The extraction was cut off before it finished
+        
+        Returns:
+            str: Content hash the result is stored under, or None if it was not worth storing
+        """
+        if not requirements:
+            return None
+        must_have = requirements.get("must_have") or {}
+        # Empty or failed extractions are not worth reusing
+        if requirements.get("title") or any(must_have.values()):
+            return self.result_store.put(user_input, requirements, partial=partial)
+        return None
+    
+    def _compact_input(self, user_input: str) -> Dict[str, Any]:
+        """
+        Compact user input before any prompt is built and record tokens saved
+        
+        Args:
+            user_input: Raw user input
+            
+        Returns:
+            Dict: Compacted text and token statistics
+        """
+        if not COMPACTION_ENABLED:
+            tokens = estimate_tokens(user_input)
+            return {"text": user_input, "original_tokens": tokens, "compacted_tokens": tokens, "tokens_saved": 0, "truncated": False}
+        
+        compaction = compact_job_description(
+            user_input,
+            strip_boilerplate_blocks=COMPACTION_STRIP_BOILERPLATE,
+            max_chars=COMPACTION_MAX_CHARS
+        )
+        metrics.observe("compaction.tokens_saved_per_request", compaction["tokens_saved"])
+        metrics.increment("compaction.tokens_saved", compaction["tokens_saved"])
+        if compaction["truncated"]:
+            metrics.increment("compaction.truncated_requests")
+        return compaction
+    
     def _format_parsed_data(self, parsed_data: Dict[str, Any], session_id: str = None) -> Dict[str, Any]:
         """
         Format parsed data into final result structure
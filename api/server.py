@@ -24,7 +24,16 @@ def run_server():
     print(f"Starting FastAPI SSE server on {host}:{port}")
     print("Available endpoints:")
     print("  POST /api/process-jd - Stream job description processing")
+    print("  POST /api/jobs       - Enqueue job description processing")
+    print("  GET  /api/jobs/{id}  - Job status and result")
+    print("  GET  /api/jobs/{id}/events - Job progress stream")
+    print("  GET  /api/results/{hash} - Cacheable final requirements")
     print("  GET  /api/health     - Health check")
+    print("  GET  /api/ready      - Readiness (503 while draining)")
+    print("  GET  /api/metrics    - Service metrics")
+    print("  GET  /api/routing    - Per-stage model latency and cost")
+    print("  GET  /api/usage      - Token usage and cost per client and session")
+    print("  GET  /api/debug/profile?seconds=N - Admin-only sampling profile")
     print("  GET  /docs           - API documentation")
     
     uvicorn.run(
@@ -3,19 +3,99 @@
 
 import json
 import asyncio
-from typing import AsyncGenerator
-from fastapi import FastAPI, HTTPException
+import hashlib
+import secrets
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Callable, Literal, Optional
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
 from agent_modules.orchestrator import OrchestratorAgent
+from config.settings import (
+    STREAM_COMPRESSION_ENABLED, STREAM_COMPRESSION_LEVEL,
+    REPLAY_BUFFER_TTL_SECONDS, REPLAY_BUFFER_MAX_EVENTS, REPLAY_MAX_RUNS, SUBSCRIBER_QUEUE_MAX_EVENTS,
+    JOB_QUEUE_WORKERS, JOB_QUEUE_MAX_JOBS, JOB_RETENTION_SECONDS, JOB_QUEUE_PERSIST_PATH,
+    JOB_QUEUE_MAX_QUEUED, JOB_QUEUE_MAX_PER_CLIENT,
+    UPSTREAM_SLOTS, CLIENT_WEIGHTS,
+    MAX_JD_TEXT_CHARS, ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_IN_FLIGHT_PER_CLIENT, ADMISSION_MAX_QUEUED_TOKENS,
+    ADMISSION_TARGET_LATENCY_SECONDS, FAST_MODE_RATE_PER_CLIENT, FAST_MODE_BURST_PER_CLIENT,
+    RESULT_CACHE_MAX_AGE_SECONDS,
+    USAGE_FLUSH_INTERVAL_SECONDS, USAGE_LOG_PATH,
+    LOOP_LAG_MONITOR_ENABLED, LOOP_LAG_INTERVAL_MS, LOOP_LAG_THRESHOLD_MS, LOOP_LAG_FAIL_MS,
+    ADMIN_TOKEN, PROFILE_MAX_SECONDS, PROFILE_REQUESTS_ENABLED, SHUTDOWN_DRAIN_SECONDS
+)
+from tools.token_estimator import estimate_pipeline_tokens
+from utils.admission import AdmissionController, AdmissionRejected, ClientRateLimiter
+from utils.compression import StreamingCompressionMiddleware
+from utils.fair_scheduler import FairScheduler, PRIORITY_CLASSES, parse_weights
+from utils.job_queue import FINISHED_STATUSES, JobQueue, JobQueueFull
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import metrics
+from utils.profiler import SamplingProfiler
+from utils.run_registry import RunRegistry, StreamRun, format_event_id, parse_event_id
+from utils.usage_tracker import usage_tracker
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Orchestrator events forwarded to clients
+STREAM_EVENT_TYPES = ("progress", "content_chunk", "partial_result", "question", "complete", "error")
 
 class JobDescriptionRequest(BaseModel):
-    jd_text: str
+    # Oversized input is rejected during validation, before any LLM work
+    jd_text: str = Field(..., max_length=MAX_JD_TEXT_CHARS)
+    chunk_window_ms: Optional[float] = None
+    chunk_max_bytes: Optional[int] = None
+    # Opt in to token-level content_chunk events during the parse
+    stream_content: bool = False
+    # "fast" extracts locally without model calls; unset picks fast when latency_budget_ms is below the LLM p50
+    mode: Optional[Literal["fast", "full"]] = None
+    latency_budget_ms: Optional[float] = Field(None, gt=0)
 
 class SSEService:
     def __init__(self):
         self.orchestrator = OrchestratorAgent()
+        self.runs = RunRegistry(
+            ttl_seconds=REPLAY_BUFFER_TTL_SECONDS,
+            max_events_per_run=REPLAY_BUFFER_MAX_EVENTS,
+            max_runs=REPLAY_MAX_RUNS,
+            max_queued_events=SUBSCRIBER_QUEUE_MAX_EVENTS
+        )
+        self.scheduler = FairScheduler(UPSTREAM_SLOTS, parse_weights(CLIENT_WEIGHTS))
+        usage_tracker.log_path = USAGE_LOG_PATH
+        self.loop_monitor = LoopLagMonitor(LOOP_LAG_INTERVAL_MS, LOOP_LAG_THRESHOLD_MS, LOOP_LAG_FAIL_MS)
+        # Collapsed stacks of recently profiled requests, by run id
+        self.request_profiles: "OrderedDict[str, str]" = OrderedDict()
+        # At most one request is profiled at a time
+        self._profiled_run: Optional[StreamRun] = None
+        self.admission = AdmissionController(
+            max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+            max_in_flight_per_client=ADMISSION_MAX_IN_FLIGHT_PER_CLIENT,
+            max_queued_tokens=ADMISSION_MAX_QUEUED_TOKENS,
+            target_latency_seconds=ADMISSION_TARGET_LATENCY_SECONDS
+        )
+        self.fast_limiter = ClientRateLimiter(FAST_MODE_RATE_PER_CLIENT, FAST_MODE_BURST_PER_CLIENT)
+        self.jobs = JobQueue(
+            self.runs,
+            self._stream_jd_processing,
+            workers=JOB_QUEUE_WORKERS,
+            max_jobs=JOB_QUEUE_MAX_JOBS,
+            retention_seconds=JOB_RETENTION_SECONDS,
+            store_path=JOB_QUEUE_PERSIST_PATH,
+            max_queued=JOB_QUEUE_MAX_QUEUED,
+            max_queued_per_client=JOB_QUEUE_MAX_PER_CLIENT
+        )
+        # Set when shutdown starts; new runs are refused from then on
+        self.draining = False
+        self._drain_deadline: Optional[float] = None
+        self._drain_task: Optional[asyncio.Task] = None
         
         # Constants for progress tracking
         self.PROGRESS_STEPS = {
@@ -31,7 +111,8 @@ class SSEService:
         app = FastAPI(
             title="Job Requirement Generator API",
             description="SSE API for streaming job requirement processing",
-            version="1.0.0"
+            version="1.0.0",
+            lifespan=self._lifespan
         )
         
         # Add CORS middleware
@@ -41,17 +122,191 @@ class SSEService:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["Retry-After", "ETag", "X-Profile-Id"],
         )
         
+        # Compress streaming responses per event when the client accepts it
+        if STREAM_COMPRESSION_ENABLED:
+            app.add_middleware(StreamingCompressionMiddleware, level=STREAM_COMPRESSION_LEVEL)
+        
         @app.post("/api/process-jd")
-        async def process_jd_stream(request: JobDescriptionRequest):
-            """SSE endpoint for processing job descriptions"""
+        async def process_jd_stream(request: JobDescriptionRequest, http_request: Request):
+            """SSE (or NDJSON) endpoint for processing job descriptions"""
             if not request.jd_text.strip():
                 raise HTTPException(status_code=400, detail="Job description text is required")
             
-            return EventSourceResponse(
-                self._stream_jd_processing(request.jd_text)
-            )
+            # Reattach to an in-flight or just-finished run instead of starting over
+            run, after_seq = self._resume_run(http_request.headers.get("last-event-id"))
+            if run is None:
+                self._reject_if_draining()
+                profiled = PROFILE_REQUESTS_ENABLED and bool(http_request.headers.get("x-profile"))
+                if profiled:
+                    # Checked before admission, so a rejected attempt holds no capacity
+                    self._require_admin(http_request)
+                    if self._profiled_run is not None and not self._profiled_run.done:
+                        raise HTTPException(status_code=409, detail="Another request is being profiled")
+                client_id = self._client_id(http_request)
+                mode = self.orchestrator.choose_mode(request.mode, request.latency_budget_ms)
+                events = self._stream_jd_processing(
+                    request.jd_text,
+                    chunk_window_ms=request.chunk_window_ms,
+                    chunk_max_bytes=request.chunk_max_bytes,
+                    stream_content=request.stream_content,
+                    client_id=client_id,
+                    priority=self._priority(http_request, "interactive"),
+                    mode=mode
+                )
+                # Fast mode makes no upstream call, so it is rate limited per client instead of admission-controlled
+                tokens = estimate_pipeline_tokens(request.jd_text) if mode == "full" else 0
+                try:
+                    if mode == "full":
+                        # Shed load up front rather than queueing until the client times out
+                        self.admission.admit(client_id, tokens)
+                    else:
+                        self.fast_limiter.acquire(client_id, "fast_rate")
+                except AdmissionRejected as e:
+                    raise HTTPException(
+                        status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)}
+                    )
+                if mode == "full":
+                    events = self._admitted(events, client_id, tokens)
+                try:
+                    if profiled:
+                        run_id = uuid.uuid4().hex
+                        run = self.runs.start(self._profiled(events, run_id), run_id)
+                        self._profiled_run = run
+                    else:
+                        run = self.runs.start(events)
+                except BaseException:
+                    # The run never started, so _admitted cannot return the capacity itself
+                    if mode == "full":
+                        self.admission.release(client_id, tokens)
+                    raise
+                if profiled:
+                    return self._stream_response(run, 0, http_request, headers={"X-Profile-Id": run.run_id})
+            
+            return self._stream_response(run, after_seq, http_request)
+        
+        @app.get("/api/runs/{run_id}/events")
+        async def resume_run_stream(run_id: str, http_request: Request):
+            """Reattach to a run's event stream, replaying events after Last-Event-ID"""
+            run, after_seq = self._resume_run(http_request.headers.get("last-event-id"))
+            if run is None or run.run_id != run_id:
+                run, after_seq = self.runs.get(run_id), 0
+            if run is None:
+                raise HTTPException(status_code=404, detail="Run not found or expired")
+            
+            return self._stream_response(run, after_seq, http_request)
+        
+        @app.post("/api/jobs", status_code=202)
+        async def submit_job(request: JobDescriptionRequest, http_request: Request):
+            """Enqueue a job description and return its job id at once"""
+            if not request.jd_text.strip():
+                raise HTTPException(status_code=400, detail="Job description text is required")
+            self._reject_if_draining()
+            
+            try:
+                job = self.jobs.submit(request.jd_text, {
+                    "chunk_window_ms": request.chunk_window_ms,
+                    "chunk_max_bytes": request.chunk_max_bytes,
+                    "stream_content": request.stream_content,
+                    "mode": self.orchestrator.choose_mode(request.mode, request.latency_budget_ms),
+                    "client_id": self._client_id(http_request),
+                    "priority": self._priority(http_request, "bulk")
+                })
+            except JobQueueFull as e:
+                raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+            return {
+                "job_id": job.job_id,
+                "status": job.status,
+                "status_url": f"/api/jobs/{job.job_id}",
+                "events_url": f"/api/jobs/{job.job_id}/events"
+            }
+        
+        @app.get("/api/jobs/{job_id}")
+        async def get_job(job_id: str):
+            """Status and, once finished, result of a job"""
+            job = await self.jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return job.to_dict()
+        
+        @app.get("/api/jobs/{job_id}/events")
+        async def job_events(job_id: str, http_request: Request):
+            """Attach to a job's progress stream, replaying events after Last-Event-ID"""
+            run = self.jobs.run_for(job_id)
+            if run is not None:
+                parsed = parse_event_id(http_request.headers.get("last-event-id"))
+                after_seq = parsed[1] if parsed and parsed[0] == job_id else 0
+                return self._stream_response(run, after_seq, http_request)
+            
+            # The run's replay buffer has expired; a finished job still reports its outcome
+            job = await self.jobs.get(job_id)
+            if job is None or job.status not in FINISHED_STATUSES:
+                raise HTTPException(status_code=404, detail="Job not found")
+            run = self.runs.open(job_id)
+            run.publish(job.final_event())
+            run.finish()
+            return self._stream_response(run, 0, http_request)
+        
+        @app.get("/api/results/{content_hash}")
+        async def get_result(content_hash: str, http_request: Request):
+            """Previously computed requirements by content hash, cacheable by browsers and CDNs"""
+            entry = self.orchestrator.result_store.get(content_hash)
+            # Partial results of cut-off runs are only used to resume extraction
+            if entry is None or entry.get("partial"):
+                raise HTTPException(status_code=404, detail="Result not found or expired")
+            
+            body = json.dumps(
+                {"content_hash": content_hash, "requirements": entry["requirements"]},
+                ensure_ascii=False, sort_keys=True
+            ).encode("utf-8")
+            # Strong validator over the exact bytes, so a reprocessed result gets a new tag
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            headers = {"ETag": etag, "Cache-Control": f"public, max-age={RESULT_CACHE_MAX_AGE_SECONDS}"}
+            if self._etag_matches(http_request.headers.get("if-none-match"), etag):
+                metrics.increment("results.not_modified")
+                return Response(status_code=304, headers=headers)
+            metrics.increment("results.served")
+            return Response(content=body, media_type="application/json", headers=headers)
+        
+        @app.get("/api/usage")
+        async def get_usage(client: Optional[str] = None, session_id: Optional[str] = None):
+            """Token usage and cost, overall and per client, or for one client or session"""
+            return usage_tracker.report(client=client, session_id=session_id)
+        
+        @app.get("/api/metrics")
+        async def get_metrics():
+            """In-process service metrics"""
+            return metrics.snapshot()
+        
+        @app.get("/api/routing")
+        async def get_routing():
+            """Model chain, latency and cost per pipeline stage"""
+            return self.orchestrator.llm_tools.router.report()
+        
+        @app.get("/api/debug/profile")
+        async def profile_worker(http_request: Request, seconds: float = 10, interval_ms: float = 10, idle: bool = False):
+            """Admin only: sample this worker's stacks for a while and return them collapsed, ready for a flamegraph"""
+            self._require_admin(http_request)
+            if not 0 < seconds <= PROFILE_MAX_SECONDS:
+                raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILE_MAX_SECONDS:g}")
+            profiler = SamplingProfiler(interval_ms=max(1.0, interval_ms), include_idle=idle)
+            profiler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                collapsed = profiler.stop()
+            return PlainTextResponse(collapsed, headers={"X-Profile-Samples": str(profiler.samples)})
+        
+        @app.get("/api/debug/profile/{run_id}")
+        async def get_request_profile(run_id: str, http_request: Request):
+            """Admin only: collapsed stacks recorded while a profiled request was running"""
+            self._require_admin(http_request)
+            collapsed = self.request_profiles.get(run_id)
+            if collapsed is None:
+                raise HTTPException(status_code=404, detail="Profile not found or still running")
+            return PlainTextResponse(collapsed)
         
         @app.get("/api/health")
         async def health_check():
@@ -59,48 +314,279 @@ class SSEService:
             return {
                 "status": "healthy",
                 "service": "job-requirement-generator",
-                "version": "1.0.0"
+                "version": "1.0.0",
+                "event_loop": self.loop_monitor.stats()
             }
         
+        @app.get("/api/ready")
+        async def readiness_check():
+            """Readiness probe: not ready while draining for shutdown"""
+            if self.draining:
+                return JSONResponse({"status": "draining", "active_runs": len(self.runs.active())}, status_code=503)
+            return {"status": "ready"}
+        
         return app
     
-    async def _stream_jd_processing(self, jd_text: str) -> AsyncGenerator[dict, None]:
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """Run the job queue workers, the usage flusher and the loop lag monitor for the lifetime of the app"""
+        if LOOP_LAG_MONITOR_ENABLED:
+            self.loop_monitor.start()
+        await self.jobs.start()
+        flusher = asyncio.create_task(self._flush_usage_periodically())
+        restore_sigterm = self._install_sigterm_handler()
+        try:
+            yield
+        finally:
+            flusher.cancel()
+            # Also reached without SIGTERM (e.g. Ctrl+C); a drain already under way keeps its deadline
+            await self.drain(SHUTDOWN_DRAIN_SECONDS)
+            await self.jobs.stop()
+            usage_tracker.flush()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.orchestrator.result_store.save)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Result store save failed: {str(e)}")
+            restore_sigterm()
+            await self.loop_monitor.stop()
+        # Strict mode: a request that blocked the loop fails the test run at shutdown
+        self.loop_monitor.raise_if_blocked()
+    
+    def _install_sigterm_handler(self) -> Callable[[], None]:
+        """
+        Drain on SIGTERM before passing the signal on to the server's own handler
+        
+        Returns:
+            Callable: Restores the previous handler
+        """
+        if threading.current_thread() is not threading.main_thread():
+            # Signal handlers can only be installed from the main thread
+            return lambda: None
+        loop = asyncio.get_running_loop()
+        previous = signal.getsignal(signal.SIGTERM)
+        
+        def on_sigterm(signum, frame):
+            if self._drain_task is None:
+                # The handler interrupts whatever the loop thread is doing; start the drain from the loop instead
+                loop.call_soon_threadsafe(self._start_drain, previous, signum, frame)
+            else:
+                # A second SIGTERM skips the rest of the drain
+                self._pass_signal_on(previous, signum, frame)
+        
+        signal.signal(signal.SIGTERM, on_sigterm)
+        return lambda: signal.signal(signal.SIGTERM, previous)
+    
+    def _start_drain(self, previous, signum: int, frame):
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain_then_exit(previous, signum, frame))
+    
+    async def _drain_then_exit(self, previous, signum: int, frame):
+        await self.drain(SHUTDOWN_DRAIN_SECONDS)
+        self._pass_signal_on(previous, signum, frame)
+    
+    @staticmethod
+    def _pass_signal_on(previous, signum: int, frame):
+        """Hand a signal to the handler that was installed before ours"""
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            signal.signal(signum, previous if previous is not None else signal.SIG_DFL)
+            signal.raise_signal(signum)
+    
+    async def drain(self, timeout: float):
+        """
+        Stop accepting runs and let active ones finish, cutting off those still running at the deadline
+        
+        Args:
+            timeout: Seconds active runs get, counted from the first call
+        """
+        if not self.draining:
+            self.draining = True
+            self.jobs.stop_accepting()
+            self._drain_deadline = time.monotonic() + timeout
+            metrics.set_gauge("shutdown.draining", 1)
+            print(f"Draining {len(self.runs.active())} active run(s) for up to {timeout:g}s")
+        
+        active = self.runs.active()
+        remaining = self._drain_deadline - time.monotonic()
+        if active and remaining > 0:
+            await asyncio.wait([run.task for run in active], timeout=remaining)
+        
+        unfinished = self.runs.active()
+        if not unfinished:
+            return
+        for run in unfinished:
+            # Tell followers to retry; the cancelled run keeps its extracted sections for that retry
+            run.publish({
+                "event": "error",
+                "data": json.dumps({
+                    "step": "error",
+                    "message": "Server is shutting down; retry the request",
+                    "progress": 0,
+                    "error": True,
+                    "retryable": True
+                }, ensure_ascii=False)
+            })
+            run.task.cancel()
+        await asyncio.gather(*(run.task for run in unfinished), return_exceptions=True)
+        metrics.increment("shutdown.runs_cut_off", len(unfinished))
+        print(f"Cut off {len(unfinished)} run(s) at the drain deadline")
+    
+    def _reject_if_draining(self):
+        """Refuse new work while draining, so clients retry against another instance"""
+        if self.draining:
+            raise HTTPException(status_code=503, detail="Server is shutting down", headers={"Retry-After": "1"})
+    
+    async def _flush_usage_periodically(self):
+        """Write finished requests' usage to the usage log at a fixed interval"""
+        while True:
+            await asyncio.sleep(USAGE_FLUSH_INTERVAL_SECONDS)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, usage_tracker.flush)
+            except OSError as e:
+                print(f"Usage flush failed: {str(e)}")
+    
+    async def _admitted(self, events: AsyncGenerator[dict, None], client_id: str, tokens: int) -> AsyncGenerator[dict, None]:
+        """Pass a run's events through and return its admission capacity when it ends"""
+        try:
+            async for event in events:
+                yield event
+        finally:
+            self.admission.release(client_id, tokens)
+    
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """Whether an If-None-Match header matches an ETag (weak comparison, as for GET)"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        candidates = (tag.strip() for tag in if_none_match.split(","))
+        return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+    
+    def _require_admin(self, http_request: Request):
+        """Reject requests without the admin token; admin endpoints do not exist while no token is configured"""
+        if not ADMIN_TOKEN:
+            raise HTTPException(status_code=404, detail="Not Found")
+        if not secrets.compare_digest(http_request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Admin token required")
+    
+    async def _profiled(self, events: AsyncGenerator[dict, None], run_id: str) -> AsyncGenerator[dict, None]:
+        """Sample the run's own task for as long as it produces events, keeping the result under its run id"""
+        profiler = SamplingProfiler(task=asyncio.current_task())
+        profiler.start()
+        try:
+            async for event in events:
+                yield event
+        finally:
+            self.request_profiles[run_id] = profiler.stop()
+            while len(self.request_profiles) > 20:
+                self.request_profiles.popitem(last=False)
+    
+    def _client_id(self, http_request: Request) -> str:
+        """Identify the client for fair scheduling: API key, then client id, then address"""
+        api_key = http_request.headers.get("x-api-key")
+        if api_key:
+            return f"key:{api_key}"
+        client_id = http_request.headers.get("x-client-id")
+        if client_id:
+            return client_id
+        return f"ip:{http_request.client.host}" if http_request.client else "anonymous"
+    
+    def _priority(self, http_request: Request, default: str) -> str:
+        """Priority class from the X-Priority header, or the endpoint's default"""
+        priority = (http_request.headers.get("x-priority") or "").lower()
+        return priority if priority in PRIORITY_CLASSES else default
+    
+    def _resume_run(self, last_event_id: str = None):
+        """
+        Look up the run a Last-Event-ID belongs to
+        
+        Args:
+            last_event_id: Value of the Last-Event-ID header
+            
+        Returns:
+            Tuple: (run, last received sequence number), run is None when not resumable
+        """
+        parsed = parse_event_id(last_event_id) if last_event_id else None
+        if parsed is None:
+            return None, 0
+        run_id, after_seq = parsed
+        run = self.runs.get(run_id)
+        return (run, after_seq) if run else (None, 0)
+    
+    def _stream_response(self, run: StreamRun, after_seq: int, http_request: Request, headers: dict = None):
+        """Build an SSE or NDJSON response that follows a run"""
+        events = self._follow_run(run, after_seq)
+        if NDJSON_MEDIA_TYPE in http_request.headers.get("accept", ""):
+            return StreamingResponse(self._format_ndjson(events), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+        
+        return EventSourceResponse(events, headers=headers)
+    
+    async def _follow_run(self, run: StreamRun, after_seq: int = 0) -> AsyncGenerator[dict, None]:
+        """
+        Stream a run's events to one client, tagging each with its event id
+        
+        Args:
+            run: Run to follow
+            after_seq: Last sequence number the client has already received
+            
+        Yields:
+            dict: SSE event data with id
+        """
+        async for seq, event in run.subscribe(after_seq):
+            yield {"id": format_event_id(run.run_id, seq), **event}
+    
+    async def _stream_jd_processing(
+        self,
+        jd_text: str,
+        chunk_window_ms: Optional[float] = None,
+        chunk_max_bytes: Optional[int] = None,
+        client_id: str = "anonymous",
+        priority: str = "interactive",
+        mode: str = "full",
+        stream_content: bool = False
+    ) -> AsyncGenerator[dict, None]:
         """
         Stream job description processing steps with real-time LLM output
         
         Args:
             jd_text: Job description text
+            chunk_window_ms: Coalescing window for content chunks
+            chunk_max_bytes: Coalesced chunk size that forces a flush
+            client_id: Client the request is scheduled under
+            priority: Priority class ("interactive" or "bulk")
+            mode: "full" for the LLM pipeline, "fast" for local extraction only
+            stream_content: Also send the parse's token-level output as content_chunk events
             
         Yields:
             dict: SSE event data
         """
         try:
-            # Use the new streaming orchestrator method
-            async for stream_chunk in self.orchestrator.process_input_stream(jd_text):
-                if stream_chunk["event"] == "progress":
-                    data = stream_chunk["data"]
-                    yield {
-                        "event": "progress",
-                        "data": json.dumps(data, ensure_ascii=False)
-                    }
-                elif stream_chunk["event"] == "complete":
-                    data = stream_chunk["data"]
-                    yield {
-                        "event": "complete",
-                        "data": json.dumps(data, ensure_ascii=False)
-                    }
-                elif stream_chunk["event"] == "partial_result":
-                    data = stream_chunk["data"]
-                    yield {
-                        "event": "partial_result",
-                        "data": json.dumps(data, ensure_ascii=False)
-                    }
-                elif stream_chunk["event"] == "error":
-                    data = stream_chunk["data"]
-                    yield {
-                        "event": "error",
-                        "data": json.dumps(data, ensure_ascii=False)
-                    }
+            if mode == "fast":
+                # Local extraction never waits for an upstream slot
+                async for event in self._pipeline_events(jd_text, client_id, mode=mode):
+                    yield event
+                return
+            
+            if self.scheduler.would_wait():
+                yield {
+                    "event": "progress",
+                    "data": json.dumps({
+                        "step": "queued",
+                        "message": "Waiting for processing capacity...",
+                        "progress": 0
+                    }, ensure_ascii=False)
+                }
+            
+            # Larger inputs take proportionally more of the client's fair share
+            cost = max(1.0, estimate_pipeline_tokens(jd_text) / 1000)
+            async with self.scheduler.slot(client_id, priority, cost):
+                async for event in self._pipeline_events(
+                    jd_text, client_id, chunk_window_ms=chunk_window_ms, chunk_max_bytes=chunk_max_bytes,
+                    stream_content=stream_content
+                ):
+                    yield event
             
         except Exception as e:
             yield {
@@ -111,4 +597,46 @@ class SSEService:
                     "progress": 0,
                     "error": True
                 }, ensure_ascii=False)
-            } 
\ No newline at end of file
+            }
+    
+    async def _pipeline_events(
+        self,
+        jd_text: str,
+        client_id: str,
+        chunk_window_ms: Optional[float] = None,
+        chunk_max_bytes: Optional[int] = None,
+        mode: str = "full",
+        stream_content: bool = False
+    ) -> AsyncGenerator[dict, None]:
+        """Orchestrator events for a job description, encoded for the client"""
+        # Every model call of this run is accounted to it and to its client
+        with usage_tracker.scope(client_id=client_id) as usage:
+            # Use the new streaming orchestrator method
+            async for stream_chunk in self.orchestrator.process_input_stream(
+                jd_text,
+                chunk_window_ms=chunk_window_ms,
+                chunk_max_bytes=chunk_max_bytes,
+                mode=mode,
+                stream_content=stream_content
+            ):
+                if stream_chunk["event"] in STREAM_EVENT_TYPES:
+                    data = stream_chunk["data"]
+                    if stream_chunk["event"] == "complete":
+                        data = dict(data, usage=usage.to_dict())
+                    yield {
+                        "event": stream_chunk["event"],
+                        "data": json.dumps(data, ensure_ascii=False)
+                    }
+    
+    async def _format_ndjson(self, events: AsyncGenerator[dict, None]) -> AsyncGenerator[str, None]:
+        """
+        Re-frame SSE events as newline-delimited JSON
+        
+        Args:
+            events: SSE event dicts whose data is already JSON encoded
+            
+        Yields:
+            str: One JSON line per event
+        """
+        async for event in events:
+            yield f'{{"id":{json.dumps(event["id"])},"event":{json.dumps(event["event"])},"data":{event["data"]}}}\n'
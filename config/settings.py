@@ -15,6 +15,141 @@ if not OPENAI_API_KEY:
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4")
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2000"))
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.1"))
+MODEL_CONTEXT_WINDOW = int(os.getenv("MODEL_CONTEXT_WINDOW", "8192"))
+
+# Per-stage models as "primary,fallback,..." chains; empty uses MODEL_NAME
+STAGE_MODELS = {
+    "classify": os.getenv("MODEL_CLASSIFY", ""),
+    "parse": os.getenv("MODEL_PARSE", ""),
+    "stream_parse": os.getenv("MODEL_STREAM_PARSE", ""),
+    "questions": os.getenv("MODEL_QUESTIONS", ""),
+    "format": os.getenv("MODEL_FORMAT", ""),
+    "user_response": os.getenv("MODEL_USER_RESPONSE", ""),
+    "verify": os.getenv("MODEL_VERIFY", ""),
+}
+# Per-request upstream timeout in seconds per stage (for streams, the longest wait for the next chunk); 0 uses the SDK default
+STAGE_TIMEOUTS = {
+    "classify": float(os.getenv("TIMEOUT_CLASSIFY", "15")),
+    "parse": float(os.getenv("TIMEOUT_PARSE", "60")),
+    "stream_parse": float(os.getenv("TIMEOUT_STREAM_PARSE", "30")),
+    "questions": float(os.getenv("TIMEOUT_QUESTIONS", "30")),
+    "format": float(os.getenv("TIMEOUT_FORMAT", "30")),
+    "user_response": float(os.getenv("TIMEOUT_USER_RESPONSE", "30")),
+    "verify": float(os.getenv("TIMEOUT_VERIFY", "30")),
+}
+# Retries the OpenAI client makes itself before a call counts as failed; fallback models and breakers handle the rest
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+# Extra or overriding prices as "model:prompt_usd_per_1k:completion_usd_per_1k,..."
+MODEL_PRICES = os.getenv("MODEL_PRICES", "")
+
+# Circuit breaker per model: open on a high failure or slow-call rate, probe again after CIRCUIT_OPEN_SECONDS
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "30"))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.5"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+# While circuits are open, serve stored results or local extraction, marked as degraded
+DEGRADED_FALLBACK_ENABLED = os.getenv("DEGRADED_FALLBACK_ENABLED", "true").lower() == "true"
+
+# Fast mode: local extraction without model calls, picked when a request's latency budget is below the LLM p50
+FAST_MODE_AUTO_ENABLED = os.getenv("FAST_MODE_AUTO_ENABLED", "true").lower() == "true"
+# Assumed LLM p50 while no recent call latencies are known
+FAST_MODE_DEFAULT_LLM_P50_MS = float(os.getenv("FAST_MODE_DEFAULT_LLM_P50_MS", "2000"))
+# Fast-mode streams skip admission control, so each client is rate limited instead (0 disables)
+FAST_MODE_RATE_PER_CLIENT = float(os.getenv("FAST_MODE_RATE_PER_CLIENT", "20"))
+FAST_MODE_BURST_PER_CLIENT = int(os.getenv("FAST_MODE_BURST_PER_CLIENT", "40"))
+
+# Token usage accounting; streamed calls ask the API to report usage in their last chunk
+STREAM_INCLUDE_USAGE = os.getenv("STREAM_INCLUDE_USAGE", "true").lower() == "true"
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "60"))
+USAGE_LOG_PATH = os.getenv("USAGE_LOG_PATH", "")
+
+# Provider prompt-prefix caching; cached prompt tokens are billed at this fraction of the prompt price
+PROMPT_CACHE_KEY_ENABLED = os.getenv("PROMPT_CACHE_KEY_ENABLED", "false").lower() == "true"
+CACHED_PROMPT_PRICE_FACTOR = float(os.getenv("CACHED_PROMPT_PRICE_FACTOR", "0.5"))
+
+# Streaming response compression (gzip/deflate/brotli, negotiated per request)
+STREAM_COMPRESSION_ENABLED = os.getenv("STREAM_COMPRESSION_ENABLED", "true").lower() == "true"
+STREAM_COMPRESSION_LEVEL = int(os.getenv("STREAM_COMPRESSION_LEVEL", "6"))
+
+# Replay buffers for resuming SSE streams with Last-Event-ID
+REPLAY_BUFFER_TTL_SECONDS = float(os.getenv("REPLAY_BUFFER_TTL_SECONDS", "300"))
+REPLAY_BUFFER_MAX_EVENTS = int(os.getenv("REPLAY_BUFFER_MAX_EVENTS", "256"))
+REPLAY_MAX_RUNS = int(os.getenv("REPLAY_MAX_RUNS", "1000"))
+SUBSCRIBER_QUEUE_MAX_EVENTS = int(os.getenv("SUBSCRIBER_QUEUE_MAX_EVENTS", "64"))
+
+# Coalescing of token-level chunk events (window 0 disables coalescing)
+CHUNK_COALESCE_WINDOW_MS = float(os.getenv("CHUNK_COALESCE_WINDOW_MS", "50"))
+CHUNK_COALESCE_MAX_BYTES = int(os.getenv("CHUNK_COALESCE_MAX_BYTES", "2048"))
+
+# Local input compaction before prompting (HTML, whitespace, boilerplate, length cap)
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+COMPACTION_STRIP_BOILERPLATE = os.getenv("COMPACTION_STRIP_BOILERPLATE", "true").lower() == "true"
+COMPACTION_MAX_CHARS = int(os.getenv("COMPACTION_MAX_CHARS", "60000"))
+
+# Map-reduce extraction for long job descriptions
+CHUNKED_EXTRACTION_ENABLED = os.getenv("CHUNKED_EXTRACTION_ENABLED", "true").lower() == "true"
+CHUNKED_EXTRACTION_THRESHOLD_TOKENS = int(os.getenv("CHUNKED_EXTRACTION_THRESHOLD_TOKENS", "3000"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1500"))
+CHUNK_MAX_WORKERS = int(os.getenv("CHUNK_MAX_WORKERS", "4"))
+
+# Speculative extraction while the scenario is classified: "off", "always" or "length"
+SPECULATION_POLICY = os.getenv("SPECULATION_POLICY", "length").lower()
+SPECULATION_MIN_CHARS = int(os.getenv("SPECULATION_MIN_CHARS", "400"))
+SPECULATION_MAX_WORKERS = int(os.getenv("SPECULATION_MAX_WORKERS", "8"))
+
+# Precomputed question library (empty path uses the bundled library)
+QUESTION_LIBRARY_ENABLED = os.getenv("QUESTION_LIBRARY_ENABLED", "true").lower() == "true"
+QUESTION_LIBRARY_PATH = os.getenv("QUESTION_LIBRARY_PATH", "")
+
+# Local skill normalization (empty path uses the bundled index)
+SKILL_NORMALIZATION_ENABLED = os.getenv("SKILL_NORMALIZATION_ENABLED", "true").lower() == "true"
+SKILL_INDEX_PATH = os.getenv("SKILL_INDEX_PATH", "")
+
+# Reuse of results for repeated and near-duplicate job descriptions
+RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", "10000"))
+# SQLite file results are saved to at shutdown and loaded from at startup; empty keeps them in memory only
+RESULT_STORE_PERSIST_PATH = os.getenv("RESULT_STORE_PERSIST_PATH", "")
+RESULT_CACHE_MAX_AGE_SECONDS = int(os.getenv("RESULT_CACHE_MAX_AGE_SECONDS", "3600"))
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+NEAR_DUPLICATE_REUSE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_REUSE_SIMILARITY", "0.9"))
+NEAR_DUPLICATE_VERIFY_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_VERIFY_SIMILARITY", "0.7"))
+
+# Asynchronous job queue (empty persist path keeps jobs in memory only)
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+JOB_QUEUE_MAX_JOBS = int(os.getenv("JOB_QUEUE_MAX_JOBS", "10000"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+JOB_QUEUE_PERSIST_PATH = os.getenv("JOB_QUEUE_PERSIST_PATH", "")
+# Submissions are refused with 503 once this many jobs wait, and with 429 for a client with this many unfinished jobs
+JOB_QUEUE_MAX_QUEUED = int(os.getenv("JOB_QUEUE_MAX_QUEUED", "1000"))
+JOB_QUEUE_MAX_PER_CLIENT = int(os.getenv("JOB_QUEUE_MAX_PER_CLIENT", "100"))
+
+# Fair scheduling of upstream LLM slots; weights as "client:weight,client:weight"
+UPSTREAM_SLOTS = int(os.getenv("UPSTREAM_SLOTS", "8"))
+CLIENT_WEIGHTS = os.getenv("CLIENT_WEIGHTS", "")
+
+# Event-loop lag monitoring; LOOP_LAG_FAIL_MS > 0 makes blocking longer than that fail app shutdown (tests)
+LOOP_LAG_MONITOR_ENABLED = os.getenv("LOOP_LAG_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "200"))
+LOOP_LAG_FAIL_MS = float(os.getenv("LOOP_LAG_FAIL_MS", "0"))
+
+# Admin-only debugging endpoints (disabled while ADMIN_TOKEN is empty)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_REQUESTS_ENABLED = os.getenv("PROFILE_REQUESTS_ENABLED", "false").lower() == "true"
+
+# Admission control
+MAX_JD_TEXT_CHARS = int(os.getenv("MAX_JD_TEXT_CHARS", "200000"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ADMISSION_MAX_IN_FLIGHT_PER_CLIENT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT_PER_CLIENT", "16"))
+ADMISSION_MAX_QUEUED_TOKENS = int(os.getenv("ADMISSION_MAX_QUEUED_TOKENS", "500000"))
+ADMISSION_TARGET_LATENCY_SECONDS = float(os.getenv("ADMISSION_TARGET_LATENCY_SECONDS", "20"))
+
+# Graceful shutdown: after SIGTERM, active streams get this long to finish before they are cut off
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
 
 # Output format template
 OUTPUT_TEMPLATE = {
@@ -15,7 +15,7 @@ def run_cli_mode():
     session_manager = SessionManager()
     
     # Initialize orchestrator agent
-    orchestrator = OrchestratorAgent()
+    orchestrator = OrchestratorAgent(session_manager)
     
     # Example usage - Scenario 1: Detailed JD
     jd_text = """
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Author: Peng Fei
+# Benchmark per-event compression of a typical /api/process-jd event stream
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.compression import StreamCompressor, supported_encodings
+
+SECTIONS = [
+    ("title", "Senior Software Engineer"),
+    ("description", "Build and operate cloud-native microservices for the payments platform"),
+    ("technical_skills", ["Python", "JavaScript", "Docker", "Kubernetes", "PostgreSQL", "AWS"]),
+    ("domain_experience", ["microservices architecture", "cloud platforms", "payments"]),
+    ("soft_skills", ["problem-solving", "communication", "mentoring"]),
+    ("nice_to_have", ["machine learning frameworks", "data engineering"]),
+]
+
+
+def build_events() -> list:
+    """Build SSE frames shaped like a real detailed-JD run"""
+    requirements = {
+        "title": "",
+        "description": "",
+        "must_have": {"technical_skills": [], "domain_experience": [], "soft_skills": []},
+        "nice_to_have": [],
+    }
+    events = [
+        ("progress", {"step": "started", "message": "Starting job description analysis...", "progress": 5}),
+        ("progress", {"step": "parsing", "message": "Analyzing job description...", "progress": 10}),
+    ]
+    for index, (section, content) in enumerate(SECTIONS, start=1):
+        if section in requirements:
+            requirements[section] = content
+        elif section in requirements["must_have"]:
+            requirements["must_have"][section] = content
+        events.append(("partial_result", {
+            "step": "parsing",
+            "message": f"Completed analysis of {section}",
+            "progress": 20 + index * 15,
+            "partial_result": {"session_id": "", "requirements": json.loads(json.dumps(requirements))},
+            "completed_section": section,
+        }))
+    events.append(("progress", {"step": "formatting", "message": "Finalizing results...", "progress": 90}))
+    events.append(("complete", {
+        "step": "complete",
+        "message": "Job description processing completed",
+        "progress": 100,
+        "result": {"session_id": "", "requirements": requirements},
+    }))
+    return [f"event: {name}\r\ndata: {json.dumps(data, ensure_ascii=False)}\r\n\r\n".encode() for name, data in events]
+
+
+def main():
+    """Print bytes per request and added latency per event for each encoding"""
+    frames = build_events()
+    raw_bytes = sum(len(frame) for frame in frames)
+    rounds = 200
+    print(f"events per request: {len(frames)}, identity bytes per request: {raw_bytes}")
+
+    for level in (1, 6, 9):
+        for encoding in supported_encodings():
+            total_bytes = 0
+            started = time.perf_counter()
+            for _ in range(rounds):
+                compressor = StreamCompressor(encoding, level)
+                total_bytes = sum(len(compressor.compress(frame)) for frame in frames)
+                total_bytes += len(compressor.finish())
+            per_event_us = (time.perf_counter() - started) / (rounds * len(frames)) * 1e6
+            print(
+                f"level={level} {encoding:<8} bytes/request={total_bytes:>6} "
+                f"({total_bytes / raw_bytes:.0%} of identity) added latency/event={per_event_us:.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Author: Peng Fei
+# Build the memory-mapped skill index from the skill taxonomy JSON
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tools.skill_taxonomy import (
+    DEFAULT_INDEX_PATH, DEFAULT_TAXONOMY_PATH, SkillIndex, build_index, build_index_from_taxonomy
+)
+
+
+def synthetic_skills(count: int) -> list:
+    """Generate a large taxonomy to measure load and lookup times at scale"""
+    return [
+        {"name": f"Skill {i}", "category": "technical", "aliases": [f"skill-{i}", f"skill {i} framework"]}
+        for i in range(count)
+    ]
+
+
+def report(index_path: Path, samples: list):
+    """Time mapping the index and resolving a few lookups"""
+    started = time.perf_counter()
+    index = SkillIndex.open(index_path)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for sample in samples:
+        index._lookup(sample)
+    lookup_us = (time.perf_counter() - started) * 1e6 / len(samples)
+
+    print(f"{index_path}: {index.skill_count} skills, {index.key_count} keys, {index_path.stat().st_size} bytes")
+    print(f"  open: {load_ms:.2f} ms, uncached lookup: {lookup_us:.1f} us")
+
+
+def main():
+    """Build the index file"""
+    parser = argparse.ArgumentParser(description="Build the skill index")
+    parser.add_argument("--taxonomy", default=str(DEFAULT_TAXONOMY_PATH), help="Taxonomy JSON file")
+    parser.add_argument("--output", default=str(DEFAULT_INDEX_PATH), help="Index file to write")
+    parser.add_argument("--synthetic", type=int, default=0, help="Build a synthetic taxonomy of N skills instead")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        data = build_index(synthetic_skills(args.synthetic))
+        samples = ["skill-42", f"Skill {args.synthetic - 1} framework", "skil 4242", "unknown thing"]
+    else:
+        data = build_index_from_taxonomy(Path(args.taxonomy))
+        samples = ["Python3", "python programming", "ReactJS", "Kubernets", "team player", "unknown thing"]
+
+    output = Path(args.output)
+    output.write_bytes(data)
+    report(output, samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Author: Peng Fei
+# Check JD compaction against fixtures: requirement terms kept, boilerplate removed
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tools.text_compactor import compact_job_description
+
+FIXTURE_DIR = project_root / "tests" / "fixtures" / "compaction"
+
+
+def _flatten_requirements(parsed: dict) -> set:
+    """Collect every extracted item of a parse_job_description result"""
+    must_have = parsed.get("must_have", {})
+    items = []
+    for key in ("technical_skills", "domain_experience", "soft_skills"):
+        items.extend(must_have.get(key, []))
+    items.extend(parsed.get("nice_to_have", []))
+    return {str(item).strip().lower() for item in items}
+
+
+def check_fixture(fixture: dict) -> list:
+    """
+    Compact one fixture and list the problems found
+
+    Args:
+        fixture: Fixture with jd_text, must_keep, must_drop and optional max_occurrences
+
+    Returns:
+        list: Problem descriptions, empty when the fixture passes
+    """
+    result = compact_job_description(fixture["jd_text"])
+    text = result["text"]
+    problems = [f"lost '{term}'" for term in fixture["must_keep"] if term not in text]
+    problems += [f"kept '{term}'" for term in fixture["must_drop"] if term in text]
+    for term, limit in fixture.get("max_occurrences", {}).items():
+        if text.count(term) > limit:
+            problems.append(f"'{term}' appears {text.count(term)} times")
+    print(
+        f"{fixture['name']}: {result['original_tokens']} -> {result['compacted_tokens']} tokens "
+        f"(saved {result['tokens_saved']}) {'OK' if not problems else 'FAIL'}"
+    )
+    return problems
+
+
+def compare_extraction(fixture: dict):
+    """Run the LLM parser on raw and compacted text and report item recall"""
+    from tools.llm_tools import LLMTools
+
+    llm_tools = LLMTools()
+    raw_items = _flatten_requirements(llm_tools.parse_job_description(fixture["jd_text"]))
+    compacted = compact_job_description(fixture["jd_text"])["text"]
+    compacted_items = _flatten_requirements(llm_tools.parse_job_description(compacted))
+    recall = len(raw_items & compacted_items) / len(raw_items) if raw_items else 1.0
+    print(f"  extraction recall vs raw input: {recall:.0%} ({len(compacted_items)}/{len(raw_items)} items)")
+
+
+def main():
+    """Check all compaction fixtures"""
+    parser = argparse.ArgumentParser(description="Check JD compaction fixtures")
+    parser.add_argument("--llm", action="store_true", help="Also compare LLM extraction on raw vs compacted text")
+    args = parser.parse_args()
+
+    failures = 0
+    for path in sorted(FIXTURE_DIR.glob("*.json")):
+        fixture = json.loads(path.read_text(encoding="utf-8"))
+        problems = check_fixture(fixture)
+        for problem in problems:
+            print(f"  {problem}")
+        failures += bool(problems)
+        if args.llm:
+            compare_extraction(fixture)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
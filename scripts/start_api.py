@@ -25,7 +25,12 @@ def main():
     print(f"Starting FastAPI SSE server on {host}:{port}")
     print("Available endpoints:")
     print("  POST /api/process-jd - Stream job description processing")
+    print("  POST /api/jobs       - Enqueue job description processing")
+    print("  GET  /api/jobs/{id}  - Job status and result")
+    print("  GET  /api/jobs/{id}/events - Job progress stream")
     print("  GET  /api/health     - Health check")
+    print("  GET  /api/metrics    - Service metrics")
+    print("  GET  /api/routing    - Per-stage model latency and cost")
     print("  GET  /docs           - API documentation")
     print("  GET  /redoc          - Alternative API documentation")
     
@@ -0,0 +1,6 @@
+# Author: Peng Fei
+# Shared test setup: settings need an API key at import time, never used by the unit tests
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
@@ -0,0 +1,216 @@
+# Author: Peng Fei
+# Admission control: limits, and capacity returned on every way a run can end
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from api import sse_service as sse_service_module
+from api.sse_service import SSEService
+from utils.admission import AdmissionController, AdmissionRejected, ClientRateLimiter, LatencyWindow
+
+JD_TEXT = "Senior Backend Engineer\nPython, Docker and Kubernetes."
+
+
+def make_controller(**overrides) -> AdmissionController:
+    options = dict(max_in_flight=2, max_in_flight_per_client=1, max_queued_tokens=1000,
+                   target_latency_seconds=0, latency=LatencyWindow())
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_per_client_and_total_limits():
+    admission = make_controller()
+    admission.admit("a", 10)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("a", 10)
+    assert rejected.value.status_code == 429
+    admission.admit("b", 10)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("c", 10)
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 1
+
+    admission.release("a", 10)
+    admission.release("b", 10)
+    assert (admission.in_flight, admission.queued_tokens) == (0, 0)
+    admission.admit("a", 10)
+
+
+def test_token_budget_admits_one_oversized_request_when_idle():
+    admission = make_controller(max_in_flight_per_client=5)
+    admission.admit("a", 5000)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("b", 1)
+    assert rejected.value.status_code == 503
+
+
+def test_in_flight_limit_shrinks_while_upstream_is_slow():
+    latency = LatencyWindow()
+    admission = make_controller(max_in_flight=10, target_latency_seconds=2, latency=latency)
+    assert admission.in_flight_limit() == 10
+    for _ in range(10):
+        latency.observe(8)
+    assert admission.in_flight_limit() == 2
+
+
+def test_client_rate_limiter_refuses_past_burst():
+    limiter = ClientRateLimiter(rate_per_second=1, burst=2)
+    limiter.acquire("a")
+    limiter.acquire("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.acquire("a")
+    assert (rejected.value.status_code, rejected.value.retry_after) == (429, 1)
+    limiter.acquire("b")
+    ClientRateLimiter(rate_per_second=0, burst=1).acquire("a")
+
+
+class FakePipeline:
+    """Stands in for the LLM pipeline: finishes, fails, or waits until released"""
+
+    def __init__(self, outcome: str):
+        self.outcome = outcome
+        self.release = asyncio.Event()
+
+    async def __call__(self, jd_text: str, **options):
+        yield {"event": "progress", "data": json.dumps({"step": "analyzing", "progress": 20})}
+        if self.outcome == "fail":
+            raise RuntimeError("upstream broke")
+        if self.outcome == "wait":
+            await self.release.wait()
+        yield {"event": "complete", "data": json.dumps({"step": "complete", "progress": 100})}
+
+
+def make_service(outcome: str):
+    service = SSEService()
+    service._stream_jd_processing = FakePipeline(outcome)
+    return service
+
+
+def client_for(service: SSEService) -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=service.create_app(), raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+async def finish_runs(service: SSEService):
+    await asyncio.gather(*(run.task for run in service.runs.runs.values() if run.task), return_exceptions=True)
+
+
+def assert_released(service: SSEService):
+    assert service.admission.in_flight == 0
+    assert service.admission.queued_tokens == 0
+    assert service.admission._per_client == {}
+
+
+@pytest.mark.parametrize("outcome", ["complete", "fail"])
+def test_capacity_returned_when_run_ends(outcome):
+    async def scenario():
+        service = make_service(outcome)
+        async with client_for(service) as client:
+            response = await client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"})
+        await finish_runs(service)
+        assert response.status_code == 200
+        assert_released(service)
+
+    asyncio.run(scenario())
+
+
+def test_capacity_returned_when_run_cannot_start():
+    async def scenario():
+        service = make_service("complete")
+
+        def broken_start(events, run_id=None):
+            raise RuntimeError("registry unavailable")
+
+        service.runs.start = broken_start
+        async with client_for(service) as client:
+            response = await client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"})
+        assert response.status_code == 500
+        assert_released(service)
+
+    asyncio.run(scenario())
+
+
+def test_capacity_returned_when_drain_cuts_run_off():
+    async def scenario():
+        service = make_service("wait")
+        async with client_for(service) as client:
+            request = asyncio.create_task(client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"}))
+            while service.admission.in_flight == 0:
+                await asyncio.sleep(0.01)
+            await service.drain(0)
+            response = await request
+        assert response.status_code == 200
+        assert "Server is shutting down" in response.text
+        assert_released(service)
+
+    asyncio.run(scenario())
+
+
+def test_rejected_request_holds_no_capacity():
+    async def scenario():
+        service = make_service("wait")
+        service.admission.max_in_flight_per_client = 1
+        async with client_for(service) as client:
+            first = asyncio.create_task(client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"}))
+            while service.admission.in_flight == 0:
+                await asyncio.sleep(0.01)
+            second = await client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"})
+            assert second.status_code == 429
+            assert second.headers["retry-after"]
+            assert service.admission.in_flight == 1
+            service._stream_jd_processing.release.set()
+            await first
+        await finish_runs(service)
+        assert_released(service)
+
+    asyncio.run(scenario())
+
+
+def test_profiled_request_without_admin_token_is_not_admitted(monkeypatch):
+    monkeypatch.setattr(sse_service_module, "PROFILE_REQUESTS_ENABLED", True)
+    monkeypatch.setattr(sse_service_module, "ADMIN_TOKEN", "secret")
+
+    async def scenario():
+        service = make_service("complete")
+        async with client_for(service) as client:
+            response = await client.post(
+                "/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"}, headers={"X-Profile": "1"}
+            )
+        assert response.status_code == 403
+        assert_released(service)
+        assert not service.runs.runs
+
+    asyncio.run(scenario())
+
+
+def test_second_profiled_request_is_refused_while_one_runs(monkeypatch):
+    monkeypatch.setattr(sse_service_module, "PROFILE_REQUESTS_ENABLED", True)
+    monkeypatch.setattr(sse_service_module, "ADMIN_TOKEN", "secret")
+    headers = {"X-Profile": "1", "X-Admin-Token": "secret"}
+
+    async def scenario():
+        service = make_service("wait")
+        service.admission.max_in_flight_per_client = 2
+        async with client_for(service) as client:
+            first = asyncio.create_task(
+                client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"}, headers=headers)
+            )
+            while service.admission.in_flight == 0:
+                await asyncio.sleep(0.01)
+            second = await client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"}, headers=headers)
+            assert second.status_code == 409
+            assert service.admission.in_flight == 1
+            service._stream_jd_processing.release.set()
+            profile_id = (await first).headers["x-profile-id"]
+            await finish_runs(service)
+            profile = await client.get(f"/api/debug/profile/{profile_id}", headers=headers)
+            assert profile.status_code == 200
+            third = await client.post("/api/process-jd", json={"jd_text": JD_TEXT, "mode": "full"}, headers=headers)
+            assert third.status_code == 200
+        await finish_runs(service)
+        assert_released(service)
+
+    asyncio.run(scenario())
@@ -0,0 +1,141 @@
+# Author: Peng Fei
+# Circuit breaker state transitions, driven by a fake clock
+
+import pytest
+
+from utils import circuit_breaker as circuit_breaker_module
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker_module, "time", fake)
+    return fake
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(failure_rate=0.5, slow_call_seconds=10, slow_call_rate=0.5, window_seconds=60,
+                   min_calls=4, open_seconds=30, probe_timeout_seconds=20)
+    options.update(overrides)
+    return CircuitBreaker("test-model", **options)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.min_calls):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate_and_rejects(clock):
+    breaker = make_breaker()
+    breaker.record_success(1)
+    breaker.record_success(1)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.allow()
+    assert rejected.value.retry_after == pytest.approx(30)
+    assert not breaker.available()
+
+
+def test_opens_on_slow_call_rate(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_success(11)
+    assert breaker.state == OPEN
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["calls"] == 1
+
+
+def test_single_probe_after_open_period(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    assert breaker.available()
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.available()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_successful_probe_closes_with_clean_window(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success(1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["calls"] == 0
+    breaker.allow()
+
+
+@pytest.mark.parametrize("outcome", ["failure", "slow"])
+def test_failed_or_slow_probe_reopens(clock, outcome):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    breaker.allow()
+    if outcome == "failure":
+        breaker.record_failure()
+    else:
+        breaker.record_success(11)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    clock.now += 30
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_abandoned_probe_expires(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    # The probe's caller gives up and never records an outcome
+    breaker.allow()
+    clock.now += 19
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    clock.now += 1
+    assert breaker.available()
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # The replacement probe is the only one in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success(1)
+    assert breaker.state == CLOSED
+
+
+def test_probe_timeout_defaults_to_slow_call_threshold():
+    assert make_breaker(probe_timeout_seconds=0).probe_timeout_seconds == 10
+    assert make_breaker(probe_timeout_seconds=0, slow_call_seconds=0).probe_timeout_seconds == 30
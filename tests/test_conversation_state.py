@@ -0,0 +1,122 @@
+# Author: Peng Fei
+# Conversation turns: relevant field selection, local patches, and closed sessions
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agent_modules.orchestrator import OrchestratorAgent
+from tools.llm_tools import LLMTools
+from utils.conversation_state import LIST_FIELDS, TEXT_FIELDS, apply_patch, relevant_fields
+
+INFO = {
+    "title": "Backend Engineer",
+    "description": "Builds payment services",
+    "must_have": {"technical_skills": ["Python", "Docker"], "domain_experience": ["Payments"], "soft_skills": []},
+    "nice_to_have": ["Kubernetes"]
+}
+
+
+@pytest.mark.parametrize("response, question, fields", [
+    ("What is the primary role type?:Technical;", None, ["title"]),
+    ("Which programming languages?:Go;Which industry?:Fintech;", None, ["technical_skills", "domain_experience"]),
+    # A known question wins over the answer text
+    ("Go, mostly", "Any nice to have skills?", ["nice_to_have"]),
+    ("Go, mostly", None, list(TEXT_FIELDS + LIST_FIELDS)),
+    ("What is your favourite colour?:Blue;", None, list(TEXT_FIELDS + LIST_FIELDS)),
+])
+def test_relevant_fields(response, question, fields):
+    assert relevant_fields(response, question) == fields
+
+
+def test_set_replaces_text_and_list_fields():
+    updated = apply_patch(INFO, {"set": {"title": "Staff Engineer", "technical_skills": ["Go"], "salary": "high"}})
+    assert updated["title"] == "Staff Engineer"
+    assert updated["must_have"]["technical_skills"] == ["Go"]
+    assert "salary" not in updated
+    # The input is left untouched
+    assert INFO["title"] == "Backend Engineer"
+    assert INFO["must_have"]["technical_skills"] == ["Python", "Docker"]
+
+
+def test_add_skips_items_already_present_in_any_case():
+    updated = apply_patch(INFO, {"add": {"technical_skills": ["python", "Go", "go"], "nice_to_have": "Terraform"}})
+    assert updated["must_have"]["technical_skills"] == ["Python", "Docker", "Go"]
+    assert updated["nice_to_have"] == ["Kubernetes", "Terraform"]
+
+
+def test_remove_matches_in_any_case():
+    updated = apply_patch(INFO, {"remove": {"technical_skills": ["docker"], "nice_to_have": "KUBERNETES"}})
+    assert updated["must_have"]["technical_skills"] == ["Python"]
+    assert updated["nice_to_have"] == []
+
+
+def test_patch_on_missing_info_starts_from_empty_requirements():
+    updated = apply_patch(None, {"set": {"title": "Data Analyst"}, "add": {"soft_skills": ["Communication"]}})
+    assert updated["title"] == "Data Analyst"
+    assert updated["must_have"] == {"technical_skills": [], "domain_experience": [], "soft_skills": ["Communication"]}
+    assert updated["nice_to_have"] == []
+
+
+class FakeCompletions:
+    """Stands in for LLMTools.complete, answering with fixed content and recording the prompts"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.messages = []
+
+    def __call__(self, stage: str, messages):
+        self.messages.append(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+def llm_tools_answering(content: str) -> LLMTools:
+    llm_tools = LLMTools()
+    llm_tools.complete = FakeCompletions(content)
+    return llm_tools
+
+
+def test_patch_answer_is_applied_locally_with_only_relevant_fields_sent():
+    llm_tools = llm_tools_answering(json.dumps({"add": {"technical_skills": ["Go"]}, "is_complete": False}))
+    result = llm_tools.parse_user_response("Go as well", INFO, question="Which programming languages?")
+    assert result["updated_info"]["must_have"]["technical_skills"] == ["Python", "Docker", "Go"]
+    assert result["updated_info"]["title"] == "Backend Engineer"
+    assert result["is_complete"] is False
+    prompt = json.dumps(llm_tools.complete.messages[0])
+    assert "Docker" in prompt
+    assert "Payments" not in prompt
+
+
+def test_full_document_answer_replaces_the_requirements():
+    full = dict(INFO, title="Platform Engineer")
+    llm_tools = llm_tools_answering(json.dumps({"updated_info": full, "is_complete": True}))
+    result = llm_tools.parse_user_response("It is a platform role", INFO)
+    assert result == {"updated_info": full, "is_complete": True}
+
+
+def test_unreadable_answer_keeps_the_requirements():
+    llm_tools = llm_tools_answering("not json")
+    result = llm_tools.parse_user_response("Go as well", INFO)
+    assert result == {"updated_info": INFO, "is_complete": False}
+
+
+def test_answers_for_a_closed_session_are_rejected():
+    orchestrator = OrchestratorAgent()
+    calls = []
+
+    def parse_user_response(response, current_info, question=None):
+        calls.append(response)
+        return {"updated_info": apply_patch(current_info, {"set": {"title": "Backend Engineer"}}), "is_complete": True}
+
+    orchestrator.llm_tools.parse_user_response = parse_user_response
+    session_id = orchestrator.session_manager.create_session()
+    result = orchestrator.process_user_response(session_id, "What is the role?:Backend Engineer;")
+    assert result["requirements"]["title"] == "Backend Engineer"
+
+    with pytest.raises(ValueError):
+        orchestrator.process_user_response(session_id, "What is the role?:Frontend Engineer;")
+    assert calls == ["What is the role?:Backend Engineer;"]
+    conversation = orchestrator.session_manager.get_conversation(session_id)
+    assert conversation["requirements"]["title"] == "Backend Engineer"
+    assert conversation["turns"] == 1
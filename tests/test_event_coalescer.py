@@ -0,0 +1,131 @@
+# Author: Peng Fei
+# Chunk coalescing: batching, flush triggers, and closing upstream
+
+import asyncio
+
+import pytest
+
+from utils.event_coalescer import coalesce_chunks
+
+
+class Upstream:
+    """Async generator of events with optional delays, recording whether it was closed"""
+
+    def __init__(self, events, delay: float = 0.0, error: Exception = None):
+        self.events = events
+        self.delay = delay
+        self.error = error
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for event in self.events:
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                yield event
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+def chunk(text: str, kind: str = "content_chunk"):
+    return {"type": kind, "content": text, "message": "Parsing..."}
+
+
+def collect(events, **options):
+    async def scenario():
+        return [event async for event in coalesce_chunks(events, **options)]
+    return asyncio.run(scenario())
+
+
+def test_batches_chunks_and_passes_structural_events_through():
+    upstream = Upstream([chunk("a"), chunk("b"), {"type": "section_complete", "section": "title"}, chunk("c")])
+    events = collect(upstream.stream(), window_ms=1000)
+    assert [(e["type"], e.get("content"), e.get("chunks")) for e in events] == [
+        ("content_chunk", "ab", 2),
+        ("section_complete", None, None),
+        ("content_chunk", "c", 1),
+    ]
+    assert upstream.closed
+
+
+def test_flushes_on_size_and_on_kind_change():
+    upstream = Upstream([chunk("aaaa"), chunk("bbbb"), chunk("c"), chunk("d", "analysis_chunk")])
+    events = collect(upstream.stream(), window_ms=1000, max_bytes=8)
+    assert [(e["type"], e["content"]) for e in events] == [
+        ("content_chunk", "aaaabbbb"), ("content_chunk", "c"), ("analysis_chunk", "d")
+    ]
+
+
+def test_flushes_when_window_elapses_while_upstream_is_quiet():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def stream():
+            yield chunk("a")
+            await release.wait()
+            yield chunk("b")
+
+        received = []
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async for event in coalesce_chunks(stream(), window_ms=30):
+            received.append((event["content"], loop.time() - started))
+            release.set()
+        return received
+
+    received = asyncio.run(scenario())
+    assert [content for content, _ in received] == ["a", "b"]
+    assert received[0][1] < 0.5
+
+
+def test_disabled_window_passes_every_event():
+    upstream = Upstream([chunk("a"), chunk("b")])
+    assert [e["content"] for e in collect(upstream.stream(), window_ms=0)] == ["a", "b"]
+    assert upstream.closed
+
+
+def test_upstream_error_is_raised_after_earlier_events():
+    async def scenario():
+        received = []
+        with pytest.raises(RuntimeError):
+            async for event in coalesce_chunks(
+                Upstream([{"type": "section_complete"}], error=RuntimeError("boom")).stream(), window_ms=30
+            ):
+                received.append(event["type"])
+        return received
+
+    assert asyncio.run(scenario()) == ["section_complete"]
+
+
+@pytest.mark.parametrize("window_ms", [0, 30])
+def test_early_exit_closes_upstream(window_ms):
+    async def scenario():
+        upstream = Upstream([{"type": "section_complete"}] * 100, delay=0.001)
+        events = coalesce_chunks(upstream.stream(), window_ms=window_ms)
+        async for _ in events:
+            break
+        await events.aclose()
+        return upstream.closed
+
+    assert asyncio.run(scenario())
+
+
+def test_one_reader_task_however_many_chunks():
+    async def scenario():
+        tasks_seen = set()
+
+        async def stream():
+            for _ in range(200):
+                await asyncio.sleep(0)
+                tasks_seen.update(asyncio.all_tasks())
+                yield chunk("x")
+
+        events = [event async for event in coalesce_chunks(stream(), window_ms=20, max_bytes=10)]
+        return events, tasks_seen
+
+    events, tasks_seen = asyncio.run(scenario())
+    assert sum(event["chunks"] for event in events) == 200
+    # The main task and the single reader
+    assert len(tasks_seen) == 2
@@ -0,0 +1,146 @@
+# Author: Peng Fei
+# Per-subscriber event queue: drop and merge policy, and event order across resumption
+
+import asyncio
+import json
+
+from utils.event_queue import MAX_MERGED_CHUNK_CHARS, BoundedEventQueue
+from utils.run_registry import StreamRun
+
+
+def chunk(text: str):
+    return {"event": "content_chunk", "data": json.dumps({"type": "content_chunk", "content": text})}
+
+
+def progress(step: int):
+    return {"event": "progress", "data": json.dumps({"step": "parsing", "progress": step})}
+
+
+def complete():
+    return {"event": "complete", "data": json.dumps({"step": "complete", "progress": 100})}
+
+
+def drain(queue: BoundedEventQueue):
+    async def scenario():
+        queue.close()
+        items = []
+        while True:
+            item = await queue.get()
+            if item is None:
+                return items
+            items.append(item)
+    return asyncio.run(scenario())
+
+
+def describe(items):
+    """(seq, event type, content or progress) for each queued event"""
+    described = []
+    for seq, event in items:
+        data = json.loads(event["data"])
+        described.append((seq, event["event"], data.get("content", data.get("progress"))))
+    return described
+
+
+def test_chunk_merges_into_chunk_right_before_it():
+    queue = BoundedEventQueue(max_events=2)
+    queue.put(1, progress(10))
+    queue.put(2, chunk("a"))
+    queue.put(3, chunk("b"))
+    queue.put(4, chunk("c"))
+    assert describe(drain(queue)) == [(1, "progress", 10), (4, "content_chunk", "abc")]
+
+
+def test_chunk_never_merges_across_another_event():
+    queue = BoundedEventQueue(max_events=2)
+    queue.put(1, chunk("a"))
+    queue.put(2, progress(10))
+    queue.put(3, chunk("b"))
+    # The progress event is dropped instead; merging "b" into "a" would put id 3 before id 2
+    assert describe(drain(queue)) == [(1, "content_chunk", "a"), (3, "content_chunk", "b")]
+
+
+def test_neighbouring_chunks_merge_to_make_room_for_other_events():
+    queue = BoundedEventQueue(max_events=2)
+    queue.put(1, chunk("a"))
+    queue.put(2, chunk("b"))
+    queue.put(3, progress(50))
+    assert describe(drain(queue)) == [(2, "content_chunk", "ab"), (3, "progress", 50)]
+
+
+def test_oldest_chunk_dropped_once_merges_are_full():
+    big = "x" * MAX_MERGED_CHUNK_CHARS
+    queue = BoundedEventQueue(max_events=2)
+    queue.put(1, chunk(big))
+    queue.put(2, chunk(big))
+    queue.put(3, chunk("c"))
+    assert [seq for seq, _ in drain(queue)] == [2, 3]
+
+
+def test_essential_events_kept_past_capacity():
+    queue = BoundedEventQueue(max_events=1)
+    queue.put(1, progress(10))
+    queue.put(2, progress(20))
+    queue.put(3, complete())
+    queue.put(4, {"event": "error", "data": json.dumps({"error": "boom"})})
+    assert [event["event"] for _, event in drain(queue)] == ["complete", "error"]
+
+
+def test_subscribers_merge_the_same_events_independently():
+    first, second = BoundedEventQueue(max_events=1), BoundedEventQueue(max_events=3)
+    for seq, text in enumerate("abc", start=1):
+        event = chunk(text)
+        first.put(seq, event)
+        second.put(seq, event)
+    assert describe(drain(first)) == [(3, "content_chunk", "abc")]
+    assert describe(drain(second)) == [(1, "content_chunk", "a"), (2, "content_chunk", "b"), (3, "content_chunk", "c")]
+
+
+def publish_mixed(run: StreamRun, count: int):
+    for index in range(count):
+        run.publish(chunk(str(index % 10)) if index % 3 else progress(index))
+
+
+def test_slow_subscriber_gets_ids_in_order_and_every_chunk():
+    async def scenario():
+        run = StreamRun("run", max_events=256, max_queued_events=4)
+        received = []
+
+        async def read():
+            async for item in run.subscribe():
+                received.append(item)
+
+        reader = asyncio.create_task(read())
+        await asyncio.sleep(0)
+        publish_mixed(run, 60)
+        run.finish()
+        await reader
+        return received
+
+    received = asyncio.run(scenario())
+    seqs = [seq for seq, _ in received]
+    assert seqs == sorted(set(seqs))
+    content = "".join(text for _, kind, text in describe(received) if kind == "content_chunk")
+    assert content == "".join(str(index % 10) for index in range(60) if index % 3)
+
+
+def test_resume_after_last_event_id_neither_skips_nor_repeats():
+    async def scenario():
+        run = StreamRun("run", max_events=256, max_queued_events=4)
+        publish_mixed(run, 30)
+        first = []
+        async for item in run.subscribe():
+            first.append(item)
+            if len(first) == 2:
+                break
+        last_seq = first[-1][0]
+        publish_mixed(run, 30)
+        run.finish()
+        resumed = [item async for item in run.subscribe(after_seq=last_seq)]
+        return first, resumed
+
+    first, resumed = asyncio.run(scenario())
+    seqs = [seq for seq, _ in first + resumed]
+    assert seqs == sorted(set(seqs))
+    assert resumed[-1][0] == 60
+    content = "".join(text for _, kind, text in describe(first + resumed) if kind == "content_chunk")
+    assert content == "".join(str(index % 10) for index in range(30) if index % 3) * 2
@@ -0,0 +1,226 @@
+# Author: Peng Fei
+# Job queue bounds and the shutdown drain of queued and running jobs
+
+import asyncio
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from api.sse_service import SSEService
+from utils.job_queue import (
+    JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, RESULT_DEGRADED, RESULT_FAST, RESULT_FULL, RESULT_PARTIAL,
+    Job, JobQueue, JobQueueFull, SQLiteJobStore
+)
+from utils.run_registry import RunRegistry
+
+
+class BlockingProcessor:
+    """Job processor whose jobs run until released"""
+
+    def __init__(self):
+        self.started = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, jd_text: str, **options):
+        self.started.append(jd_text)
+        yield {"event": "progress", "data": json.dumps({"step": "parsing", "progress": 40})}
+        await self.release.wait()
+        yield {"event": "complete", "data": json.dumps({"step": "complete", "result": {"title": jd_text}})}
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def make_queue(processor, **overrides) -> JobQueue:
+    options = dict(workers=1, max_queued=10, max_queued_per_client=10)
+    options.update(overrides)
+    return JobQueue(RunRegistry(), processor, **options)
+
+
+def test_submit_refuses_over_client_limit_and_full_queue():
+    async def scenario():
+        processor = BlockingProcessor()
+        queue = make_queue(processor, max_queued=2, max_queued_per_client=2)
+        await queue.start()
+        first = queue.submit("job 1", {"client_id": "a"})
+        await wait_for(lambda: processor.started)
+        queue.submit("job 2", {"client_id": "a"})
+        with pytest.raises(JobQueueFull) as rejected:
+            queue.submit("job 3", {"client_id": "a"})
+        assert rejected.value.status_code == 429
+        queue.submit("job 3", {"client_id": "b"})
+        with pytest.raises(JobQueueFull) as rejected:
+            queue.submit("job 4", {"client_id": "c"})
+        assert rejected.value.status_code == 503
+        assert rejected.value.retry_after >= 1
+
+        processor.release.set()
+        await wait_for(lambda: queue._per_client == {})
+        assert first.status == JOB_COMPLETED
+        assert first.result == {"title": "job 1"}
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_accepting_lets_running_job_finish_and_leaves_queued_jobs():
+    async def scenario():
+        processor = BlockingProcessor()
+        queue = make_queue(processor)
+        await queue.start()
+        running = queue.submit("job 1")
+        waiting = queue.submit("job 2")
+        await wait_for(lambda: processor.started)
+
+        queue.stop_accepting()
+        processor.release.set()
+        await wait_for(lambda: running.status == JOB_COMPLETED)
+        await asyncio.sleep(0.05)
+        assert waiting.status == JOB_QUEUED
+        assert processor.started == ["job 1"]
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def make_service(processor, store_path: str = "") -> SSEService:
+    service = SSEService()
+    service.jobs = JobQueue(service.runs, processor, workers=1, store_path=store_path)
+    return service
+
+
+def test_drain_waits_for_running_job():
+    async def scenario():
+        processor = BlockingProcessor()
+        service = make_service(processor)
+        await service.jobs.start()
+        job = service.jobs.submit("job 1")
+        await wait_for(lambda: processor.started)
+
+        asyncio.get_running_loop().call_later(0.05, processor.release.set)
+        await service.drain(2)
+        assert job.status == JOB_COMPLETED
+        await service.jobs.stop()
+
+    asyncio.run(scenario())
+
+
+def test_drain_deadline_fails_job_kept_in_memory():
+    async def scenario():
+        processor = BlockingProcessor()
+        service = make_service(processor)
+        await service.jobs.start()
+        job = service.jobs.submit("job 1")
+        await wait_for(lambda: processor.started)
+
+        await service.drain(0.05)
+        assert job.status == JOB_FAILED
+        assert job.error == "Interrupted by server shutdown"
+        assert service.jobs._per_client == {}
+        events = [event async for _, event in service.jobs.run_for(job.job_id).subscribe()]
+        assert json.loads(events[-1]["data"])["retryable"] is True
+        await service.jobs.stop()
+
+    asyncio.run(scenario())
+
+
+def test_drain_deadline_requeues_persisted_job(tmp_path):
+    store_path = str(tmp_path / "jobs.db")
+
+    async def interrupted_process() -> str:
+        processor = BlockingProcessor()
+        service = make_service(processor, store_path)
+        await service.jobs.start()
+        job = service.jobs.submit("job 1")
+        await wait_for(lambda: processor.started)
+        await service.drain(0.05)
+        assert job.status == JOB_QUEUED
+        await service.jobs.stop()
+        return job.job_id
+
+    async def next_process(job_id: str):
+        processor = BlockingProcessor()
+        processor.release.set()
+        queue = make_queue(processor, store_path=store_path)
+        await queue.start()
+        await wait_for(lambda: queue.jobs[job_id].status == JOB_COMPLETED)
+        assert (await queue.get(job_id)).result == {"title": "job 1"}
+        await queue.stop()
+
+    job_id = asyncio.run(interrupted_process())
+    store = SQLiteJobStore(store_path)
+    assert [job.job_id for job in store.unfinished()] == [job_id]
+    store.close()
+    asyncio.run(next_process(job_id))
+
+
+def test_save_writes_the_job_as_it_was_when_saved(tmp_path):
+    async def scenario():
+        queue = make_queue(BlockingProcessor(), store_path=str(tmp_path / "jobs.db"))
+        writer_busy = threading.Event()
+        queue._store_executor.submit(writer_busy.wait)
+        job = Job("job-1", "job 1")
+        queue._save(job)
+        # Changed on the loop while the write is still pending
+        job.status, job.result = JOB_COMPLETED, {"title": "job 1"}
+        writer_busy.set()
+        await queue.stop()
+
+        store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+        saved = store.load("job-1")
+        store.close()
+        assert (saved.status, saved.result) == (JOB_QUEUED, None)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("payload, kind", [
+    ({}, RESULT_FULL),
+    ({"incomplete": True, "error": "stream ended"}, RESULT_PARTIAL),
+    ({"degraded": {"reason": "upstream_unavailable"}}, RESULT_DEGRADED),
+    ({"mode": "fast"}, RESULT_FAST),
+])
+def test_completed_job_records_result_kind(tmp_path, payload, kind):
+    async def processor(jd_text: str, **options):
+        yield {"event": "complete", "data": json.dumps(dict(payload, step="complete", result={"title": jd_text}))}
+
+    async def scenario():
+        queue = make_queue(processor, store_path=str(tmp_path / "jobs.db"), max_jobs=0)
+        await queue.start()
+        job = queue.submit("job 1")
+        await wait_for(lambda: job.status == JOB_COMPLETED)
+        assert job.to_dict()["result_kind"] == kind
+        assert json.loads(job.final_event()["data"])["result_kind"] == kind
+        # Evicted from memory by max_jobs=0; the store keeps the kind
+        await asyncio.sleep(0.05)
+        queue._evict()
+        stored = await queue.get(job.job_id)
+        assert stored is not job
+        assert (stored.status, stored.result_kind) == (JOB_COMPLETED, kind)
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_store_adds_result_kind_to_older_files(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, status TEXT, jd_text TEXT, options TEXT, created_at REAL, "
+        "started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+    )
+    connection.execute("INSERT INTO jobs VALUES ('old', 'completed', 'text', '{}', 1, 2, 3, '{}', NULL)")
+    connection.commit()
+    connection.close()
+
+    store = SQLiteJobStore(path)
+    assert store.load("old").result_kind is None
+    store.save(Job("new", "text"))
+    assert store.load("new").status == JOB_QUEUED
+    store.close()
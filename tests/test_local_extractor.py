@@ -0,0 +1,95 @@
+# Author: Peng Fei
+# Local extraction: section kinds, must-have precedence, years phrases and short aliases
+
+import pytest
+
+from tools.local_extractor import (
+    GENERAL, IGNORED, PREFERRED, REQUIRED, extract_requirements, find_skills, find_years_of_experience, section_kind
+)
+
+
+@pytest.mark.parametrize("line, kind", [
+    ("Requirements:", REQUIRED),
+    ("## What you'll bring", REQUIRED),
+    ("Nice to have:", PREFERRED),
+    # Checked before required, so a preferred qualifications header is not required
+    ("Preferred Qualifications", PREFERRED),
+    ("Responsibilities:", GENERAL),
+    ("About Us", IGNORED),
+    ("Benefits", IGNORED),
+    ("How to apply:", IGNORED),
+    ("## Salary", IGNORED),
+    # Short content lines are not headers
+    ("Python experience", None),
+    ("Requirements: five years of Python, Docker, Kubernetes and a passion for clean code", None),
+])
+def test_section_kind(line, kind):
+    assert section_kind(line) == kind
+
+
+def test_must_have_wins_over_nice_to_have_in_either_order():
+    text = (
+        "Backend Engineer\n"
+        "Nice to have:\n- Kubernetes\n- Docker\n"
+        "Requirements:\n- Python and Docker\n"
+        "Experience with Kubernetes is a plus.\n"
+    )
+    result = extract_requirements(text)
+    assert result["must_have"]["technical_skills"] == ["Python", "Docker"]
+    assert result["nice_to_have"] == ["Kubernetes"]
+
+
+def test_optional_cue_makes_a_sentence_nice_to_have():
+    result = extract_requirements("Data Engineer\nYou know SQL. Ideally you have used Airflow.")
+    assert result["must_have"]["technical_skills"] == ["SQL"]
+    assert result["nice_to_have"] == ["Apache Airflow"]
+
+
+def test_ignored_sections_are_skipped():
+    text = (
+        "Platform Engineer\n"
+        "About Us\nWe are a Python shop running on Kubernetes.\n"
+        "Requirements:\n- Terraform\n"
+        "Benefits\n- Free Docker workshops\n"
+    )
+    result = extract_requirements(text)
+    assert result["must_have"]["technical_skills"] == ["Terraform"]
+    assert result["nice_to_have"] == []
+
+
+def test_years_requirements_become_domain_experience():
+    result = extract_requirements("Backend Engineer\nRequirements:\n- 5+ years of experience with Python")
+    assert result["must_have"]["domain_experience"] == ["5+ years Python"]
+    assert result["must_have"]["technical_skills"] == ["Python"]
+
+
+@pytest.mark.parametrize("text, found", [
+    ("5+ years of experience with Python", ["5+ years Python"]),
+    ("3-5 years in fintech", ["3-5 years fintech"]),
+    ("at least four years of backend development", ["4+ years backend development"]),
+    ("Minimum of 2 years' professional experience building data pipelines.", ["2+ years data pipelines"]),
+    ("two (2) years of experience in SQL", ["2+ years SQL"]),
+    # A reversed range is read as its minimum
+    ("5 to 3 years of Go", ["5+ years Go"]),
+    # No subject, nothing to require
+    ("10 years", []),
+    ("3 years of experience", []),
+])
+def test_find_years_of_experience(text, found):
+    assert find_years_of_experience(text) == found
+
+
+@pytest.mark.parametrize("text, found", [
+    # Short aliases count only when written as a name
+    ("We write Go and R", ["Go", "R"]),
+    ("we go live soon", []),
+    ("a clean ui", []),
+    # Ambiguous aliases never count on their own, whatever the case
+    ("Send your CV to jobs@example.com", []),
+    ("send your cv", []),
+    # Longer aliases match in any case, and the longest phrase wins
+    ("python, kubernetes and machine learning", ["Python", "Kubernetes", "Machine Learning"]),
+    ("Python and python again", ["Python"]),
+])
+def test_find_skills_short_alias_rules(text, found):
+    assert [name for name, _ in find_skills(text)] == found
@@ -0,0 +1,83 @@
+# Author: Peng Fei
+# Sampling profiler: per-task profiles leave out other tasks' work
+
+import asyncio
+import time
+
+from utils.profiler import SamplingProfiler
+from utils.usage_tracker import in_current_context
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def profiled_work():
+    for _ in range(10):
+        spin(0.02)
+        await asyncio.sleep(0)
+
+
+async def other_work():
+    for _ in range(10):
+        spin(0.02)
+        await asyncio.sleep(0)
+
+
+def test_task_profile_only_samples_that_task():
+    async def scenario():
+        async def run():
+            profiler = SamplingProfiler(interval_ms=1, task=asyncio.current_task())
+            profiler.start()
+            await profiled_work()
+            return profiler.stop()
+
+        collapsed, _ = await asyncio.gather(asyncio.create_task(run()), asyncio.create_task(other_work()))
+        return collapsed
+
+    collapsed = asyncio.run(scenario())
+    assert "profiled_work" in collapsed
+    assert "other_work" not in collapsed
+
+
+def blocking_work():
+    spin(0.1)
+
+
+def other_blocking_work():
+    spin(0.1)
+
+
+def test_task_profile_follows_its_work_into_worker_threads():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        async def run():
+            profiler = SamplingProfiler(interval_ms=1, task=asyncio.current_task())
+            profiler.start()
+            await loop.run_in_executor(None, in_current_context(blocking_work))
+            return profiler.stop()
+
+        async def other():
+            await loop.run_in_executor(None, in_current_context(other_blocking_work))
+
+        collapsed, _ = await asyncio.gather(asyncio.create_task(run()), asyncio.create_task(other()))
+        return collapsed
+
+    collapsed = asyncio.run(scenario())
+    assert ";blocking_work (" in collapsed
+    assert "other_blocking_work" not in collapsed
+
+
+def test_process_profile_samples_every_task():
+    async def scenario():
+        profiler = SamplingProfiler(interval_ms=1)
+        profiler.start()
+        await asyncio.gather(profiled_work(), other_work())
+        return profiler.stop()
+
+    collapsed = asyncio.run(scenario())
+    assert "profiled_work" in collapsed
+    assert "other_work" in collapsed
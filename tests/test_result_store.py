@@ -0,0 +1,71 @@
+# Author: Peng Fei
+# Result store: partial results never displace complete ones, and near-duplicate lookups
+
+from utils.result_store import ResultStore, content_hash
+
+JD_TEXT = (
+    "Senior Backend Engineer. We build payment services for small businesses. You will design and "
+    "operate Python microservices on AWS, own the reconciliation pipeline and mentor junior engineers. "
+    "Requirements: five years of backend development, PostgreSQL, Redis, Docker and Kubernetes, "
+    "and experience with payment systems."
+)
+NEAR_DUPLICATE = JD_TEXT.replace("mentor junior engineers", "mentor two junior engineers")
+COMPLETE = {"title": "Senior Backend Engineer", "must_have": {"technical_skills": ["Python", "Docker"]}}
+PARTIAL = {"title": "Senior Backend Engineer"}
+
+
+def test_complete_result_replaces_partial():
+    store = ResultStore()
+    key = store.put(JD_TEXT, PARTIAL, partial=True)
+    assert store.get(key)["partial"] is True
+    assert store.put(JD_TEXT, COMPLETE) == key
+    assert store.get(key)["requirements"] == COMPLETE
+    assert store.get(key)["partial"] is False
+
+
+def test_partial_result_never_replaces_complete():
+    store = ResultStore()
+    key = store.put(JD_TEXT, COMPLETE)
+    store.put(JD_TEXT, PARTIAL, partial=True)
+    assert store.get(key)["requirements"] == COMPLETE
+    assert store.get(key)["partial"] is False
+
+
+def test_exact_match_reports_partial_entry():
+    store = ResultStore()
+    store.put(JD_TEXT, PARTIAL, partial=True)
+    match = store.find(JD_TEXT, 0.5)
+    assert match["exact"] is True
+    assert match["partial"] is True
+
+
+def test_near_duplicate_of_partial_result_is_not_reused():
+    store = ResultStore()
+    store.put(JD_TEXT, PARTIAL, partial=True)
+    assert store.find(NEAR_DUPLICATE, 0.5) is None
+    store.put(JD_TEXT, COMPLETE)
+    match = store.find(NEAR_DUPLICATE, 0.5)
+    assert match["exact"] is False
+    assert match["requirements"] == COMPLETE
+
+
+def test_evicted_results_leave_the_similarity_index():
+    store = ResultStore(max_entries=1)
+    store.put(JD_TEXT, COMPLETE)
+    store.put("Data Analyst, Marketing. Strong SQL and Excel, three years of analytics.", COMPLETE)
+    assert len(store) == 1
+    assert store.find(NEAR_DUPLICATE, 0.5) is None
+    assert store.similarity_index.signature(content_hash(JD_TEXT)) is None
+
+
+def test_partial_flag_survives_save_and_load(tmp_path):
+    store_path = str(tmp_path / "results.db")
+    store = ResultStore(store_path=store_path)
+    complete_key = store.put(JD_TEXT, COMPLETE)
+    partial_key = store.put("Data Analyst, Marketing. Strong SQL and Excel.", PARTIAL, partial=True)
+    assert store.save() == 2
+
+    restored = ResultStore(store_path=store_path)
+    assert restored.get(complete_key)["partial"] is False
+    assert restored.get(partial_key)["partial"] is True
+    assert restored.find(NEAR_DUPLICATE, 0.5)["content_hash"] == complete_key
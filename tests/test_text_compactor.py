@@ -0,0 +1,42 @@
+# Author: Peng Fei
+# JD compaction fixtures: requirement terms kept, boilerplate removed
+
+import json
+from pathlib import Path
+
+import pytest
+
+from tools.text_compactor import compact_job_description
+
+FIXTURES = sorted((Path(__file__).parent / "fixtures" / "compaction").glob("*.json"))
+
+
+@pytest.fixture(params=FIXTURES, ids=lambda path: path.stem)
+def fixture(request):
+    return json.loads(request.param.read_text(encoding="utf-8"))
+
+
+def test_fixtures_found():
+    assert FIXTURES
+
+
+def test_requirement_terms_kept(fixture):
+    text = compact_job_description(fixture["jd_text"])["text"]
+    assert [term for term in fixture["must_keep"] if term not in text] == []
+
+
+def test_boilerplate_removed(fixture):
+    text = compact_job_description(fixture["jd_text"])["text"]
+    assert [term for term in fixture["must_drop"] if term in text] == []
+
+
+def test_repeated_text_bounded(fixture):
+    text = compact_job_description(fixture["jd_text"])["text"]
+    for term, limit in fixture.get("max_occurrences", {}).items():
+        assert text.count(term) <= limit, term
+
+
+def test_token_counts_add_up(fixture):
+    result = compact_job_description(fixture["jd_text"])
+    assert result["compacted_tokens"] <= result["original_tokens"]
+    assert result["tokens_saved"] == result["original_tokens"] - result["compacted_tokens"]
@@ -0,0 +1,171 @@
+# Author: Peng Fei
+# Map-reduce extraction for very long job descriptions
+
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from tools.text_compactor import split_sections
+from tools.token_estimator import estimate_tokens
+from utils.usage_tracker import in_current_context
+
+MUST_HAVE_KEYS = ("technical_skills", "domain_experience", "soft_skills")
+
+
+def _item_key(item: Any) -> str:
+    """Case- and punctuation-insensitive key used to deduplicate items"""
+    return re.sub(r"[\W_]+", " ", str(item).lower()).strip()
+
+
+def _dedupe(items: List[Any], seen: set) -> List[Any]:
+    result = []
+    for item in items:
+        key = _item_key(item)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+
+def merge_requirements(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge partial requirements extracted from chunks of one job description
+
+    Items are deduplicated across chunks and categories. Anything that is a
+    must-have in one chunk is removed from nice_to_have.
+
+    Args:
+        partials: parse_job_description results, in document order
+
+    Returns:
+        Dict: Merged requirements structure
+    """
+    title = next((p.get("title") for p in partials if p.get("title")), "")
+    # The opening chunk carries the role summary; later chunks only fill gaps
+    description = next((p.get("description") for p in partials if p.get("description")), "")
+
+    seen = set()
+    must_have = {}
+    for key in MUST_HAVE_KEYS:
+        items = []
+        for part in partials:
+            values = (part.get("must_have") or {}).get(key) or []
+            items.extend(values if isinstance(values, list) else [values])
+        must_have[key] = _dedupe(items, seen)
+
+    nice_to_have = []
+    for part in partials:
+        values = part.get("nice_to_have") or []
+        nice_to_have.extend(values if isinstance(values, list) else [values])
+
+    return {
+        "title": title,
+        "description": description,
+        "must_have": must_have,
+        "nice_to_have": _dedupe(nice_to_have, seen)
+    }
+
+
+class ChunkedExtractor:
+    def __init__(self, llm_tools, max_chunk_tokens: int = 1500, max_workers: int = 4):
+        self.llm_tools = llm_tools
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_workers = max_workers
+
+    def split(self, jd_text: str) -> List[str]:
+        """
+        Split a job description at section boundaries into chunks of bounded size
+
+        Args:
+            jd_text: Job description text
+
+        Returns:
+            List: Chunks in document order; later chunks are prefixed with the
+            document's first line so each call knows which role it belongs to
+        """
+        pieces = []
+        for section in split_sections(jd_text.strip()):
+            section_text = "\n".join(section).strip()
+            if estimate_tokens(section_text) <= self.max_chunk_tokens:
+                pieces.append(section_text)
+            else:
+                # Oversized section: fall back to line boundaries
+                pieces.extend(line for line in section if line.strip())
+
+        chunks, current = [], ""
+        for piece in pieces:
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if current and estimate_tokens(candidate) > self.max_chunk_tokens:
+                chunks.append(current)
+                current = piece
+            else:
+                current = candidate
+        if current:
+            chunks.append(current)
+
+        heading = jd_text.strip().split("\n", 1)[0][:200]
+        return [chunks[0]] + [f"{heading}\n\n{chunk}" for chunk in chunks[1:]] if chunks else []
+
+    def extract(self, jd_text: str, cancel_event: threading.Event = None) -> Optional[Dict[str, Any]]:
+        """
+        Extract requirements from all chunks in parallel and merge them
+
+        Args:
+            jd_text: Job description text
+            cancel_event: Optional event that cancels all chunk calls
+
+        Returns:
+            Dict: Merged requirements structure, or None if cancelled
+        """
+        parse = in_current_context(partial(self.llm_tools.parse_job_description, cancel_event=cancel_event))
+        chunks = self.split(jd_text)
+        if len(chunks) <= 1:
+            return parse(jd_text)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            partials = list(executor.map(parse, chunks))
+        if any(p is None for p in partials):
+            return None
+        return merge_requirements(partials)
+
+    async def extract_stream(self, jd_text: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Extract chunks in parallel and yield the merged result after each chunk completes
+
+        Args:
+            jd_text: Job description text
+
+        Yields:
+            Dict: Chunk progress with the requirements merged so far
+        """
+        chunks = self.split(jd_text)
+        partials: List[Any] = [None] * len(chunks)
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(chunks))))
+        parse = in_current_context(self.llm_tools.parse_job_description)
+        
+        async def extract_chunk(index: int, chunk: str):
+            return index, await loop.run_in_executor(executor, parse, chunk)
+        
+        tasks: List[asyncio.Future] = []
+        try:
+            tasks = [asyncio.ensure_future(extract_chunk(index, chunk)) for index, chunk in enumerate(chunks)]
+            for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+                index, result = await next_done
+                partials[index] = result
+                yield {
+                    "type": "chunk_complete",
+                    "chunk": index,
+                    "completed": completed,
+                    "total": len(chunks),
+                    "requirements": merge_requirements([p for p in partials if p is not None])
+                }
+        finally:
+            # The consumer may stop early: drop chunk calls not started yet and never
+            # block the event loop waiting for the ones already running
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
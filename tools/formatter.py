@@ -2,8 +2,9 @@
 # Format conversion tool using LLM to ensure correct output structure
 
 from typing import Dict, Any
-from config.settings import OUTPUT_TEMPLATE, MODEL_NAME, TEMPERATURE, MAX_TOKENS
+from config.settings import OUTPUT_TEMPLATE
 from tools.llm_tools import LLMTools
+from tools.prompt_templates import FORMAT
 
 def format_output(parsed_data: Dict[str, Any], session_id: str = None) -> Dict[str, Any]:
     """
@@ -18,40 +19,9 @@ def format_output(parsed_data: Dict[str, Any], session_id: str = None) -> Dict[s
     """
     llm_tools = LLMTools()
     
-    prompt = f"""
-    Format the following parsed job data into the required output structure.
-    
-    Parsed data:
-    {parsed_data}
-    
-    Session ID: {session_id or ""}
-    
-    Please format into this exact structure:
-    {{
-        "session_id": "session_id",
-        "requirements": {{
-            "title": "job title",
-            "description": "job description",
-            "must_have": {{
-                "technical_skills": [],
-                "domain_experience": [],
-                "soft_skills": []
-            }},
-            "nice_to_have": []
-        }}
-    }}
-    
-    Ensure all fields are properly filled and the structure is exactly as specified.
-    """
-    
-    response = llm_tools.client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": "You are a data formatting specialist."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=TEMPERATURE,
-        max_tokens=MAX_TOKENS
+    response = llm_tools.complete(
+        "format",
+        FORMAT.messages(session_id=session_id or "", parsed_data=parsed_data)
     )
     
     try:
@@ -3,14 +3,108 @@
 
 import json
 import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional
 from openai import OpenAI
-from config.settings import MODEL_NAME, TEMPERATURE, MAX_TOKENS, OPENAI_API_KEY
+from config.settings import (
+    TEMPERATURE, MAX_TOKENS, OPENAI_API_KEY, LLM_MAX_RETRIES, QUESTION_LIBRARY_ENABLED, QUESTION_LIBRARY_PATH
+)
+from tools.model_router import ModelRouter
+from tools.prompt_templates import CLASSIFY, PARSE, QUESTIONS, USER_RESPONSE, VERIFY
+from tools.question_library import get_question_library, missing_fields
+from utils.conversation_state import (
+    apply_patch, compact_json, relevant_fields, select_fields, TEXT_FIELDS, LIST_FIELDS
+)
+from tools.token_estimator import (
+    CLASSIFY_INPUT_TOKENS, estimate_tokens, plan_max_tokens, token_estimator, truncate_to_tokens
+)
+from utils.metrics import metrics
 
 class LLMTools:
     def __init__(self):
         # Use API key from environment variables
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAI(api_key=OPENAI_API_KEY, max_retries=LLM_MAX_RETRIES)
+        self.router = ModelRouter(self.client)
+        if QUESTION_LIBRARY_ENABLED:
+            # Load at startup so the first conversational turn is served from memory
+            get_question_library(QUESTION_LIBRARY_PATH)
+    
+    def complete(self, stage: str, messages: List[Dict[str, str]]):
+        """
+        Send a chat completion with max_tokens sized for the stage's input and output shape
+        
+        Args:
+            stage: Call stage used to pick the output budget
+            messages: Chat messages
+            
+        Returns:
+            ChatCompletion: Provider response
+        """
+        max_tokens = plan_max_tokens(stage, messages)
+        estimated_prompt_tokens = token_estimator.estimate_messages(messages)
+        metrics.observe("token_budget.max_tokens", max_tokens, {"stage": stage})
+        
+        response = self.router.create(
+            stage,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=max_tokens
+        )
+        usage = getattr(response, "usage", None)
+        token_estimator.calibrate(estimated_prompt_tokens, getattr(usage, "prompt_tokens", None))
+        
+        # A budget that cut the JSON short would fall back to defaults, so retry once at the global cap
+        if stage != "classify" and response.choices[0].finish_reason == "length" and max_tokens < MAX_TOKENS:
+            metrics.increment("token_budget.length_retries", labels={"stage": stage})
+            response = self.router.create(
+                stage,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
+            )
+        return response
+    
+    def complete_cancellable(self, stage: str, messages: List[Dict[str, str]], cancel_event: threading.Event) -> Optional[str]:
+        """
+        Stream a chat completion that can be abandoned mid-flight
+        
+        Args:
+            stage: Call stage used to pick the output budget
+            messages: Chat messages
+            cancel_event: Set by another thread to stop the call
+            
+        Returns:
+            str: Completion text, or None if the call was cancelled
+        """
+        prompt_tokens = token_estimator.estimate_messages(messages)
+        if cancel_event.is_set():
+            return None
+        
+        stream = self.router.create(
+            stage,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=plan_max_tokens(stage, messages),
+            stream=True
+        )
+        parts = []
+        try:
+            for chunk in stream:
+                if cancel_event.is_set():
+                    wasted = prompt_tokens + estimate_tokens("".join(parts))
+                    metrics.increment("speculation.cancelled", labels={"stage": stage})
+                    metrics.increment("speculation.wasted_tokens", wasted, {"stage": stage})
+                    metrics.increment("speculation.tokens", wasted, {"stage": stage})
+                    return None
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+        finally:
+            # Closing the response stops the upstream generation
+            stream.close()
+        
+        content = "".join(parts)
+        metrics.increment("speculation.tokens", prompt_tokens + estimate_tokens(content), {"stage": stage})
+        return content
     
     def determine_scenario(self, user_input: str) -> str:
         """
@@ -22,97 +116,35 @@ class LLMTools:
         Returns:
             str: "detailed_jd" or "need_conversation"
         """
-        prompt = f"""
-        Analyze the following user input and determine if it contains detailed job description information.
-
-        User input:
-        {user_input}
-
-        Please determine:
-        1. If the input contains detailed job information including:
-           - Job title/position name
-           - Required skills (technical, soft skills, domain experience)
-           - Experience level or years of experience
-           - Responsibilities or job duties
-           - Any specific requirements or qualifications
-           Then return "detailed_jd"
-        
-        2. If the input is vague, incomplete, or only contains basic information like:
-           - Just a job title without details
-           - General statements without specific requirements
-           - Questions or requests for information
-           Then return "need_conversation"
-
-        Examples:
-        - "Senior Software Engineer with 5+ years Python, JavaScript, Docker, Kubernetes experience" -> "detailed_jd"
-        - "Software Engineer" -> "need_conversation"
-        - "I need a developer" -> "need_conversation"
-
-        Return only one of the above options without any explanation.
-        """
+        # The head of the input is enough to judge its level of detail
+        user_input = truncate_to_tokens(user_input, CLASSIFY_INPUT_TOKENS)
         
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a professional job description analyst. Your task is to determine if a job description is detailed enough for direct processing or needs further conversation to gather more information."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=TEMPERATURE,
-            max_tokens=50
-        )
+        response = self.complete("classify", CLASSIFY.messages(user_input=user_input))
         
         result = response.choices[0].message.content.strip().lower()
         return "detailed_jd" if "detailed_jd" in result else "need_conversation"
     
-    def parse_job_description(self, jd_text: str) -> Dict[str, Any]:
+    def parse_job_description(self, jd_text: str, cancel_event: threading.Event = None) -> Optional[Dict[str, Any]]:
         """
         Use LLM to parse detailed job description into structured format
         
         Args:
             jd_text: Job description text
+            cancel_event: Optional event that cancels a speculative parse mid-flight
             
         Returns:
-            Dict: Parsed structured data
+            Dict: Parsed structured data, or None if cancelled
         """
-        prompt = f"""
-        Analyze the following job description and extract structured information. 
-        Please output in JSON format only, without any explanation text.
-
-        Job Description:
-        {jd_text}
-
-        Please extract the following information and return as JSON:
-        {{
-            "title": "job title",
-            "description": "job description summary",
-            "must_have": {{
-                "technical_skills": ["skill1", "skill2"],
-                "domain_experience": ["experience1", "experience2"],
-                "soft_skills": ["skill1", "skill2"]
-            }},
-            "nice_to_have": ["bonus1", "bonus2"]
-        }}
-
-        Guidelines:
-        1. technical_skills: programming languages, frameworks, tools, etc.
-        2. domain_experience: industry experience, business domain knowledge
-        3. soft_skills: communication, leadership, teamwork, etc.
-        4. nice_to_have: non-essential but preferred skills or experience
-        5. If no information is found for a category, return empty array
-        """
-        
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a professional job description analyst specializing in extracting and categorizing skill requirements."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS
-        )
+        messages = PARSE.messages(jd_text=jd_text)
+        if cancel_event is not None:
+            content = self.complete_cancellable("parse", messages, cancel_event)
+            if content is None:
+                return None
+        else:
+            content = self.complete("parse", messages).choices[0].message.content
         
         try:
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result
         except json.JSONDecodeError:
             return self._get_default_structure()
@@ -127,43 +159,19 @@ class LLMTools:
         Returns:
             Dict: Structured questions with options
         """
-        context = ""
+        # Standard gaps are answered from memory; only unusual ones need the LLM
+        if QUESTION_LIBRARY_ENABLED:
+            library_questions = get_question_library(QUESTION_LIBRARY_PATH).lookup(current_info)
+            metrics.increment("question_library.hits" if library_questions else "question_library.misses")
+            if library_questions:
+                return library_questions
+        
+        context = "Nothing is known about the position yet."
         if current_info:
-            context = f"Current information: {json.dumps(current_info, indent=2)}"
-        
-        prompt = f"""
-        Generate structured questions to gather job requirements information.
+            known = select_fields(current_info, list(TEXT_FIELDS + LIST_FIELDS))
+            context = f"Known: {compact_json(known)}\nMissing: {', '.join(missing_fields(current_info))}"
         
-        {context}
-        
-        Please generate questions in the following JSON format:
-        {{
-            "session_id": "",
-            "questions_with_options": [
-                {{
-                    "question": "What is the primary role type for this position?",
-                    "options": [
-                        {{"text": "Technical/Engineering", "value": "technical", "description": "Software development, data engineering, DevOps roles"}},
-                        {{"text": "Product Management", "value": "product", "description": "Product strategy, roadmap planning, stakeholder management"}}
-                    ],
-                    "allow_custom_input": true,
-                    "required": true
-                }}
-            ]
-        }}
-        
-        Generate relevant questions based on what information is still needed.
-        """
-        
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a professional HR specialist who creates structured interview questions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS
-        )
+        response = self.complete("questions", QUESTIONS.messages(context=context))
         
         try:
             result = json.loads(response.choices[0].message.content)
@@ -171,58 +179,59 @@ class LLMTools:
         except json.JSONDecodeError:
             return self._get_default_questions()
     
-    def parse_user_response(self, response: str, current_info: Dict[str, Any] = None) -> Dict[str, Any]:
+    def parse_user_response(self, response: str, current_info: Dict[str, Any] = None, question: str = None) -> Dict[str, Any]:
         """
-        Use LLM to parse user response and update job information
+        Use LLM to parse user response into a patch and apply it to the job information locally
         
         Args:
             response: User's response text
             current_info: Current job information
+            question: Question being answered, used to pick the relevant fields
             
         Returns:
             Dict: Updated job information and completion status
         """
-        context = ""
-        if current_info:
-            context = f"Current job information: {json.dumps(current_info, indent=2)}"
-        
-        prompt = f"""
-        Parse the following user response and update job information accordingly.
-        
-        User response: {response}
-        {context}
-        
-        Please update the job information based on the user's response and return in JSON format:
-        {{
-            "updated_info": {{
-                "title": "updated title",
-                "description": "updated description",
-                "must_have": {{
-                    "technical_skills": ["updated skills"],
-                    "domain_experience": ["updated experience"],
-                    "soft_skills": ["updated skills"]
-                }},
-                "nice_to_have": ["updated bonuses"]
-            }},
-            "is_complete": true/false
-        }}
-        """
+        # Only the fields this answer can touch are sent, as compact JSON
+        known = select_fields(current_info or {}, relevant_fields(response, question))
         
-        response_obj = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a professional job description analyst who updates information based on user input."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS
+        response_obj = self.complete(
+            "user_response",
+            USER_RESPONSE.messages(known=compact_json(known), response=response)
         )
         
         try:
             result = json.loads(response_obj.choices[0].message.content)
-            return result
         except json.JSONDecodeError:
             return {"updated_info": current_info or self._get_default_structure(), "is_complete": False}
+        
+        if "updated_info" in result:
+            # Model answered with a full document instead of a patch
+            return {"updated_info": result["updated_info"], "is_complete": bool(result.get("is_complete"))}
+        return {
+            "updated_info": apply_patch(current_info or self._get_default_structure(), result),
+            "is_complete": bool(result.get("is_complete"))
+        }
+    
+    def verify_requirements(self, jd_text: str, seed: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check requirements extracted from a near-duplicate JD against a new JD
+        
+        Only the differences come back, so the call is much smaller than a full parse.
+        
+        Args:
+            jd_text: New job description text
+            seed: Requirements stored for the similar job description
+            
+        Returns:
+            Dict: Requirements corrected for the new text
+        """
+        response = self.complete("verify", VERIFY.messages(seed=compact_json(seed), jd_text=jd_text))
+        
+        try:
+            patch = json.loads(response.choices[0].message.content)
+        except json.JSONDecodeError:
+            return seed
+        return apply_patch(seed, patch) if isinstance(patch, dict) else seed
     
     def _get_default_structure(self) -> Dict[str, Any]:
         """Default structure for job requirements"""
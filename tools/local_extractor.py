@@ -0,0 +1,250 @@
+# Author: Peng Fei
+# Local requirement extraction with the skill taxonomy, for fast parses and when the LLM cannot be used
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.skill_taxonomy import get_skill_index
+from tools.text_compactor import BOILERPLATE_HEADERS, HEADER_LINE
+
+# Longest phrase, in words, tried against the skill index
+MAX_PHRASE_WORDS = 3
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][\w+#.]*")
+BULLET_PATTERN = re.compile(r"^[\s\-*•#>\d.)]+")
+TITLE_SEPARATOR_PATTERN = re.compile(r"\s+(?:-|–|—|\||with|at)\s+|[:,(]")
+
+# Short aliases (go, c, r, ui) are common words in lowercase; they only count when written as a name
+MIN_LOWERCASE_ALIAS_LENGTH = 4
+# Aliases that in a job description nearly always mean something else ("send your CV")
+AMBIGUOUS_ALIASES = {"cv"}
+
+CATEGORY_FIELDS = {"technical": "technical_skills", "soft": "soft_skills", "domain": "domain_experience"}
+
+# Section kinds, by header; checked in order, so "preferred qualifications" is preferred
+PREFERRED, REQUIRED, GENERAL, IGNORED = "preferred", "required", "general", "ignored"
+SECTION_PATTERNS = [
+    (PREFERRED, re.compile(r"\b(nice[ -]to[ -]haves?|preferred|bonus|pluses|desirable|desired|good[ -]to[ -]haves?|optional)\b", re.IGNORECASE)),
+    (REQUIRED, re.compile(
+        r"\b(requirements?|required|qualifications?|must[ -]haves?|skills|what you('ll)? (bring|need)|you have"
+        r"|who you are|what we('re| are) looking for|about you|experience)\b", re.IGNORECASE
+    )),
+    (GENERAL, re.compile(
+        r"\b(responsibilities|what you('ll)? do|duties|the role|about the (role|job|position)|overview|summary"
+        r"|description|day to day|tech stack|our stack)\b", re.IGNORECASE
+    )),
+    (IGNORED, re.compile(r"\b(about us|about the (company|team)|who we are|our (company|mission|values)|salary|location)\b", re.IGNORECASE)),
+]
+
+# Sentence-level cues that make what a sentence mentions optional
+OPTIONAL_CUE_PATTERN = re.compile(
+    r"\b(nice[ -]to[ -]have|a plus|plus\b|preferred|preferably|bonus|ideally|desirable|is an advantage"
+    r"|good[ -]to[ -]have|would be great|not required)\b", re.IGNORECASE
+)
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.;!?])\s+|\n")
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "fifteen": 15
+}
+_NUMBER = r"(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")"
+# "5+ years of experience with Python", "3-5 years in fintech", "at least four years of backend development"
+YEARS_PATTERN = re.compile(
+    r"(?:(?:at least|minimum(?: of)?|over|more than)\s+)?" + _NUMBER + r"\s*\+?"
+    r"(?:\s*(?:-|–|to)\s*" + _NUMBER + r"\s*\+?)?\s*(?:\(\d+\)\s*)?years?'?\s+(?:of\s+)?"
+    r"(?P<subject>[^.;:\n()]{3,80})",
+    re.IGNORECASE
+)
+# Leading and trailing filler around what the experience is in
+YEARS_SUBJECT_LEAD = re.compile(
+    r"^((professional|relevant|hands-on|practical|industry|commercial|proven|solid|working|work|direct|related)\s+)*"
+    r"(experience\s+)?((in|with|of|on|as|at|building|developing|using|doing|working( with| on| in)?)\s+)?(an?\s+|the\s+)?",
+    re.IGNORECASE
+)
+YEARS_SUBJECT_TAIL = re.compile(r"(\s+(experience|background|required|preferred|or more|or equivalent\b.*|and\s*$))+\s*$", re.IGNORECASE)
+
+
+def find_skills(text: str) -> List[Tuple[str, str]]:
+    """
+    Find known skills mentioned in free text, longest phrase first
+
+    Args:
+        text: Job description text
+
+    Returns:
+        List: (canonical name, category) in order of first mention, without duplicates
+    """
+    tokens = [token.rstrip(".") for token in TOKEN_PATTERN.findall(text)]
+    found, seen = [], set()
+    position = 0
+    while position < len(tokens):
+        match, width = None, 1
+        for size in range(min(MAX_PHRASE_WORDS, len(tokens) - position), 0, -1):
+            phrase = tokens[position:position + size]
+            if size == 1 and (phrase[0].lower() in AMBIGUOUS_ALIASES or
+                              len(phrase[0]) < MIN_LOWERCASE_ALIAS_LENGTH and phrase[0].islower()):
+                continue
+            match = _match_phrase(" ".join(phrase))
+            if match:
+                width = size
+                break
+        if match and match[0] not in seen:
+            seen.add(match[0])
+            found.append(match)
+        position += width
+    return found
+
+
+@lru_cache(maxsize=65536)
+def _match_phrase(phrase: str) -> Optional[Tuple[str, str]]:
+    # Job descriptions share most of their vocabulary, so most lookups repeat
+    return get_skill_index().match_exact(phrase)
+
+
+def guess_title(text: str) -> str:
+    """Job title from the first line: its leading phrase, before separators and qualifiers"""
+    for line in text.splitlines():
+        line = BULLET_PATTERN.sub("", line).strip()
+        if line:
+            head = TITLE_SEPARATOR_PATTERN.split(line, maxsplit=1)[0].strip()
+            words = head.split()
+            return " ".join(words[:8]) if words else ""
+    return ""
+
+
+def first_sentence(text: str, max_chars: int = 300) -> str:
+    """Leading sentence after the title line, as a short description"""
+    lines = [line for line in text.splitlines() if line.strip() and not section_kind(line)]
+    flat = " ".join(" ".join(lines[1:] if len(lines) > 1 else lines).split())
+    end = re.search(r"[.!?](\s|$)", flat)
+    sentence = flat[:end.end()].strip() if end else flat
+    return sentence[:max_chars]
+
+
+def section_kind(line: str) -> Optional[str]:
+    """
+    Kind of section a header line opens
+
+    Args:
+        line: One line of the job description
+
+    Returns:
+        str: PREFERRED, REQUIRED, GENERAL or IGNORED, or None when the line is not a known header
+    """
+    line = line.strip().strip("*_").strip()
+    header = HEADER_LINE.match(line)
+    if not header or len(line.split()) > 6:
+        return None
+    name = header.group(2).strip()
+    # Short plain lines ("Python experience") are content; headers are marked or capitalized
+    if not (line.startswith("#") or line.endswith(":") or name.istitle() or name.isupper()):
+        return None
+    if BOILERPLATE_HEADERS.match(name):
+        return IGNORED
+    for kind, pattern in SECTION_PATTERNS:
+        if pattern.search(name):
+            return kind
+    return None
+
+
+def split_by_section(text: str) -> List[Tuple[str, str]]:
+    """
+    Pair every content line with the kind of section it is in
+
+    Lines before the first known header, and after unknown headers, are GENERAL. Header
+    lines belong to the section they open, as some name a skill ("Experience with AWS:").
+
+    Args:
+        text: Job description text
+
+    Returns:
+        List: (section kind, line) for every non-empty line
+    """
+    kind, lines = GENERAL, []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        kind = section_kind(line) or kind
+        lines.append((kind, line))
+    return lines
+
+
+def find_years_of_experience(text: str) -> List[str]:
+    """
+    Find years-of-experience requirements, such as "5+ years of experience with Python"
+
+    Args:
+        text: One sentence or line
+
+    Returns:
+        List: Normalized phrases such as "5+ years Python"
+    """
+    found = []
+    for match in YEARS_PATTERN.finditer(text):
+        low = _years_number(match.group(1))
+        high = _years_number(match.group(2))
+        subject = YEARS_SUBJECT_TAIL.sub("", YEARS_SUBJECT_LEAD.sub("", match.group("subject").strip())).strip(" ,-")
+        if low is None or not subject or subject.lower() in ("experience", "exp"):
+            continue
+        # A single number is a minimum however it is written
+        years = f"{low}-{high}" if high is not None and high > low else f"{low}+"
+        found.append(f"{years} years {subject}")
+    return found
+
+
+def _years_number(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    value = value.lower()
+    return int(value) if value.isdigit() else NUMBER_WORDS.get(value)
+
+
+def extract_requirements(text: str, title: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract requirements without any model call
+
+    Lower fidelity than the LLM: only skills in the local taxonomy and years-of-experience
+    phrases are found. Skills under preferred / nice-to-have headers, or in a sentence with
+    an optional cue ("a plus", "ideally"), are nice-to-have unless also required elsewhere;
+    all others are must-haves.
+    Company, benefits and application sections are skipped.
+
+    Args:
+        text: Job description text
+        title: Known title, overriding the guess from the first line
+
+    Returns:
+        Dict: Requirements in the same structure as parse_job_description
+    """
+    must_have = {"technical_skills": [], "domain_experience": [], "soft_skills": []}
+    # Keyed by lowercased mention; a required mention anywhere wins over an optional one
+    required = set()
+    optional_mentions: Dict[str, str] = {}
+
+    def add(key: str, value: str, field: str, optional: bool):
+        if key in required:
+            return
+        if optional:
+            optional_mentions.setdefault(key, value)
+            return
+        required.add(key)
+        optional_mentions.pop(key, None)
+        must_have[field].append(value)
+
+    for kind, line in split_by_section(text):
+        if kind == IGNORED:
+            continue
+        for sentence in SENTENCE_SPLIT_PATTERN.split(line):
+            optional = kind == PREFERRED or bool(OPTIONAL_CUE_PATTERN.search(sentence))
+            for experience in find_years_of_experience(sentence):
+                add(experience.lower(), experience, "domain_experience", optional)
+            for name, category in find_skills(sentence):
+                add(name, name, CATEGORY_FIELDS.get(category, "technical_skills"), optional)
+    nice_to_have = list(optional_mentions.values())
+    return {
+        "title": title or guess_title(text),
+        "description": first_sentence(text),
+        "must_have": must_have,
+        "nice_to_have": nice_to_have
+    }
@@ -0,0 +1,349 @@
+# Author: Peng Fei
+# Per-stage model routing with fallback chains and latency/cost reporting
+
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import openai
+
+from config.settings import (
+    MODEL_NAME, STAGE_MODELS, STAGE_TIMEOUTS, MODEL_PRICES, STREAM_INCLUDE_USAGE, PROMPT_CACHE_KEY_ENABLED, CACHED_PROMPT_PRICE_FACTOR,
+    CIRCUIT_BREAKER_ENABLED, CIRCUIT_FAILURE_RATE, CIRCUIT_SLOW_CALL_SECONDS, CIRCUIT_SLOW_CALL_RATE,
+    CIRCUIT_WINDOW_SECONDS, CIRCUIT_MIN_CALLS, CIRCUIT_OPEN_SECONDS
+)
+from tools.prompt_templates import PROMPT_VERSION
+from tools.token_estimator import estimate_tokens, token_estimator
+from utils.admission import upstream_latency
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.metrics import metrics
+from utils.usage_tracker import usage_tracker
+
+# Stages that share another stage's model configuration
+STAGE_ALIASES = {"stream_classify": "classify"}
+
+# USD per 1K (prompt, completion) tokens; override or extend with MODEL_PRICES
+DEFAULT_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+
+def parse_model_chain(spec: str) -> List[str]:
+    """Split "primary,fallback,..." into a model list"""
+    return [model.strip() for model in (spec or "").split(",") if model.strip()]
+
+
+def parse_prices(spec: str) -> Dict[str, tuple]:
+    """
+    Parse model prices from "model:prompt_per_1k:completion_per_1k,..."
+
+    Args:
+        spec: Price specification, e.g. "gpt-4o-mini:0.00015:0.0006"
+
+    Returns:
+        Dict: (prompt, completion) USD per 1K tokens per model
+    """
+    prices = {}
+    for item in (spec or "").split(","):
+        parts = item.strip().split(":")
+        if len(parts) == 3:
+            prices[parts[0]] = (float(parts[1]), float(parts[2]))
+    return prices
+
+
+def is_retryable(error: Exception) -> bool:
+    """Errors worth trying the next model for: outages, rate limits, unknown or unavailable models"""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (404, 408, 429) or error.status_code >= 500
+    return False
+
+
+# One breaker per model, shared by every router in the process
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(model: str) -> Optional[CircuitBreaker]:
+    """Circuit breaker guarding calls to a model, or None when breakers are disabled"""
+    if not CIRCUIT_BREAKER_ENABLED:
+        return None
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(
+                model,
+                failure_rate=CIRCUIT_FAILURE_RATE,
+                slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+                slow_call_rate=CIRCUIT_SLOW_CALL_RATE,
+                window_seconds=CIRCUIT_WINDOW_SECONDS,
+                min_calls=CIRCUIT_MIN_CALLS,
+                open_seconds=CIRCUIT_OPEN_SECONDS
+            )
+        return breaker
+
+
+def cached_tokens_of(usage) -> Optional[int]:
+    """Prompt tokens served from the provider's prompt cache, or None when the usage does not say"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    return cached if isinstance(cached, int) else None
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        client,
+        stage_models: Dict[str, str] = None,
+        prices: Dict[str, tuple] = None,
+        stage_timeouts: Dict[str, float] = None
+    ):
+        """
+        Args:
+            client: OpenAI client
+            stage_models: Model chain specification per stage; empty uses MODEL_NAME
+            prices: (prompt, completion) USD per 1K tokens per model
+            stage_timeouts: Request timeout in seconds per stage; 0 or missing uses the client's
+        """
+        self.client = client
+        self.stage_models = {
+            stage: parse_model_chain(spec)
+            for stage, spec in (STAGE_MODELS if stage_models is None else stage_models).items()
+        }
+        self.stage_timeouts = STAGE_TIMEOUTS if stage_timeouts is None else stage_timeouts
+        self.prices = dict(DEFAULT_PRICES, **(parse_prices(MODEL_PRICES) if prices is None else prices))
+
+    def models_for(self, stage: str) -> List[str]:
+        """Model chain for a stage, primary first"""
+        return self.stage_models.get(STAGE_ALIASES.get(stage, stage)) or [MODEL_NAME]
+
+    def available(self, stage: str) -> bool:
+        """Whether any model of the stage's chain currently accepts calls"""
+        breakers = [circuit_breaker(model) for model in self.models_for(stage)]
+        return any(breaker is None or breaker.available() for breaker in breakers)
+
+    def create(self, stage: str, messages: List[Dict[str, str]], **kwargs):
+        """
+        Create a chat completion on the stage's model, falling back along its chain
+
+        Fallback only happens before any output is returned; a stream that fails
+        midway is not restarted on another model. Models whose circuit is open are
+        skipped without a call.
+
+        Args:
+            stage: Call stage
+            messages: Chat messages
+            **kwargs: Other chat.completions.create arguments
+
+        Returns:
+            ChatCompletion, or a stream that records latency and cost when consumed
+
+        Raises:
+            CircuitOpenError: When the circuits of all models in the chain are open
+        """
+        models = self.models_for(stage)
+        if kwargs.get("stream") and STREAM_INCLUDE_USAGE:
+            # The final chunk then reports actual token usage, with empty choices
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        timeout = self.stage_timeouts.get(STAGE_ALIASES.get(stage, stage))
+        if timeout:
+            # A hung upstream fails within the stage's budget, so its breaker sees the outcome quickly
+            kwargs.setdefault("timeout", timeout)
+        if PROMPT_CACHE_KEY_ENABLED:
+            # Calls with the same template share a cache key, which keeps their common prefix warm
+            kwargs.setdefault("prompt_cache_key", f"{stage}-v{PROMPT_VERSION}")
+        for attempt, model in enumerate(models):
+            is_last = attempt == len(models) - 1
+            breaker = circuit_breaker(model)
+            if breaker is not None:
+                try:
+                    breaker.allow()
+                except CircuitOpenError:
+                    if is_last:
+                        raise
+                    metrics.increment("llm.fallbacks", labels={"stage": stage, "from": model, "to": models[attempt + 1]})
+                    continue
+            started = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+            except Exception as e:
+                metrics.increment("llm.errors", labels={"stage": stage, "model": model})
+                if breaker is not None:
+                    # Only outages, overload and timeouts say the model is unhealthy; a bad request does not
+                    if is_retryable(e):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success(time.perf_counter() - started)
+                if is_last or not is_retryable(e):
+                    raise
+                metrics.increment("llm.fallbacks", labels={"stage": stage, "from": model, "to": models[attempt + 1]})
+                continue
+
+            prompt_tokens = token_estimator.estimate_messages(messages)
+            if kwargs.get("stream"):
+                return TrackedStream(self, response, stage, model, started, prompt_tokens, breaker)
+            if breaker is not None:
+                breaker.record_success(time.perf_counter() - started)
+            usage = getattr(response, "usage", None)
+            completion_text = response.choices[0].message.content if response.choices else ""
+            self.record(
+                stage, model, time.perf_counter() - started,
+                getattr(usage, "prompt_tokens", None) or prompt_tokens,
+                getattr(usage, "completion_tokens", None) or estimate_tokens(completion_text or ""),
+                cached_tokens_of(usage)
+            )
+            return response
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        seconds: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: Optional[int] = None,
+        first_chunk_seconds: Optional[float] = None
+    ):
+        """
+        Report latency, tokens and cost of one call
+
+        Args:
+            stage: Call stage
+            model: Model that served the call
+            seconds: Call duration
+            prompt_tokens: Prompt tokens, reported or estimated
+            completion_tokens: Completion tokens, reported or estimated
+            cached_tokens: Prompt tokens served from the provider cache; None when not reported
+            first_chunk_seconds: Time to the first chunk of a stream; None for a whole response
+        """
+        labels = {"stage": stage, "model": model}
+        metrics.increment("llm.calls", labels=labels)
+        metrics.observe("llm.latency_seconds", seconds, labels)
+        # Admission and fast-mode selection judge upstream responsiveness, not how long a stream keeps talking
+        upstream_latency.observe(seconds if first_chunk_seconds is None else first_chunk_seconds)
+        metrics.increment("llm.prompt_tokens", prompt_tokens, labels)
+        metrics.increment("llm.completion_tokens", completion_tokens, labels)
+        if cached_tokens is not None:
+            metrics.increment("llm.reported_prompt_tokens", prompt_tokens, labels)
+            metrics.increment("llm.cached_tokens", cached_tokens, labels)
+            metrics.observe("llm.cached_ratio", cached_tokens / prompt_tokens if prompt_tokens else 0.0, labels)
+        cost = self.cost(model, prompt_tokens, completion_tokens, cached_tokens or 0)
+        if cost is not None:
+            metrics.increment("llm.cost_usd", cost, labels)
+        usage_tracker.record(stage, model, prompt_tokens, completion_tokens, cost, cached_tokens or 0)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Latency and cost per stage and model, for tuning the routing
+
+        Returns:
+            Dict: For each stage, its model chain and per-model calls, latency percentiles and cost
+        """
+        report = {}
+        for stage in sorted(set(self.stage_models) | set(STAGE_ALIASES)):
+            by_model = {}
+            for model in self.models_for(stage):
+                labels = {"stage": stage, "model": model}
+                latency = metrics.summary("llm.latency_seconds", labels)
+                errors = metrics.counter("llm.errors", labels)
+                if latency is None and not errors:
+                    continue
+                calls = metrics.counter("llm.calls", labels)
+                cost = metrics.counter("llm.cost_usd", labels)
+                # Only calls whose usage reported cached tokens count towards the ratio
+                reported = metrics.counter("llm.reported_prompt_tokens", labels)
+                by_model[model] = {
+                    "calls": calls,
+                    "errors": errors,
+                    "latency_p50": latency["p50"] if latency else None,
+                    "latency_p95": latency["p95"] if latency else None,
+                    "cost_usd": round(cost, 6),
+                    "cost_per_call_usd": round(cost / calls, 6) if calls else None,
+                    "cached_ratio": round(metrics.counter("llm.cached_tokens", labels) / reported, 3) if reported else None
+                }
+            report[stage] = {"models": self.models_for(stage), "by_model": by_model}
+            breakers = {model: circuit_breaker(model) for model in self.models_for(stage)}
+            if CIRCUIT_BREAKER_ENABLED:
+                report[stage]["circuits"] = {model: breaker.stats() for model, breaker in breakers.items()}
+        return report
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+        """USD cost of a call, or None for a model without a known price"""
+        price = self.prices.get(model)
+        if price is None:
+            return None
+        uncached = prompt_tokens - cached_tokens
+        prompt_cost = (uncached + cached_tokens * CACHED_PROMPT_PRICE_FACTOR) * price[0]
+        return (prompt_cost + completion_tokens * price[1]) / 1000
+
+
+class TrackedStream:
+    """Wraps a completion stream and reports the call once it is consumed or closed"""
+
+    def __init__(
+        self,
+        router: ModelRouter,
+        stream,
+        stage: str,
+        model: str,
+        started: float,
+        prompt_tokens: int,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self._router = router
+        self._stream = stream
+        self.stage = stage
+        self.model = model
+        self._started = started
+        self._prompt_tokens = prompt_tokens
+        self._breaker = breaker
+        self._first_chunk_at: Optional[float] = None
+        self._failed = False
+        self._parts: List[str] = []
+        self._usage = None
+        self._recorded = False
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for chunk in self._stream:
+                if self._first_chunk_at is None:
+                    self._first_chunk_at = time.perf_counter()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    self._parts.append(chunk.choices[0].delta.content)
+                if getattr(chunk, "usage", None) is not None:
+                    self._usage = chunk.usage
+                yield chunk
+        except Exception as e:
+            self._failed = is_retryable(e)
+            raise
+        finally:
+            self._record()
+
+    def close(self):
+        """Stop the upstream generation"""
+        self._stream.close()
+        self._record()
+
+    def _record(self):
+        if not self._recorded:
+            self._recorded = True
+            if self._breaker is not None:
+                # A long stream is not a slow call; time to the first chunk is what the breaker judges
+                if self._failed:
+                    self._breaker.record_failure()
+                else:
+                    self._breaker.record_success((self._first_chunk_at or time.perf_counter()) - self._started)
+            ended = time.perf_counter()
+            # Estimates stand in when the stream was cut short or the backend sent no usage
+            self._router.record(
+                self.stage, self.model, ended - self._started,
+                getattr(self._usage, "prompt_tokens", None) or self._prompt_tokens,
+                getattr(self._usage, "completion_tokens", None) or estimate_tokens("".join(self._parts)),
+                cached_tokens_of(self._usage),
+                (self._first_chunk_at or ended) - self._started
+            )
@@ -0,0 +1,263 @@
+# Author: Peng Fei
+# Versioned prompt templates laid out for provider-side prompt-prefix caching
+
+from textwrap import dedent
+from typing import Dict, List
+
+# Bump when any template's static text changes, so cache keys and logs tell the layouts apart
+PROMPT_VERSION = "4"
+
+
+class PromptTemplate:
+    """
+    A chat prompt whose instructions, schema and examples form a fixed system message
+
+    Providers cache prompts by exact prefix, so everything that is the same on every
+    call comes first and the request's own text is appended last in the user message.
+    """
+
+    def __init__(self, name: str, system: str, user: str):
+        """
+        Args:
+            name: Template name, reported with the version
+            system: Static instructions, schema, guidelines and examples
+            user: str.format template holding only the per-call values
+        """
+        self.name = name
+        self.system = dedent(system).strip()
+        self.user = dedent(user).strip()
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}-v{PROMPT_VERSION}"
+
+    def messages(self, **values) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for one call
+
+        Args:
+            **values: Values for the user template's placeholders
+
+        Returns:
+            List: System message with the static prefix, then the user message
+        """
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**values)}
+        ]
+
+
+CLASSIFY = PromptTemplate(
+    "classify",
+    """
+    You are a professional job description analyst. Your task is to determine if a job description is detailed enough for direct processing or needs further conversation to gather more information.
+
+    Analyze the user input and determine if it contains detailed job description information.
+
+    Please determine:
+    1. If the input contains detailed job information including:
+       - Job title/position name
+       - Required skills (technical, soft skills, domain experience)
+       - Experience level or years of experience
+       - Responsibilities or job duties
+       - Any specific requirements or qualifications
+       Then return "detailed_jd"
+
+    2. If the input is vague, incomplete, or only contains basic information like:
+       - Just a job title without details
+       - General statements without specific requirements
+       - Questions or requests for information
+       Then return "need_conversation"
+
+    Examples:
+    - "Senior Software Engineer with 5+ years Python, JavaScript, Docker, Kubernetes experience" -> "detailed_jd"
+    - "Software Engineer" -> "need_conversation"
+    - "I need a developer" -> "need_conversation"
+
+    Return only one of the above options without any explanation.
+    """,
+    """
+    User input:
+    {user_input}
+    """
+)
+
+STREAM_CLASSIFY = PromptTemplate(
+    "stream_classify",
+    """
+    You are a professional job description analyst.
+
+    Analyze the user input and determine if it contains detailed job description information.
+    Provide your analysis in real-time.
+
+    Please analyze:
+    1. Level of detail in the input
+    2. Presence of specific job requirements
+    3. Whether additional information is needed
+    4. Final determination: "detailed_jd" or "need_conversation"
+    """,
+    """
+    User input:
+    {user_input}
+    """
+)
+
+PARSE = PromptTemplate(
+    "parse",
+    """
+    You are a professional job description analyst specializing in extracting and categorizing skill requirements.
+
+    Analyze the job description and extract structured information.
+    Please output in JSON format only, without any explanation text.
+
+    Please extract the following information and return as JSON:
+    {
+        "title": "job title",
+        "description": "job description summary",
+        "must_have": {
+            "technical_skills": ["skill1", "skill2"],
+            "domain_experience": ["experience1", "experience2"],
+            "soft_skills": ["skill1", "skill2"]
+        },
+        "nice_to_have": ["bonus1", "bonus2"]
+    }
+
+    Guidelines:
+    1. technical_skills: programming languages, frameworks, tools, etc.
+    2. domain_experience: industry experience, business domain knowledge
+    3. soft_skills: communication, leadership, teamwork, etc.
+    4. nice_to_have: non-essential but preferred skills or experience
+    5. If no information is found for a category, return empty array
+    """,
+    """
+    Job Description:
+    {jd_text}
+    """
+)
+
+STREAM_PARSE = PromptTemplate(
+    "stream_parse",
+    """
+    You are a professional job description analyst. Provide real-time analysis as you process each section.
+
+    Analyze the job description and extract structured information step by step.
+
+    Please analyze and output in this order:
+    1. Job title
+    2. Job description summary
+    3. Technical skills (programming languages, frameworks, tools)
+    4. Domain experience (industry experience, business domain knowledge)
+    5. Soft skills (communication, leadership, teamwork)
+    6. Nice-to-have skills (non-essential but preferred)
+
+    Output each section as it's analyzed, one JSON object per line, using this format:
+    {"section": "title", "content": "extracted title"}
+    {"section": "description", "content": "extracted description"}
+    {"section": "technical_skills", "content": ["skill1", "skill2"]}
+    {"section": "domain_experience", "content": ["exp1", "exp2"]}
+    {"section": "soft_skills", "content": ["skill1", "skill2"]}
+    {"section": "nice_to_have", "content": ["bonus1", "bonus2"]}
+    """,
+    """
+    Job Description:
+    {jd_text}
+    """
+)
+
+QUESTIONS = PromptTemplate(
+    "questions",
+    """
+    You are a professional HR specialist who creates structured interview questions.
+
+    Generate structured questions to gather job requirements information.
+    Generate relevant questions based on what information is still needed.
+
+    Please generate questions in the following JSON format:
+    {
+        "session_id": "",
+        "questions_with_options": [
+            {
+                "question": "What is the primary role type for this position?",
+                "options": [
+                    {"text": "Technical/Engineering", "value": "technical", "description": "Software development, data engineering, DevOps roles"},
+                    {"text": "Product Management", "value": "product", "description": "Product strategy, roadmap planning, stakeholder management"}
+                ],
+                "allow_custom_input": true,
+                "required": true
+            }
+        ]
+    }
+    """,
+    """
+    {context}
+    """
+)
+
+USER_RESPONSE = PromptTemplate(
+    "user_response",
+    """
+    You are a professional job description analyst who updates information based on user input.
+
+    Parse the user's answer and return a JSON patch for the job requirements.
+    Fields: title, description (text); technical_skills, domain_experience, soft_skills, nice_to_have (lists).
+
+    Return only JSON, omitting anything that does not change:
+    {"set":{"title":"..."},"add":{"technical_skills":["..."]},"remove":{"soft_skills":["..."]},"is_complete":false}
+    Set is_complete to true when the user says there is nothing more to add.
+    """,
+    """
+    Known values: {known}
+    User response: {response}
+    """
+)
+
+VERIFY = PromptTemplate(
+    "verify",
+    """
+    You are a professional job description analyst who checks extracted requirements.
+
+    You are given requirements extracted from a very similar job description, followed by a new job description.
+    Return only a JSON patch with what differs for the new job description, or {} if nothing does:
+    {"set":{"title":"..."},"add":{"technical_skills":["..."]},"remove":{"nice_to_have":["..."]}}
+    Fields: title, description (text); technical_skills, domain_experience, soft_skills, nice_to_have (lists).
+    """,
+    """
+    Requirements of the similar job description:
+    {seed}
+
+    Job description:
+    {jd_text}
+    """
+)
+
+FORMAT = PromptTemplate(
+    "format",
+    """
+    You are a data formatting specialist.
+
+    Format the parsed job data into the required output structure.
+
+    Please format into this exact structure:
+    {
+        "session_id": "session_id",
+        "requirements": {
+            "title": "job title",
+            "description": "job description",
+            "must_have": {
+                "technical_skills": [],
+                "domain_experience": [],
+                "soft_skills": []
+            },
+            "nice_to_have": []
+        }
+    }
+
+    Ensure all fields are properly filled and the structure is exactly as specified.
+    """,
+    """
+    Session ID: {session_id}
+
+    Parsed data:
+    {parsed_data}
+    """
+)
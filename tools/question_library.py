@@ -0,0 +1,102 @@
+# Author: Peng Fei
+# Precomputed, versioned question library for the conversation scenario
+
+import copy
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_LIBRARY_PATH = Path(__file__).parent / "data" / "question_library.json"
+
+# Fields of the requirements structure, in the order questions are asked
+REQUIREMENT_FIELDS = ("title", "description", "technical_skills", "domain_experience", "soft_skills", "nice_to_have")
+
+
+def missing_fields(current_info: Dict[str, Any] = None) -> List[str]:
+    """
+    List the requirement fields that are still empty
+
+    Args:
+        current_info: Current job information (requirements structure)
+
+    Returns:
+        List: Missing field names in asking order
+    """
+    info = current_info or {}
+    must_have = info.get("must_have") or {}
+    values = {
+        "title": info.get("title"),
+        "description": info.get("description"),
+        "technical_skills": must_have.get("technical_skills"),
+        "domain_experience": must_have.get("domain_experience"),
+        "soft_skills": must_have.get("soft_skills"),
+        "nice_to_have": info.get("nice_to_have"),
+    }
+    return [field for field in REQUIREMENT_FIELDS if not values[field]]
+
+
+class QuestionLibrary:
+    def __init__(self, path: Path = DEFAULT_LIBRARY_PATH):
+        with open(path, encoding="utf-8") as library_file:
+            data = json.load(library_file)
+        self.version = data["version"]
+        self.common: Dict[str, Any] = data["common"]
+        self.role_families: Dict[str, Any] = data["role_families"]
+        self._keyword_patterns = [
+            (family, re.compile(r"\b(" + "|".join(re.escape(k) for k in spec["keywords"]) + r")\b", re.IGNORECASE))
+            for family, spec in self.role_families.items() if spec["keywords"]
+        ]
+
+    def role_family(self, current_info: Dict[str, Any] = None) -> str:
+        """Detect the role family from the title, or "general" when unknown"""
+        title = (current_info or {}).get("title") or ""
+        for family, pattern in self._keyword_patterns:
+            if pattern.search(title):
+                return family
+        return "general"
+
+    def lookup(self, current_info: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Serve questions from the library when every gap is a standard one
+
+        While the role is unknown, the opening questionnaire asks for it first and
+        leaves role-specific skills for the next turn.
+
+        Args:
+            current_info: Current job information
+
+        Returns:
+            Dict: Questions in questions_with_options format, or None when the LLM is needed
+        """
+        family = self.role_family(current_info)
+        missing = missing_fields(current_info)
+        if not missing:
+            return None
+
+        questions = dict(self.common, **self.role_families[family]["questions"])
+        if family == "general":
+            # An unrecognized title is an unusual gap; an absent one is the opening turn
+            if "title" not in missing:
+                return None
+            askable = [field for field in missing if field in questions]
+        else:
+            if any(field not in questions for field in missing):
+                return None
+            askable = missing
+
+        return {
+            "session_id": "",
+            "questions_with_options": copy.deepcopy([questions[field] for field in askable])
+        }
+
+
+_library: Optional[QuestionLibrary] = None
+
+
+def get_question_library(path: str = None) -> QuestionLibrary:
+    """Load the question library once and keep it in memory"""
+    global _library
+    if _library is None:
+        _library = QuestionLibrary(Path(path) if path else DEFAULT_LIBRARY_PATH)
+    return _library
@@ -0,0 +1,306 @@
+# Author: Peng Fei
+# Local skill taxonomy: memory-mapped alias index for canonicalizing and deduplicating skills
+
+import bisect
+import hashlib
+import json
+import mmap
+import re
+import struct
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from config.settings import SKILL_NORMALIZATION_ENABLED, SKILL_INDEX_PATH
+
+DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_TAXONOMY_PATH = DATA_DIR / "skill_taxonomy.json"
+DEFAULT_INDEX_PATH = DATA_DIR / "skill_index.bin"
+
+# Binary index layout (little-endian):
+#   header: magic, format version, taxonomy version, skill count, key count,
+#           hash table offset, entry table offset, skill table offset, name blob offset
+#   hash table: sorted u64 key hashes, searched in place through a memoryview
+#   entry table: u32 skill id per hash; the top bit marks a one-character-deletion
+#                variant used for fuzzy matching
+#   skill table: (name offset u32, name length u16, category u8, pad)
+#   name blob: UTF-8 canonical names
+INDEX_MAGIC = b"SKIX"
+INDEX_FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sIIIIIIII")
+SKILL_ENTRY = struct.Struct("<IHBx")
+FUZZY_FLAG = 1 << 31
+
+CATEGORIES = ("technical", "soft", "domain")
+
+# Keys shorter than this are matched exactly only; fuzzy matches on them are mostly wrong
+MIN_FUZZY_KEY_LENGTH = 6
+
+# Words that qualify a skill without changing which skill it is
+FILLER_WORDS = {
+    "programming", "language", "languages", "framework", "frameworks", "development", "developer",
+    "skills", "skill", "experience", "experienced", "knowledge", "proficiency", "proficient", "strong",
+    "solid", "basic", "advanced", "expert", "expertise", "familiarity", "familiar", "understanding",
+    "working", "hands", "on", "good", "excellent", "great", "with", "in", "of", "and", "the", "using",
+}
+
+SEPARATOR_PATTERN = re.compile(r"[\s_/\-]+")
+STRIP_PATTERN = re.compile(r"[^\w+#. ]")
+VERSION_SUFFIX_PATTERN = re.compile(r"\s*v?\d+(\.\d+)*x?$")
+
+
+def normalize_key(text: str) -> str:
+    """Lowercase and collapse separators and punctuation into a lookup key"""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    text = STRIP_PATTERN.sub(" ", SEPARATOR_PATTERN.sub(" ", text))
+    # Keep leading dots that are part of a name (.net) but drop sentence punctuation
+    return " ".join(word if word == ".net" else word.strip(".") for word in text.split())
+
+
+def key_variants(key: str) -> List[str]:
+    """Progressively looser forms of a key: filler words removed, then version suffix removed"""
+    variants = []
+    stripped = " ".join(word for word in key.split() if word not in FILLER_WORDS)
+    if stripped and stripped != key:
+        variants.append(stripped)
+    for candidate in [key] + variants:
+        unversioned = VERSION_SUFFIX_PATTERN.sub("", candidate)
+        if len(unversioned) >= 2 and unversioned != candidate and unversioned not in variants:
+            variants.append(unversioned)
+    return variants
+
+
+def deletions(key: str) -> List[str]:
+    """All strings obtained by deleting one character from a key"""
+    return list({key[:i] + key[i + 1:] for i in range(len(key))})
+
+
+def key_hash(key: str) -> int:
+    """Stable 64-bit hash of a lookup key"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def build_index(skills: List[Dict[str, Any]], taxonomy_version: int = 1) -> bytes:
+    """
+    Build the binary alias index from taxonomy entries
+
+    Args:
+        skills: Entries with name, category and aliases
+        taxonomy_version: Version of the source taxonomy, stored in the header
+
+    Returns:
+        bytes: Index contents, ready to be written to disk
+    """
+    keys = set()
+    names = bytearray()
+    skill_table = bytearray()
+    for skill_id, skill in enumerate(skills):
+        name = skill["name"].encode("utf-8")
+        skill_table += SKILL_ENTRY.pack(len(names), len(name), CATEGORIES.index(skill.get("category", "technical")))
+        names += name
+        for alias in [skill["name"]] + list(skill.get("aliases", [])):
+            key = normalize_key(alias)
+            if not key:
+                continue
+            keys.add((key_hash(key), skill_id))
+            if len(key) >= MIN_FUZZY_KEY_LENGTH:
+                keys.update((key_hash(deleted), skill_id | FUZZY_FLAG) for deleted in deletions(key))
+
+    ordered = sorted(keys)
+    hash_table = struct.pack(f"<{len(ordered)}Q", *(h for h, _ in ordered))
+    entry_table = struct.pack(f"<{len(ordered)}I", *(entry for _, entry in ordered))
+    # Header is 40 bytes, so the hash table stays 8-byte aligned
+    hashes_offset = HEADER.size
+    entries_offset = hashes_offset + len(hash_table)
+    skills_offset = entries_offset + len(entry_table)
+    names_offset = skills_offset + len(skill_table)
+    header = HEADER.pack(
+        INDEX_MAGIC, INDEX_FORMAT_VERSION, taxonomy_version, len(skills), len(ordered),
+        hashes_offset, entries_offset, skills_offset, names_offset
+    )
+    return header + hash_table + entry_table + bytes(skill_table) + bytes(names)
+
+
+def build_index_from_taxonomy(path: Path = DEFAULT_TAXONOMY_PATH) -> bytes:
+    """Build the binary index from a taxonomy JSON file"""
+    with open(path, encoding="utf-8") as taxonomy_file:
+        data = json.load(taxonomy_file)
+    return build_index(data["skills"], int(data.get("version", 1)))
+
+
+class SkillIndex:
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        (magic, format_version, self.taxonomy_version, self.skill_count, self.key_count,
+         hashes_offset, entries_offset, self._skills_offset, self._names_offset) = HEADER.unpack_from(buffer, 0)
+        if magic != INDEX_MAGIC or format_version != INDEX_FORMAT_VERSION:
+            raise ValueError("Unsupported skill index file")
+        self._buffer = buffer
+        view = memoryview(buffer)
+        self._hashes = view[hashes_offset:entries_offset].cast("Q")
+        self._entry_ids = view[entries_offset:self._skills_offset].cast("I")
+        # Extracted skills repeat heavily across requests
+        self.lookup = lru_cache(maxsize=8192)(self._lookup)
+
+    @classmethod
+    def open(cls, path: Path = DEFAULT_INDEX_PATH) -> "SkillIndex":
+        """Memory-map a prebuilt index file; pages are loaded lazily by the OS"""
+        with open(path, "rb") as index_file:
+            return cls(mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _entries(self, key: str) -> List[int]:
+        """Entries stored under a key hash (binary search over the mapped hash table)"""
+        target = key_hash(key)
+        position = bisect.bisect_left(self._hashes, target)
+        entries = []
+        while position < self.key_count and self._hashes[position] == target:
+            entries.append(self._entry_ids[position])
+            position += 1
+        return entries
+
+    def _exact(self, key: str) -> Optional[int]:
+        return next((entry for entry in self._entries(key) if not entry & FUZZY_FLAG), None)
+
+    def _fuzzy(self, key: str) -> Optional[int]:
+        """Match within one edit using the stored deletion variants; ambiguous matches are rejected"""
+        if len(key) < MIN_FUZZY_KEY_LENGTH:
+            return None
+        candidates = {entry & ~FUZZY_FLAG for entry in self._entries(key) if entry & FUZZY_FLAG}
+        for deleted in deletions(key):
+            candidates.update(entry & ~FUZZY_FLAG for entry in self._entries(deleted))
+        return candidates.pop() if len(candidates) == 1 else None
+
+    def skill(self, skill_id: int) -> Tuple[str, str]:
+        """Canonical name and category of a skill"""
+        name_offset, name_length, category = SKILL_ENTRY.unpack_from(
+            self._buffer, self._skills_offset + skill_id * SKILL_ENTRY.size
+        )
+        start = self._names_offset + name_offset
+        return bytes(self._buffer[start:start + name_length]).decode("utf-8"), CATEGORIES[category]
+
+    def _lookup(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        Resolve a free-text skill to its canonical form
+
+        Args:
+            text: Skill as extracted, e.g. "Python3" or "python programming"
+
+        Returns:
+            Tuple: (canonical name, category), or None when the skill is unknown
+        """
+        key = normalize_key(text)
+        if not key:
+            return None
+        skill_id = self._exact(key)
+        if skill_id is not None:
+            return self.skill(skill_id)
+        variants = key_variants(key)
+        for candidate in variants:
+            skill_id = self._exact(candidate)
+            if skill_id is not None:
+                return self.skill(skill_id)
+        for candidate in [key] + variants:
+            skill_id = self._fuzzy(candidate)
+            if skill_id is not None:
+                return self.skill(skill_id)
+        return None
+
+    def match_exact(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        Resolve a phrase to a skill by exact key or looser variant, never fuzzily
+
+        Scanning free text tries many phrases that are not skills at all, where a
+        one-edit match would mostly be wrong.
+
+        Args:
+            text: Candidate phrase
+
+        Returns:
+            Tuple: (canonical name, category), or None
+        """
+        key = normalize_key(text)
+        if not key:
+            return None
+        for candidate in [key] + key_variants(key):
+            skill_id = self._exact(candidate)
+            if skill_id is not None:
+                return self.skill(skill_id)
+        return None
+
+    def canonicalize(self, items: Iterable[Any], seen: set = None) -> List[Any]:
+        """
+        Canonicalize a skill list and drop duplicates, keeping first-seen order
+
+        Args:
+            items: Extracted skills
+            seen: Keys already used elsewhere (updated in place), for cross-list dedupe
+
+        Returns:
+            List: Canonical names for known skills, trimmed originals for unknown ones
+        """
+        seen = set() if seen is None else seen
+        result = []
+        for item in items:
+            if not isinstance(item, str):
+                result.append(item)
+                continue
+            match = self.lookup(item)
+            value = match[0] if match else " ".join(item.split())
+            dedupe_key = normalize_key(value)
+            if value and dedupe_key not in seen:
+                seen.add(dedupe_key)
+                result.append(value)
+        return result
+
+    def normalize_requirements(self, requirements: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Canonicalize and dedupe the skill lists of a requirements structure
+
+        Items are deduplicated across lists; a must-have always wins over nice_to_have.
+
+        Args:
+            requirements: Requirements structure (title, description, must_have, nice_to_have)
+
+        Returns:
+            Dict: New requirements structure with normalized skill lists
+        """
+        if not isinstance(requirements, dict):
+            return requirements
+        normalized = dict(requirements)
+        seen = set()
+        must_have = dict(requirements.get("must_have") or {})
+        for field in ("technical_skills", "domain_experience", "soft_skills"):
+            if isinstance(must_have.get(field), list):
+                must_have[field] = self.canonicalize(must_have[field], seen)
+        if "must_have" in requirements:
+            normalized["must_have"] = must_have
+        if isinstance(requirements.get("nice_to_have"), list):
+            normalized["nice_to_have"] = self.canonicalize(requirements["nice_to_have"], seen)
+        return normalized
+
+
+_index: Optional[SkillIndex] = None
+
+
+def get_skill_index(path: str = SKILL_INDEX_PATH) -> SkillIndex:
+    """
+    Open the skill index once and keep it mapped
+
+    Falls back to building the index in memory from the bundled taxonomy when no
+    prebuilt file exists (run scripts/build_skill_index.py to create one).
+    """
+    global _index
+    if _index is None:
+        index_path = Path(path) if path else DEFAULT_INDEX_PATH
+        if index_path.exists():
+            _index = SkillIndex.open(index_path)
+        else:
+            _index = SkillIndex(build_index_from_taxonomy())
+    return _index
+
+
+def normalize_requirements(requirements: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonicalize and dedupe skills locally, unless disabled in settings"""
+    if not SKILL_NORMALIZATION_ENABLED or not requirements:
+        return requirements
+    return get_skill_index().normalize_requirements(requirements)
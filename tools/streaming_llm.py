@@ -3,14 +3,50 @@
 
 import json
 import asyncio
-from typing import AsyncGenerator, Dict, Any
+from functools import partial
+from typing import AsyncGenerator, Dict, Any, List
 from openai import OpenAI
-from config.settings import MODEL_NAME, TEMPERATURE, MAX_TOKENS, OPENAI_API_KEY
+from config.settings import (
+    TEMPERATURE, OPENAI_API_KEY, LLM_MAX_RETRIES, QUESTION_LIBRARY_ENABLED, QUESTION_LIBRARY_PATH
+)
+from tools.model_router import ModelRouter
+from tools.prompt_templates import QUESTIONS, STREAM_CLASSIFY, STREAM_PARSE
+from tools.question_library import get_question_library
+from tools.token_estimator import CLASSIFY_INPUT_TOKENS, plan_max_tokens, truncate_to_tokens
+from utils.json_stream import JSONArrayItemParser
+from utils.metrics import metrics
+from utils.sync_bridge import iterate_in_thread
+from utils.usage_tracker import in_current_context
 
 class StreamingLLMTools:
     def __init__(self):
         # Use API key from environment variables
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAI(api_key=OPENAI_API_KEY, max_retries=LLM_MAX_RETRIES)
+        self.router = ModelRouter(self.client)
+    
+    async def _open_stream(self, stage: str, messages: List[Dict[str, str]]):
+        """
+        Start a streamed completion in a worker thread
+        
+        The create call blocks until the response headers arrive, which under a slow
+        upstream is the longest wait of the whole call.
+        
+        Args:
+            stage: Call stage
+            messages: Chat messages
+        
+        Returns:
+            The router's tracked stream
+        """
+        create = partial(
+            self.router.create,
+            stage,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=plan_max_tokens(stage, messages),
+            stream=True
+        )
+        return await asyncio.get_running_loop().run_in_executor(None, in_current_context(create))
     
     async def stream_parse_job_description(self, jd_text: str) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -22,47 +58,16 @@ class StreamingLLMTools:
         Yields:
             Dict: Streaming parsed data chunks
         """
-        prompt = f"""
-        Analyze the following job description and extract structured information step by step.
-        Please provide your analysis in real-time as you process each section.
-
-        Job Description:
-        {jd_text}
-
-        Please analyze and output in this order:
-        1. Job title
-        2. Job description summary
-        3. Technical skills (programming languages, frameworks, tools)
-        4. Domain experience (industry experience, business domain knowledge)
-        5. Soft skills (communication, leadership, teamwork)
-        6. Nice-to-have skills (non-essential but preferred)
-
-        Output each section as it's analyzed, using this format:
-        {{"section": "title", "content": "extracted title"}}
-        {{"section": "description", "content": "extracted description"}}
-        {{"section": "technical_skills", "content": ["skill1", "skill2"]}}
-        {{"section": "domain_experience", "content": ["exp1", "exp2"]}}
-        {{"section": "soft_skills", "content": ["skill1", "skill2"]}}
-        {{"section": "nice_to_have", "content": ["bonus1", "bonus2"]}}
-        """
-        
         try:
-            stream = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a professional job description analyst. Provide real-time analysis as you process each section."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS,
-                stream=True
-            )
+            messages = STREAM_PARSE.messages(jd_text=jd_text)
+            stream = await self._open_stream("stream_parse", messages)
             
             current_section = ""
             current_content = ""
+            emitted_sections = set()
             
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
+            async for chunk in iterate_in_thread(stream):
+                if chunk.choices and chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
                     current_content += content
                     
@@ -76,7 +81,8 @@ class StreamingLLMTools:
                                 if line.startswith('{') and line.endswith('}'):
                                     try:
                                         data = json.loads(line)
-                                        if 'section' in data and 'content' in data:
+                                        if 'section' in data and 'content' in data and data['section'] not in emitted_sections:
+                                            emitted_sections.add(data['section'])
                                             yield {
                                                 "type": "section_complete",
                                                 "section": data["section"],
@@ -122,36 +128,17 @@ class StreamingLLMTools:
         Yields:
             Dict: Streaming scenario analysis
         """
-        prompt = f"""
-        Analyze the following user input and determine if it contains detailed job description information.
-        Provide your analysis in real-time.
-
-        User input:
-        {user_input}
-
-        Please analyze:
-        1. Level of detail in the input
-        2. Presence of specific job requirements
-        3. Whether additional information is needed
-        4. Final determination: "detailed_jd" or "need_conversation"
-        """
+        # The head of the input is enough to judge its level of detail
+        user_input = truncate_to_tokens(user_input, CLASSIFY_INPUT_TOKENS)
         
         try:
-            stream = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a professional job description analyst."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=TEMPERATURE,
-                max_tokens=200,
-                stream=True
-            )
+            messages = STREAM_CLASSIFY.messages(user_input=user_input)
+            stream = await self._open_stream("stream_classify", messages)
             
             analysis_text = ""
             
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
+            async for chunk in iterate_in_thread(stream):
+                if chunk.choices and chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
                     analysis_text += content
                     
@@ -186,49 +173,35 @@ class StreamingLLMTools:
         Yields:
             Dict: Streaming question generation
         """
-        context = ""
+        # Standard gaps are answered from memory; only unusual ones need the LLM
+        if QUESTION_LIBRARY_ENABLED:
+            library_questions = get_question_library(QUESTION_LIBRARY_PATH).lookup(current_info)
+            metrics.increment("question_library.hits" if library_questions else "question_library.misses")
+            if library_questions:
+                for index, question in enumerate(library_questions.get("questions_with_options", [])):
+                    yield {"type": "question", "index": index, "question": question}
+                yield {
+                    "type": "questions_complete",
+                    "questions": library_questions,
+                    "message": "Questions served from library"
+                }
+                return
+        
+        context = "Nothing is known about the position yet."
         if current_info:
             context = f"Current information: {json.dumps(current_info, indent=2)}"
         
-        prompt = f"""
-        Generate structured questions to gather job requirements information.
-        Provide your analysis and question generation in real-time.
-
-        {context}
-        
-        Please generate questions in this JSON format:
-        {{
-            "session_id": "",
-            "questions_with_options": [
-                {{
-                    "question": "What is the primary role type for this position?",
-                    "options": [
-                        {{"text": "Technical/Engineering", "value": "technical", "description": "Software development, data engineering, DevOps roles"}},
-                        {{"text": "Product Management", "value": "product", "description": "Product strategy, roadmap planning, stakeholder management"}}
-                    ],
-                    "allow_custom_input": true,
-                    "required": true
-                }}
-            ]
-        }}
-        """
-        
         try:
-            stream = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a professional HR specialist who creates structured interview questions."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=TEMPERATURE,
-                max_tokens=MAX_TOKENS,
-                stream=True
-            )
+            messages = QUESTIONS.messages(context=context)
+            stream = await self._open_stream("questions", messages)
             
             question_text = ""
+            # Each question is emitted as soon as its object closes, not after the whole JSON
+            parser = JSONArrayItemParser("questions_with_options")
+            streamed_questions = []
             
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
+            async for chunk in iterate_in_thread(stream):
+                if chunk.choices and chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
                     question_text += content
                     
@@ -237,6 +210,10 @@ class StreamingLLMTools:
                         "content": content,
                         "message": "Generating structured questions..."
                     }
+                    for question in parser.feed(content):
+                        if isinstance(question, dict) and question.get("question"):
+                            yield {"type": "question", "index": len(streamed_questions), "question": question}
+                            streamed_questions.append(question)
             
             # Try to parse the complete questions JSON
             try:
@@ -247,6 +224,14 @@ class StreamingLLMTools:
                     "message": "Questions generation completed"
                 }
             except json.JSONDecodeError:
+                if streamed_questions:
+                    # Fenced or truncated output: keep the questions that did close
+                    yield {
+                        "type": "questions_complete",
+                        "questions": {"session_id": "", "questions_with_options": streamed_questions},
+                        "message": "Questions generation completed"
+                    }
+                    return
                 yield {
                     "type": "questions_complete",
                     "questions": self._get_default_questions(),
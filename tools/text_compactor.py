@@ -0,0 +1,172 @@
+# Author: Peng Fei
+# Local pre-processing that compacts job descriptions before they are prompted
+
+import html
+import re
+from typing import Any, Dict, List
+
+from tools.token_estimator import estimate_tokens
+
+# Section headers whose whole section carries no requirement information
+BOILERPLATE_HEADERS = re.compile(
+    r"^(benefits?|perks?( ?(&|and) ?benefits)?|what we offer|what's in it for you|why (join|work)( with)? us"
+    r"|compensation( ?(&|and) ?benefits)?|equal (employment )?opportunity( employer)?|eeo( statement)?"
+    r"|diversity( ?(&|and) ?inclusion)?( statement)?|our commitment to diversity|accommodations?"
+    r"|how to apply|application process|legal notice|privacy notice)\s*:?$",
+    re.IGNORECASE
+)
+
+# Paragraphs matching any of these are legal / HR boilerplate wherever they appear
+BOILERPLATE_PARAGRAPHS = [
+    re.compile(r"\bequal (employment )?opportunity (employer|workplace)\b", re.IGNORECASE),
+    re.compile(r"\bwithout regard to\b.{0,80}\b(race|color|religion|sex|gender|national origin|age|disability)\b", re.IGNORECASE),
+    re.compile(r"\breasonable accommodations?\b.{0,120}\b(disabilit|application|interview)", re.IGNORECASE),
+    re.compile(r"\b(e-verify|affirmative action employer)\b", re.IGNORECASE),
+    re.compile(r"\bwe (do not|don't) accept (unsolicited )?(resumes|agency)", re.IGNORECASE),
+]
+
+# Lines that are kept even inside a boilerplate section
+REQUIREMENT_CUES = re.compile(
+    r"\b(\d+\s*\+?\s*((-|to)\s*\d+\s*\+?\s*)?years?|years? of|required|requirements?|must|qualifications?"
+    r"|experience (with|in)|proficien\w*|knowledge of|familiar(ity)? with)\b",
+    re.IGNORECASE
+)
+
+HEADER_LINE = re.compile(r"^\s*(#{1,6}\s*)?([A-Za-z][A-Za-z &'/-]{1,60}?)\s*:?\s*$")
+# Anything that looks like the start of another section, such as "Requirements (must have):"
+SECTION_BREAK_LINE = re.compile(r"^\s*(#{1,6}\s+\S.*|[A-Za-z][^.!?]{0,80}:)\s*$")
+BLOCK_TAGS = re.compile(r"<\s*(br|/p|/div|/ul|/ol|/h[1-6]|h[1-6]|p|div|ul|ol|tr|/tr)\b[^>]*>", re.IGNORECASE)
+LIST_ITEM_TAG = re.compile(r"<\s*li\b[^>]*>", re.IGNORECASE)
+SCRIPT_STYLE = re.compile(r"<\s*(script|style)\b.*?<\s*/\s*\1\s*>", re.IGNORECASE | re.DOTALL)
+# Only known tag names, so plain text such as "<5 years ... >10 engineers" survives
+ANY_TAG = re.compile(
+    r"<!--.*?-->|<\s*/?\s*(a|abbr|article|b|blockquote|body|br|button|caption|center|code|col|dd|div|dl|dt|em|font"
+    r"|footer|form|h[1-6]|head|header|hr|html|i|img|input|label|li|link|main|meta|nav|ol|p|pre|section|small|span"
+    r"|strong|sub|sup|table|tbody|td|tfoot|th|thead|title|tr|u|ul)\b[^>]*>",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def strip_html(text: str) -> str:
+    """Convert HTML remnants to plain text, keeping block structure as line breaks"""
+    if "<" not in text and "&" not in text:
+        return text
+    text = SCRIPT_STYLE.sub(" ", text)
+    text = LIST_ITEM_TAG.sub("\n- ", text)
+    text = BLOCK_TAGS.sub("\n", text)
+    text = ANY_TAG.sub(" ", text)
+    return html.unescape(text)
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces and blank lines"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\u00a0", " ")
+    lines = [re.sub(r"[ \t\f\v]+", " ", line).strip() for line in text.split("\n")]
+    text = "\n".join(lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def split_sections(text: str) -> List[List[str]]:
+    """Split text into sections, each starting with an optional header line"""
+    sections: List[List[str]] = [[]]
+    for line in text.split("\n"):
+        if line and HEADER_LINE.match(line) and len(line.split()) <= 8:
+            sections.append([line])
+        else:
+            sections[-1].append(line)
+    return [section for section in sections if any(section)]
+
+
+def _after_boilerplate(lines: List[str]) -> List[str]:
+    """
+    Lines under a boilerplate header that are not boilerplate
+
+    The boilerplate ends at the first paragraph break or header-like line. Lines with
+    requirement cues are kept wherever they are.
+    """
+    seen_content = False
+    for index, line in enumerate(lines):
+        # Blank lines right under the header do not end the section
+        if (not line and seen_content) or SECTION_BREAK_LINE.match(line):
+            return [line for line in lines[:index] if REQUIREMENT_CUES.search(line)] + lines[index:]
+        seen_content = seen_content or bool(line)
+    return [line for line in lines if REQUIREMENT_CUES.search(line)]
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Drop boilerplate sections and paragraphs, and repeated paragraphs
+
+    Args:
+        text: Whitespace-normalized job description
+
+    Returns:
+        str: Text without EEO statements, benefits blurbs and duplicate blocks
+    """
+    kept_sections = []
+    seen_paragraphs = set()
+    for section in split_sections(text):
+        header = HEADER_LINE.match(section[0]) if section[0] else None
+        if header and BOILERPLATE_HEADERS.match(header.group(2).strip()):
+            section = _after_boilerplate(section[1:])
+
+        kept_paragraphs = []
+        for paragraph in "\n".join(section).split("\n\n"):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if any(pattern.search(paragraph) for pattern in BOILERPLATE_PARAGRAPHS):
+                continue
+            # Repeated company intros and copy-paste duplicates
+            key = re.sub(r"\W+", " ", paragraph.lower()).strip()
+            if len(key) > 40 and key in seen_paragraphs:
+                continue
+            seen_paragraphs.add(key)
+            kept_paragraphs.append(paragraph)
+
+        if kept_paragraphs:
+            kept_sections.append("\n\n".join(kept_paragraphs))
+    return "\n\n".join(kept_sections)
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """Cap text length, cutting at a paragraph or line boundary when possible"""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind("\n\n"), cut.rfind("\n"))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary]
+    return cut.rstrip()
+
+
+def compact_job_description(
+    text: str,
+    strip_boilerplate_blocks: bool = True,
+    max_chars: int = 0
+) -> Dict[str, Any]:
+    """
+    Compact a job description locally before it is sent to the LLM
+
+    Args:
+        text: Raw job description as pasted by the user
+        strip_boilerplate_blocks: Whether to remove EEO/benefits/duplicate blocks
+        max_chars: Maximum length of the compacted text (0 for no cap)
+
+    Returns:
+        Dict: Compacted text with token counts before and after
+    """
+    compacted = normalize_whitespace(strip_html(text or ""))
+    if strip_boilerplate_blocks:
+        compacted = strip_boilerplate(compacted) or compacted
+    capped = truncate(compacted, max_chars)
+
+    original_tokens = estimate_tokens(text or "")
+    compacted_tokens = estimate_tokens(capped)
+    return {
+        "text": capped,
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "tokens_saved": max(0, original_tokens - compacted_tokens),
+        "truncated": len(capped) < len(compacted)
+    }
@@ -0,0 +1,169 @@
+# Author: Peng Fei
+# Local token estimation and per-call max_tokens budgets
+
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from config.settings import MODEL_NAME, MAX_TOKENS, MODEL_CONTEXT_WINDOW
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to the calibrated heuristic
+    tiktoken = None
+
+# Per-message framing tokens added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Expected output shape per stage: (base tokens, tokens per input token, floor)
+STAGE_OUTPUT_SHAPES = {
+    "classify": (16, 0.0, 16),
+    "stream_classify": (200, 0.0, 120),
+    "parse": (200, 0.5, 400),
+    "stream_parse": (200, 0.5, 400),
+    "questions": (1200, 0.0, 800),
+    "user_response": (150, 0.2, 200),
+    "verify": (100, 0.0, 200),
+    "format": (150, 1.2, 300),
+}
+
+# Classification only needs the head of the input
+CLASSIFY_INPUT_TOKENS = 2000
+
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+
+class ContextOverflowError(ValueError):
+    """Raised when a prompt plus its output budget cannot fit the model context"""
+
+
+class TokenEstimator:
+    def __init__(self, model_name: str = MODEL_NAME):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        # Actual/estimated prompt tokens, learned from usage reports
+        self._correction = 1.0
+        self._lock = threading.Lock()
+
+    def estimate(self, text: str) -> int:
+        """
+        Estimate the number of tokens in a text
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            int: Token count (exact with tiktoken, calibrated heuristic otherwise)
+        """
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # CJK characters are roughly one token each, other text about four characters per token
+        cjk = len(CJK_PATTERN.findall(text))
+        raw = cjk + (len(text) - cjk + 3) / 4
+        return max(1, int(raw * self._correction + 0.5))
+
+    def estimate_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """Estimate prompt tokens of a chat message list"""
+        return sum(self.estimate(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS for message in messages) + 2
+
+    def calibrate(self, estimated: int, actual: Optional[int]):
+        """Adjust the heuristic from a prompt_tokens value reported by the provider"""
+        if self._encoding is not None or not estimated or not actual:
+            return
+        with self._lock:
+            ratio = self._correction * actual / estimated
+            self._correction = 0.9 * self._correction + 0.1 * max(0.25, min(ratio, 4.0))
+
+
+# Shared estimator used by the LLM tools
+token_estimator = TokenEstimator()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text"""
+    return token_estimator.estimate(text)
+
+
+def output_budget(stage: str, input_tokens: int) -> int:
+    """
+    Size max_tokens for a call from its input size and expected output shape
+
+    Args:
+        stage: Call stage (classify, parse, questions, ...)
+        input_tokens: Estimated prompt tokens
+
+    Returns:
+        int: max_tokens to request, never above MAX_TOKENS
+    """
+    base, per_input_token, floor = STAGE_OUTPUT_SHAPES.get(stage, (MAX_TOKENS, 0.0, MAX_TOKENS))
+    budget = max(floor, int(base + per_input_token * input_tokens))
+    return min(budget, MAX_TOKENS)
+
+
+def plan_max_tokens(stage: str, messages: List[Dict[str, Any]]) -> int:
+    """
+    Compute max_tokens for a call and reject prompts that would overflow the context
+
+    Args:
+        stage: Call stage
+        messages: Chat messages to be sent
+
+    Returns:
+        int: max_tokens for the call
+
+    Raises:
+        ContextOverflowError: If prompt plus output budget exceeds MODEL_CONTEXT_WINDOW
+    """
+    input_tokens = token_estimator.estimate_messages(messages)
+    budget = output_budget(stage, input_tokens)
+    if input_tokens + budget > MODEL_CONTEXT_WINDOW:
+        raise ContextOverflowError(
+            f"{stage} prompt needs ~{input_tokens} tokens plus {budget} for output, "
+            f"over the {MODEL_CONTEXT_WINDOW}-token context window"
+        )
+    return budget
+
+
+def fits_in_context(stage: str, text: str, prompt_overhead_tokens: int = 500) -> bool:
+    """Whether a text plus the stage's fixed prompt and output budget fits the context"""
+    input_tokens = estimate_tokens(text) + prompt_overhead_tokens
+    return input_tokens + output_budget(stage, input_tokens) <= MODEL_CONTEXT_WINDOW
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head of a text that fits within max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Scale by the measured ratio, then trim until it fits
+    cut = int(len(text) * max_tokens / max(1, estimate_tokens(text)))
+    while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut]
+
+
+def estimate_pipeline_tokens(jd_text: str) -> int:
+    """
+    Estimate total tokens (prompt plus reserved output) one JD request will consume
+
+    Args:
+        jd_text: Job description text
+
+    Returns:
+        int: Estimated tokens across classification, parsing and formatting
+    """
+    input_tokens = estimate_tokens(jd_text)
+    classify_input = min(input_tokens, CLASSIFY_INPUT_TOKENS) + 300
+    parse_input = input_tokens + 400
+    parse_output = output_budget("parse", parse_input)
+    format_input = parse_output + 250
+    return (
+        classify_input + output_budget("classify", classify_input)
+        + parse_input + parse_output
+        + format_input + output_budget("format", format_input)
+    )
@@ -0,0 +1,176 @@
+# Author: Peng Fei
+# Admission control: shed load early when in-flight work or upstream latency is too high
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+from utils.fair_scheduler import client_label
+from utils.metrics import metrics
+
+
+class LatencyWindow:
+    """Upstream call latencies observed over the last few seconds"""
+
+    def __init__(self, window_seconds: float = 60, max_samples: int = 1024):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Record the duration of one upstream call"""
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Percentile of the calls inside the window, or None without recent calls"""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            values = sorted(seconds for _, seconds in self._samples)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Shared window fed by every model call
+upstream_latency = LatencyWindow()
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_in_flight_per_client: int,
+        max_queued_tokens: int,
+        target_latency_seconds: float = 0,
+        latency: LatencyWindow = upstream_latency
+    ):
+        """
+        Args:
+            max_in_flight: Requests admitted at the same time
+            max_in_flight_per_client: Requests one client may have in flight
+            max_queued_tokens: Estimated tokens of all admitted, unfinished requests
+            target_latency_seconds: Upstream p95 latency above which the in-flight limit shrinks (0 disables)
+            latency: Source of recent upstream latencies
+        """
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_client = max_in_flight_per_client
+        self.max_queued_tokens = max_queued_tokens
+        self.target_latency_seconds = target_latency_seconds
+        self.latency = latency
+        self.in_flight = 0
+        self.queued_tokens = 0
+        self._per_client: Dict[str, int] = {}
+
+    def in_flight_limit(self) -> int:
+        """Current in-flight limit, reduced in proportion while upstream is slower than the target"""
+        p95 = self.latency.percentile(0.95) if self.target_latency_seconds > 0 else None
+        if p95 is None or p95 <= self.target_latency_seconds:
+            return self.max_in_flight
+        # Never below one, so a request still gets through to measure recovery
+        return max(1, int(self.max_in_flight * self.target_latency_seconds / p95))
+
+    def admit(self, client_id: str, tokens: int):
+        """
+        Admit a request or reject it at once
+
+        Args:
+            client_id: Client the request belongs to
+            tokens: Estimated tokens the request will consume
+
+        Raises:
+            AdmissionRejected: 429 when the client is over its own limit, 503 when the service is overloaded
+        """
+        if self._per_client.get(client_id, 0) >= self.max_in_flight_per_client:
+            self._reject(429, "client_limit", "Too many concurrent requests for this client", client_id)
+        limit = self.in_flight_limit()
+        if self.in_flight >= limit:
+            self._reject(503, "in_flight", "Service is at capacity", client_id, self.in_flight / limit)
+        # A single request larger than the whole budget is still admitted on an idle service
+        if self.queued_tokens and self.queued_tokens + tokens > self.max_queued_tokens:
+            self._reject(503, "queued_tokens", "Service is at capacity", client_id,
+                         (self.queued_tokens + tokens) / self.max_queued_tokens)
+
+        self.in_flight += 1
+        self.queued_tokens += tokens
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        self._report()
+
+    def release(self, client_id: str, tokens: int):
+        """Return the capacity of a finished request"""
+        self.in_flight -= 1
+        self.queued_tokens -= tokens
+        count = self._per_client.get(client_id, 0) - 1
+        if count > 0:
+            self._per_client[client_id] = count
+        else:
+            self._per_client.pop(client_id, None)
+        self._report()
+
+    def retry_after(self, overload: float = 1.0) -> int:
+        """Seconds a rejected client should wait: about one upstream call, scaled by the overload"""
+        p50 = self.latency.percentile(0.5) or 1.0
+        return min(60, max(1, math.ceil(p50 * overload)))
+
+    def _reject(self, status_code: int, reason: str, message: str, client_id: str, overload: float = 1.0):
+        metrics.increment("admission.rejected", labels={"reason": reason, "client": client_label(client_id)})
+        raise AdmissionRejected(status_code, self.retry_after(overload), message)
+
+    def _report(self):
+        metrics.set_gauge("admission.in_flight", self.in_flight)
+        metrics.set_gauge("admission.queued_tokens", self.queued_tokens)
+
+
+class ClientRateLimiter:
+    def __init__(self, rate_per_second: float, burst: int, max_clients: int = 10000):
+        """
+        Token bucket per client, for requests cheap enough to skip admission but not free
+
+        Args:
+            rate_per_second: Requests one client may start per second on average (0 disables)
+            burst: Requests one client may start back to back
+            max_clients: Buckets kept; the least recently used are dropped beyond this
+        """
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, client_id: str, reason: str = "rate"):
+        """
+        Take one request from the client's bucket
+
+        Args:
+            client_id: Client the request belongs to
+            reason: Label of the rejection metric
+
+        Raises:
+            AdmissionRejected: 429 with the seconds until the bucket has a request again
+        """
+        if self.rate_per_second <= 0:
+            return
+        now = time.monotonic()
+        available, updated = self._buckets.pop(client_id, (float(self.burst), now))
+        available = min(float(self.burst), available + (now - updated) * self.rate_per_second)
+        if available < 1:
+            self._buckets[client_id] = (available, now)
+            metrics.increment("admission.rejected", labels={"reason": reason, "client": client_label(client_id)})
+            raise AdmissionRejected(
+                429, max(1, math.ceil((1 - available) / self.rate_per_second)), "Too many requests for this client"
+            )
+        self._buckets[client_id] = (available - 1, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
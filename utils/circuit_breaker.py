@@ -0,0 +1,166 @@
+# Author: Peng Fei
+# Circuit breakers that fail upstream calls fast while a model is erroring or too slow
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from utils.metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric state for gauges
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit for {name} is open; retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of recent calls to one upstream and stops sending calls while it is unhealthy
+
+    Closed: calls pass and are recorded. The circuit opens when, over the window, enough
+    calls failed or were slower than slow_call_seconds. Open: calls are rejected at once.
+    After open_seconds one probe call is let through (half-open); its success closes the
+    circuit, its failure opens it again. A probe whose outcome is never recorded (its
+    caller gave up) expires after probe_timeout_seconds, so the next call probes instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 30,
+        slow_call_rate: float = 0.5,
+        window_seconds: float = 60,
+        min_calls: int = 10,
+        open_seconds: float = 30,
+        probe_timeout_seconds: float = 0
+    ):
+        """
+        Args:
+            name: Upstream name, used in errors and metric labels
+            failure_rate: Share of failed calls in the window that opens the circuit
+            slow_call_seconds: Duration above which a successful call counts as slow (0 disables)
+            slow_call_rate: Share of slow calls in the window that opens the circuit
+            window_seconds: How far back calls are considered
+            min_calls: Calls needed in the window before the rates are trusted
+            open_seconds: Time the circuit stays open before a probe is allowed
+            probe_timeout_seconds: Time after which an unrecorded probe is considered abandoned
+                (0 uses slow_call_seconds, or open_seconds when slow calls are not tracked)
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds or slow_call_seconds or open_seconds
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        # (time, failed, slow) per recent call
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check that a call may be made now
+
+        Raises:
+            CircuitOpenError: While the circuit is open, or a half-open probe is already in flight
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.open_seconds - now
+            if self.state == OPEN and remaining <= 0:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and self._probe_expired(now):
+                metrics.increment("circuit.probes_abandoned", labels={"upstream": self.name})
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                return
+        metrics.increment("circuit.rejected", labels={"upstream": self.name})
+        raise CircuitOpenError(self.name, max(remaining, 1.0))
+
+    def available(self) -> bool:
+        """Whether a call would be allowed now, without claiming the half-open probe"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.open_seconds
+            return self.state == CLOSED or not self._probe_in_flight or self._probe_expired(time.monotonic())
+
+    def record_success(self, seconds: float):
+        """Record a call that returned, with its duration"""
+        slow = bool(self.slow_call_seconds) and seconds > self.slow_call_seconds
+        self._record(False, slow)
+
+    def record_failure(self):
+        """Record a call that failed for a reason that says the upstream is unhealthy"""
+        self._record(True, False)
+
+    def stats(self) -> Dict[str, Any]:
+        """State and recent failure and slow-call rates"""
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._calls)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failure_rate": round(sum(failed for _, failed, _ in self._calls) / calls, 3) if calls else None,
+                "slow_call_rate": round(sum(slow for _, _, slow in self._calls) / calls, 3) if calls else None
+            }
+
+    def _record(self, failed: bool, slow: bool):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open(now)
+                else:
+                    # Recovered: start over with a clean window
+                    self._calls.clear()
+                    self._set_state(CLOSED)
+                return
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            if self.state != CLOSED or len(self._calls) < self.min_calls:
+                return
+            calls = len(self._calls)
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._open(now)
+
+    def _probe_expired(self, now: float) -> bool:
+        return self._probe_in_flight and now - self._probe_started_at >= self.probe_timeout_seconds
+
+    def _open(self, now: float):
+        self._opened_at = now
+        self._set_state(OPEN)
+        metrics.increment("circuit.opened", labels={"upstream": self.name})
+        print(f"Circuit for {self.name} opened; calls fail fast for {self.open_seconds:g}s")
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.set_gauge("circuit.state", STATE_VALUES[state], {"upstream": self.name})
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
@@ -0,0 +1,151 @@
+# Author: Peng Fei
+# Per-event Content-Encoding for streaming (SSE / NDJSON) responses
+
+import time
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+# Only streaming responses are compressed here; everything else is left alone
+STREAMING_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def supported_encodings() -> tuple:
+    """Encodings this server can produce, in order of preference"""
+    if brotli is not None:
+        return ("gzip", "br", "deflate")
+    return ("gzip", "deflate")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        str: Chosen encoding, or None for identity
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        pieces = part.strip().split(";")
+        coding = pieces[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    best, best_quality = None, 0.0
+    for coding in supported_encodings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str, level: int = 6):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=max(0, min(level, 11)))
+            self._zlib = None
+        else:
+            # gzip uses the gzip container, HTTP "deflate" is the zlib container
+            wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+            self._zlib = zlib.compressobj(max(0, min(level, 9)), zlib.DEFLATED, wbits)
+            self._brotli = None
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress one event and flush it so the client can decode it immediately"""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Terminate the compressed stream"""
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class StreamingCompressionMiddleware:
+    """
+    ASGI middleware that compresses SSE and NDJSON responses with a sync flush
+    after every body message, so compression never holds an event back.
+    """
+
+    def __init__(self, app, level: int = 6):
+        self.app = app
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"compressor": None, "bytes_in": 0, "bytes_out": 0, "events": 0}
+
+        async def compressed_send(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if content_type.startswith(STREAMING_MEDIA_TYPES) and "content-encoding" not in headers:
+                    state["compressor"] = StreamCompressor(encoding, self.level)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+            elif message["type"] == "http.response.body" and state["compressor"] is not None:
+                compressor = state["compressor"]
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+
+                started = time.perf_counter()
+                output = compressor.compress(body) if body else b""
+                if not more_body:
+                    output += compressor.finish()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+                if body:
+                    state["events"] += 1
+                    state["bytes_in"] += len(body)
+                    metrics.observe("stream_compression.latency_ms_per_event", elapsed_ms, {"encoding": encoding})
+                state["bytes_out"] += len(output)
+
+                if not more_body:
+                    self._record_request(encoding, state)
+                message = {**message, "body": output}
+
+            await send(message)
+
+        await self.app(scope, receive, compressed_send)
+
+    def _record_request(self, encoding: str, state: dict):
+        """Record per-request byte counts once the stream ends"""
+        labels = {"encoding": encoding}
+        metrics.observe("stream_compression.bytes_in_per_request", state["bytes_in"], labels)
+        metrics.observe("stream_compression.bytes_out_per_request", state["bytes_out"], labels)
+        metrics.observe("stream_compression.events_per_request", state["events"], labels)
+        if state["bytes_in"]:
+            metrics.observe("stream_compression.ratio", state["bytes_out"] / state["bytes_in"], labels)
@@ -0,0 +1,107 @@
+# Author: Peng Fei
+# Conversation state helpers: compact context selection and local patch application
+
+import copy
+import json
+import re
+from typing import Any, Dict, List
+
+LIST_FIELDS = ("technical_skills", "domain_experience", "soft_skills", "nice_to_have")
+TEXT_FIELDS = ("title", "description")
+MUST_HAVE_FIELDS = ("technical_skills", "domain_experience", "soft_skills")
+
+# Question keywords that tell which requirement fields an answer can change
+FIELD_KEYWORDS = [
+    ("title", re.compile(r"role|position|title|job type", re.IGNORECASE)),
+    ("description", re.compile(r"experience level|seniority|years|responsibilit|description|level", re.IGNORECASE)),
+    ("technical_skills", re.compile(r"technical|skills? (and|&) tools|tools|programming|language|framework|stack", re.IGNORECASE)),
+    ("domain_experience", re.compile(r"domain|industry|market|sector", re.IGNORECASE)),
+    ("soft_skills", re.compile(r"soft skills?|communication|leadership|teamwork", re.IGNORECASE)),
+    ("nice_to_have", re.compile(r"plus|nice to have|nice-to-have|bonus|preferred", re.IGNORECASE)),
+]
+
+
+def empty_requirements() -> Dict[str, Any]:
+    """Empty requirements structure"""
+    return {
+        "title": "",
+        "description": "",
+        "must_have": {field: [] for field in MUST_HAVE_FIELDS},
+        "nice_to_have": []
+    }
+
+
+def compact_json(data: Any) -> str:
+    """Serialize without indentation or spaces"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def get_field(info: Dict[str, Any], field: str) -> Any:
+    """Read a flat field name from the nested requirements structure"""
+    if field in MUST_HAVE_FIELDS:
+        return (info.get("must_have") or {}).get(field) or []
+    return info.get(field) or ([] if field in LIST_FIELDS else "")
+
+
+def relevant_fields(response: str, question: str = None) -> List[str]:
+    """
+    Work out which fields a user's answer can change
+
+    Args:
+        response: User response, e.g. "What is the primary role type?:Technical;"
+        question: Question being answered, when known
+
+    Returns:
+        List: Flat field names; all fields when nothing can be inferred
+    """
+    text = question or " ".join(part.split(":", 1)[0] for part in response.split(";") if ":" in part)
+    fields = [field for field, pattern in FIELD_KEYWORDS if text and pattern.search(text)]
+    return fields or list(TEXT_FIELDS + LIST_FIELDS)
+
+
+def select_fields(info: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Flat view of the given fields that already have a value"""
+    return {field: get_field(info, field) for field in fields if get_field(info, field)}
+
+
+def apply_patch(info: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a model-produced patch to the requirements locally
+
+    Args:
+        info: Current requirements structure
+        patch: {"set": {field: value}, "add": {field: [items]}, "remove": {field: [items]}}
+
+    Returns:
+        Dict: New requirements structure; the input is left untouched
+    """
+    updated = copy.deepcopy(info) if info else empty_requirements()
+    updated.setdefault("must_have", {})
+    for field in MUST_HAVE_FIELDS:
+        updated["must_have"].setdefault(field, [])
+    updated.setdefault("nice_to_have", [])
+
+    def target(field: str) -> Dict[str, Any]:
+        return updated["must_have"] if field in MUST_HAVE_FIELDS else updated
+
+    for field, value in (patch.get("set") or {}).items():
+        if field in TEXT_FIELDS:
+            updated[field] = str(value)
+        elif field in LIST_FIELDS and isinstance(value, list):
+            target(field)[field] = value
+
+    for field, items in (patch.get("add") or {}).items():
+        if field in LIST_FIELDS:
+            existing = target(field)[field]
+            known = {str(item).lower() for item in existing}
+            for item in items if isinstance(items, list) else [items]:
+                if str(item).lower() not in known:
+                    existing.append(item)
+                    known.add(str(item).lower())
+
+    for field, items in (patch.get("remove") or {}).items():
+        if field in LIST_FIELDS:
+            drop = {str(item).lower() for item in (items if isinstance(items, list) else [items])}
+            target(field)[field] = [item for item in target(field)[field] if str(item).lower() not in drop]
+
+    return updated
@@ -0,0 +1,169 @@
+# Author: Peng Fei
+# Coalescing of token-level chunk events from the streaming LLM tools
+
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+# Event types that carry one upstream delta each and can be batched
+CHUNK_EVENT_TYPES = {"content_chunk", "analysis_chunk", "question_chunk"}
+
+
+class _ChunkBatch:
+    def __init__(self, event: Dict[str, Any]):
+        self.type = event["type"]
+        self.message = event.get("message", "")
+        self.parts: List[str] = []
+        self.size = 0
+        self.started = time.monotonic()
+
+    def add(self, event: Dict[str, Any]):
+        content = event.get("content") or ""
+        self.parts.append(content)
+        self.size += len(content.encode("utf-8"))
+        self.message = event.get("message", self.message)
+
+    def to_event(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "content": "".join(self.parts),
+            "message": self.message,
+            "chunks": len(self.parts)
+        }
+
+
+class _UpstreamReader:
+    """
+    Reads upstream events in one long-lived task, so waiting for the next event
+    with a timeout needs no task per event
+    """
+
+    def __init__(self, events: AsyncGenerator[Dict[str, Any], None], max_pending: int = 256):
+        self.events = events
+        self._pending: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._finished = False
+        self._error: Optional[BaseException] = None
+        self._waiter: Optional[asyncio.Future] = None
+        self._task = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        try:
+            async for event in self.events:
+                await self._pending.put(event)
+                self._wake()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finished = True
+            self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def ready(self) -> bool:
+        """Whether next() returns at once"""
+        return not self._pending.empty() or self._finished
+
+    async def wait(self, timeout: Optional[float]):
+        """Wait until ready, or until the timeout (None waits indefinitely)"""
+        loop = asyncio.get_running_loop()
+        self._waiter = loop.create_future()
+        timer = loop.call_later(timeout, self._wake) if timeout is not None else None
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+            if timer is not None:
+                timer.cancel()
+
+    def next(self) -> Optional[Dict[str, Any]]:
+        """Next upstream event once ready; None at the end, or the upstream error raised"""
+        if not self._pending.empty():
+            return self._pending.get_nowait()
+        if self._error is not None:
+            raise self._error
+        return None
+
+    async def close(self):
+        """Stop reading and close the upstream generator"""
+        self._task.cancel()
+        await asyncio.wait({self._task})
+        await _close_upstream(self.events)
+
+
+async def _close_upstream(events: AsyncGenerator[Dict[str, Any], None]):
+    """Close the upstream generator now, so a consumer that stops early does not leave the LLM stream open"""
+    aclose = getattr(events, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+async def coalesce_chunks(
+    events: AsyncGenerator[Dict[str, Any], None],
+    window_ms: float = 50,
+    max_bytes: int = 2048
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Batch consecutive chunk events by time window or byte size
+
+    Structural events (section_complete, scenario_determined, errors, ...)
+    flush any pending batch and are passed through immediately.
+
+    Args:
+        events: Event stream from a streaming LLM tool
+        window_ms: Maximum time a chunk waits in a batch; 0 disables coalescing
+        max_bytes: Batch size that triggers an immediate flush
+
+    Yields:
+        Dict: Coalesced chunk events and untouched structural events
+    """
+    if not window_ms or window_ms <= 0:
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await _close_upstream(events)
+        return
+
+    window = window_ms / 1000
+    reader = _UpstreamReader(events)
+    batch: Optional[_ChunkBatch] = None
+    try:
+        while True:
+            if not reader.ready():
+                timeout = None
+                if batch is not None:
+                    timeout = max(0.0, window - (time.monotonic() - batch.started))
+                await reader.wait(timeout)
+                if not reader.ready():
+                    # Window elapsed while upstream is quiet
+                    yield batch.to_event()
+                    batch = None
+                    continue
+
+            event = reader.next()
+            if event is None:
+                break
+
+            if event.get("type") in CHUNK_EVENT_TYPES:
+                if batch is not None and batch.type != event["type"]:
+                    yield batch.to_event()
+                    batch = None
+                if batch is None:
+                    batch = _ChunkBatch(event)
+                batch.add(event)
+                if batch.size >= max_bytes or time.monotonic() - batch.started >= window:
+                    yield batch.to_event()
+                    batch = None
+                continue
+
+            if batch is not None:
+                yield batch.to_event()
+                batch = None
+            yield event
+
+        if batch is not None:
+            yield batch.to_event()
+    finally:
+        await reader.close()
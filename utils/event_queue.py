@@ -0,0 +1,156 @@
+# Author: Peng Fei
+# Bounded per-subscriber event queue that drops or merges non-essential events when full
+
+import asyncio
+import json
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+# Events a client must receive; they are queued even past capacity
+ESSENTIAL_EVENT_TYPES = ("partial_result", "question", "complete", "error")
+
+# Merged content chunks stop growing past this size, keeping memory per queue bounded
+MAX_MERGED_CHUNK_CHARS = 4096
+
+
+def _decode(event: Dict[str, Any]) -> Dict[str, Any]:
+    data = event["data"]
+    return json.loads(data) if isinstance(data, str) else data
+
+
+class _Entry:
+    __slots__ = ("seq", "event", "parts", "size")
+
+    def __init__(self, seq: int, event: Dict[str, Any]):
+        self.seq = seq
+        self.event = event
+        # Content of merged chunks, joined only when the entry is read
+        self.parts: Optional[List[str]] = None
+        self.size = 0
+
+    @property
+    def kind(self) -> str:
+        return self.event["event"]
+
+    def content_size(self) -> int:
+        """Length of the entry's content, decoded once and kept on the entry"""
+        if self.parts is None:
+            self.parts = [_decode(self.event).get("content", "")]
+            self.size = len(self.parts[0])
+        return self.size
+
+    def absorb(self, later: "_Entry"):
+        """Append the next queued chunk's content; the later event's id and fields win"""
+        self.content_size()
+        self.size += later.content_size()
+        self.parts.extend(later.parts)
+        self.seq, self.event = later.seq, later.event
+
+    def resolve(self) -> Tuple[int, Dict[str, Any]]:
+        if self.parts is None or len(self.parts) == 1:
+            return self.seq, self.event
+        metrics.increment("stream.chunks_merged", len(self.parts) - 1)
+        encoded = isinstance(self.event["data"], str)
+        data = dict(_decode(self.event), content="".join(self.parts))
+        return self.seq, dict(self.event, data=json.dumps(data, ensure_ascii=False) if encoded else data)
+
+
+class BoundedEventQueue:
+    """
+    Queue between a run's producer and one client writer
+
+    The producer never waits. When the queue is full, a new content chunk is merged
+    into the last queued event if that is a chunk; otherwise the oldest progress event
+    is dropped (a later one supersedes it), then two neighbouring chunks are merged,
+    and only then is the oldest chunk dropped. Only neighbouring chunks merge, so
+    event ids stay in order for Last-Event-ID resumption. Merged chunks stop growing
+    at MAX_MERGED_CHUNK_CHARS.
+    Essential events are always kept; a run only produces a bounded number of them.
+    """
+
+    def __init__(self, max_events: int = 64):
+        """
+        Args:
+            max_events: Events buffered for a slow client before the overflow policy applies
+        """
+        self.max_events = max_events
+        self.closed = False
+        self._items: "deque[_Entry]" = deque()
+        self._signal = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, seq: int, event: Dict[str, Any]):
+        """
+        Queue an event without waiting, applying the overflow policy when full
+
+        Args:
+            seq: Sequence number of the event in its run
+            event: SSE event dict
+        """
+        kind = event["event"]
+        entry = _Entry(seq, event)
+        if len(self._items) >= self.max_events:
+            if kind == "content_chunk" and self._merge_into_tail(entry):
+                return
+            if not self._make_room() and kind not in ESSENTIAL_EVENT_TYPES:
+                metrics.increment("stream.events_dropped", labels={"event": kind})
+                return
+        self._items.append(entry)
+        self._signal.set()
+
+    def close(self):
+        """No more events will be queued"""
+        self.closed = True
+        self._signal.set()
+
+    async def get(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Wait for the next event
+
+        Returns:
+            Tuple: (seq, event), or None once the queue is closed and drained
+        """
+        while not self._items:
+            if self.closed:
+                return None
+            self._signal.clear()
+            await self._signal.wait()
+        return self._items.popleft().resolve()
+
+    def _merge_into_tail(self, entry: _Entry) -> bool:
+        """Fold a new chunk into the last queued event, if that is a chunk with room"""
+        # Only the very last entry: merging past a queued event would hand the merged
+        # entry a later id than the event behind it and break Last-Event-ID resumption
+        if not self._items or self._items[-1].kind != "content_chunk":
+            return False
+        tail = self._items[-1]
+        if tail.content_size() + entry.content_size() > MAX_MERGED_CHUNK_CHARS:
+            return False
+        tail.absorb(entry)
+        return True
+
+    def _make_room(self) -> bool:
+        """Free one slot: drop the oldest progress event, merge two queued chunks, or drop the oldest chunk"""
+        items = self._items
+        for index, entry in enumerate(items):
+            if entry.kind == "progress":
+                del items[index]
+                metrics.increment("stream.events_dropped", labels={"event": "progress"})
+                return True
+        for index in range(len(items) - 1):
+            first, second = items[index], items[index + 1]
+            if first.kind == "content_chunk" and second.kind == "content_chunk" \
+                    and first.content_size() + second.content_size() <= MAX_MERGED_CHUNK_CHARS:
+                first.absorb(second)
+                del items[index + 1]
+                return True
+        for index, entry in enumerate(items):
+            if entry.kind == "content_chunk":
+                del items[index]
+                metrics.increment("stream.events_dropped", labels={"event": "content_chunk"})
+                return True
+        return False
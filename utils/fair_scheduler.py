@@ -0,0 +1,152 @@
+# Author: Peng Fei
+# Weighted fair queuing of upstream LLM slots per client, with priority classes
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from utils.metrics import metrics
+
+# Lower index is served first
+PRIORITY_CLASSES = ("interactive", "bulk")
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """
+    Parse per-client weights from "client:weight,client:weight"
+
+    Args:
+        spec: Weight specification, e.g. "recruiting-ui:4,batch-import:1"
+
+    Returns:
+        Dict: Weight per client id
+    """
+    weights = {}
+    for item in (spec or "").split(","):
+        client_id, _, weight = item.strip().rpartition(":")
+        if client_id and weight:
+            weights[client_id] = float(weight)
+    return weights
+
+
+def client_label(client_id: str) -> str:
+    """Metrics label for a client; API keys are never exposed in clear text"""
+    if client_id.startswith("key:"):
+        return "key:" + hashlib.sha256(client_id[4:].encode("utf-8")).hexdigest()[:8]
+    return client_id
+
+
+class _Waiter:
+    __slots__ = ("client_id", "priority", "future", "enqueued_at")
+
+    def __init__(self, client_id: str, priority: str, future: asyncio.Future):
+        self.client_id = client_id
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class FairScheduler:
+    def __init__(self, slots: int, weights: Dict[str, float] = None, default_weight: float = 1.0):
+        """
+        Args:
+            slots: Pipeline runs allowed upstream at the same time
+            weights: Share of slots per client id, relative to default_weight
+            default_weight: Weight of clients without an explicit weight
+        """
+        self.slots = slots
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self._available = slots
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        # Virtual finish time of each client's latest request, and of the last one dispatched
+        self._last_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._depth: Dict[str, int] = {}
+
+    def _tag(self, client_id: str, cost: float) -> float:
+        """Virtual finish tag: a client's requests are spaced by cost / weight"""
+        weight = self.weights.get(client_id, self.default_weight)
+        finish = max(self._virtual_time, self._last_finish.get(client_id, 0.0)) + cost / weight
+        self._last_finish[client_id] = finish
+        return finish
+
+    async def acquire(self, client_id: str, priority: str = "interactive", cost: float = 1.0):
+        """
+        Wait for an upstream slot
+
+        Args:
+            client_id: API key or client id the request belongs to
+            priority: Priority class; interactive requests go ahead of bulk ones
+            cost: Relative size of the request, e.g. estimated tokens in thousands
+        """
+        rank = PRIORITY_CLASSES.index(priority) if priority in PRIORITY_CLASSES else len(PRIORITY_CLASSES) - 1
+        finish = self._tag(client_id, cost)
+        waiter = _Waiter(client_id, priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (rank, finish, next(self._sequence), waiter))
+        self._set_depth(client_id, 1)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up: hand the slot on
+                self.release()
+            else:
+                waiter.future.cancel()
+                self._set_depth(client_id, -1)
+            raise
+
+    def release(self):
+        """Return a slot and hand it to the next waiter"""
+        self._available += 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, priority: str = "interactive", cost: float = 1.0):
+        """Hold an upstream slot for the duration of the block"""
+        await self.acquire(client_id, priority, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def would_wait(self) -> bool:
+        """Whether a new request would have to queue"""
+        return self._available <= 0 or bool(self._heap)
+
+    def queue_depth(self, client_id: str = None) -> int:
+        """Requests waiting for a slot, for one client or in total"""
+        if client_id is None:
+            return sum(self._depth.values())
+        return self._depth.get(client_id, 0)
+
+    def _dispatch(self):
+        while self._available > 0 and self._heap:
+            _, finish, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.cancelled():
+                continue
+            self._available -= 1
+            self._virtual_time = max(self._virtual_time, finish)
+            self._set_depth(waiter.client_id, -1)
+            # Labelled by priority only: client ids fall back to addresses, so per-client series would be unbounded
+            metrics.observe("scheduler.wait_seconds", time.monotonic() - waiter.enqueued_at, labels={"priority": waiter.priority})
+            waiter.future.set_result(None)
+        if len(self._last_finish) > 10000:
+            # Tags at or behind virtual time carry no credit; forget idle clients
+            self._last_finish = {c: f for c, f in self._last_finish.items() if f > self._virtual_time}
+        metrics.set_gauge("scheduler.slots_in_use", self.slots - self._available)
+
+    def _set_depth(self, client_id: str, delta: int):
+        depth = self._depth.get(client_id, 0) + delta
+        if depth > 0:
+            self._depth[client_id] = depth
+        else:
+            self._depth.pop(client_id, None)
+        metrics.set_gauge("scheduler.queue_depth", self.queue_depth())
+        metrics.set_gauge("scheduler.clients_waiting", len(self._depth))
@@ -0,0 +1,393 @@
+# Author: Peng Fei
+# Asynchronous job queue for JD processing, with an optional SQLite-backed store
+
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from utils.metrics import metrics
+from utils.run_registry import RunRegistry, StreamRun
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+# What a completed job's result is: a full LLM parse, or one of the weaker results a run can complete with
+RESULT_FULL = "full"
+RESULT_PARTIAL = "partial"
+RESULT_DEGRADED = "degraded"
+RESULT_FAST = "fast"
+
+# Produces the SSE events (data JSON-encoded) for a job's text and options
+JobProcessor = Callable[..., AsyncGenerator[Dict[str, Any], None]]
+
+
+def result_kind(data: Dict[str, Any]) -> str:
+    """Kind of result a complete event's payload carries"""
+    if data.get("incomplete"):
+        return RESULT_PARTIAL
+    if data.get("degraded"):
+        return RESULT_DEGRADED
+    if data.get("mode") == "fast":
+        return RESULT_FAST
+    return RESULT_FULL
+
+
+class JobQueueFull(Exception):
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Job:
+    def __init__(self, job_id: str, jd_text: str, options: Dict[str, Any] = None):
+        self.job_id = job_id
+        self.jd_text = jd_text
+        self.options = options or {}
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        # Set with the result: RESULT_FULL, or RESULT_PARTIAL / RESULT_DEGRADED / RESULT_FAST
+        self.result_kind: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job, without the input text"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "result_kind": self.result_kind,
+            "error": self.error
+        }
+
+    def final_event(self) -> Dict[str, Any]:
+        """SSE event describing a finished job, for clients that attach after its run expired"""
+        if self.status == JOB_COMPLETED:
+            data = {
+                "step": "complete", "message": "Job description processing completed", "progress": 100,
+                "result": self.result, "result_kind": self.result_kind
+            }
+            return {"event": "complete", "data": json.dumps(data, ensure_ascii=False)}
+        data = {"step": "error", "message": self.error or "Job failed", "progress": 0, "error": True}
+        return {"event": "error", "data": json.dumps(data, ensure_ascii=False)}
+
+
+class SQLiteJobStore:
+    """Local persistent store so queued jobs survive a restart"""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT, jd_text TEXT, options TEXT, created_at REAL, "
+                "started_at REAL, finished_at REAL, result TEXT, error TEXT, result_kind TEXT)"
+            )
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+            if "result_kind" not in columns:
+                # Stores written before result kinds were recorded
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN result_kind TEXT")
+
+    def save(self, job: Job):
+        """Insert or update a job"""
+        self.save_row(self.to_row(job))
+
+    def save_row(self, row: tuple):
+        """Insert or update a job from a row made by to_row"""
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    @staticmethod
+    def to_row(job: Job) -> tuple:
+        """Serialize a job's current state into a row, independent of later changes to the job"""
+        return (
+            job.job_id, job.status, job.jd_text, json.dumps(job.options), job.created_at,
+            job.started_at, job.finished_at,
+            json.dumps(job.result, ensure_ascii=False) if job.result is not None else None, job.error,
+            job.result_kind
+        )
+
+    def load(self, job_id: str) -> Optional[Job]:
+        """Load one job"""
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def unfinished(self) -> List[Job]:
+        """Jobs that were queued or running when the process stopped, oldest first"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def delete_finished_before(self, timestamp: float):
+        """Drop finished jobs older than a timestamp"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (JOB_COMPLETED, JOB_FAILED, timestamp)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _to_job(row) -> Job:
+        job_id, status, jd_text, options, created_at, started_at, finished_at, result, error, result_kind = row
+        job = Job(job_id, jd_text, json.loads(options) if options else {})
+        job.status = status
+        job.created_at = created_at
+        job.started_at = started_at
+        job.finished_at = finished_at
+        job.result = json.loads(result) if result else None
+        job.error = error
+        job.result_kind = result_kind
+        return job
+
+
+class JobQueue:
+    def __init__(
+        self,
+        runs: RunRegistry,
+        processor: JobProcessor,
+        workers: int = 4,
+        max_jobs: int = 10000,
+        retention_seconds: float = 86400,
+        store_path: str = "",
+        max_queued: int = 1000,
+        max_queued_per_client: int = 100
+    ):
+        """
+        Args:
+            runs: Registry the jobs' event streams are published to
+            processor: Produces a job's events from its text and options
+            workers: Jobs processed concurrently
+            max_jobs: Finished jobs kept in memory
+            retention_seconds: How long finished jobs stay in the persistent store
+            store_path: SQLite file for the persistent queue; empty keeps jobs in memory only
+            max_queued: Jobs waiting for a worker before submissions are refused
+            max_queued_per_client: Unfinished jobs one client may have
+        """
+        self.runs = runs
+        self.processor = processor
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.retention_seconds = retention_seconds
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.store = SQLiteJobStore(store_path) if store_path else None
+        # One writer thread keeps SQLite writes off the event loop and in order
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store") if self.store else None
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # Unfinished jobs per client
+        self._per_client: Dict[str, int] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        # Workers waiting for a job rather than running one
+        self._idle_workers = set()
+        # Set at shutdown; workers take no new jobs from then on
+        self.draining = False
+
+    async def start(self):
+        """Start the workers and requeue jobs left unfinished by a previous process"""
+        unfinished = []
+        if self.store:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._store_executor, self.store.delete_finished_before, time.time() - self.retention_seconds)
+            unfinished = await loop.run_in_executor(self._store_executor, self.store.unfinished)
+        # Jobs accepted by a previous process are never refused
+        self._queue = asyncio.Queue(maxsize=max(self.max_queued, len(unfinished)))
+        for job in unfinished:
+            # Interrupted jobs start over from the beginning
+            job.status, job.started_at = JOB_QUEUED, None
+            self._enqueue(job)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def stop_accepting(self):
+        """
+        Stop taking queued jobs, at the start of a shutdown drain
+
+        Idle workers exit at once and busy ones after their current job. Running jobs
+        have their run's task set, so the drain waits for them like for any other run;
+        queued jobs stay in the persistent store for the next process.
+        """
+        self.draining = True
+        for task in self._idle_workers:
+            task.cancel()
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay in the persistent store"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self.store:
+            # Let pending writes finish before closing the connection
+            await asyncio.get_running_loop().run_in_executor(None, self._store_executor.shutdown)
+            self.store.close()
+
+    def submit(self, jd_text: str, options: Dict[str, Any] = None) -> Job:
+        """
+        Enqueue a job description for processing
+
+        Args:
+            jd_text: Job description text
+            options: Processing options passed to the processor
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            JobQueueFull: 429 when the client has too many unfinished jobs, 503 when the queue is full
+        """
+        client_id = (options or {}).get("client_id", "anonymous")
+        if self._per_client.get(client_id, 0) >= self.max_queued_per_client:
+            metrics.increment("jobs.rejected", labels={"reason": "client_limit"})
+            raise JobQueueFull(429, self.retry_after(), "Too many unfinished jobs for this client")
+        if self._queue.full():
+            metrics.increment("jobs.rejected", labels={"reason": "queue_full"})
+            raise JobQueueFull(503, self.retry_after(), "Job queue is full")
+        job = Job(uuid.uuid4().hex, jd_text, options)
+        self._enqueue(job)
+        metrics.increment("jobs.submitted")
+        return job
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely moved on by a few jobs: the typical run time, scaled by the backlog"""
+        run_seconds = metrics.percentile("jobs.run_seconds", 0.5) or 5.0
+        backlog = self._queue.qsize() / max(1, self.workers) if self._queue else 0
+        return min(300, max(1, math.ceil(run_seconds * max(1.0, backlog / 10))))
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Get a job from memory or, on the store thread, from the persistent store"""
+        job = self.jobs.get(job_id)
+        if job is None and self.store:
+            job = await asyncio.get_running_loop().run_in_executor(self._store_executor, self.store.load, job_id)
+        return job
+
+    def run_for(self, job_id: str) -> Optional[StreamRun]:
+        """Event stream of a queued, running or recently finished job"""
+        return self.runs.get(job_id)
+
+    def _enqueue(self, job: Job):
+        self.jobs[job.job_id] = job
+        client_id = job.options.get("client_id", "anonymous")
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        self._save(job)
+        run = self.runs.open(job.job_id)
+        run.publish(self._progress_event("queued", "Waiting for a worker...", 0))
+        self._queue.put_nowait(job)
+        metrics.set_gauge("jobs.queue_depth", self._queue.qsize())
+        self._evict()
+
+    async def _worker(self):
+        worker = asyncio.current_task()
+        while not self.draining:
+            self._idle_workers.add(worker)
+            try:
+                job = await self._queue.get()
+            finally:
+                self._idle_workers.discard(worker)
+            metrics.set_gauge("jobs.queue_depth", self._queue.qsize())
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        """Process one job, publishing its events to the job's run"""
+        job.status, job.started_at = JOB_RUNNING, time.time()
+        self._save(job)
+        metrics.observe("jobs.wait_seconds", job.started_at - job.created_at)
+
+        run = self.runs.get(job.job_id) or self.runs.open(job.job_id)
+        # A task of its own makes the job an active run that a shutdown drain waits for and can cut off
+        run.task = asyncio.create_task(self.runs.pump(run, self._track(job, self.processor(job.jd_text, **job.options))))
+        try:
+            await run.task
+        except asyncio.CancelledError:
+            self._interrupted(job)
+            raise
+        except Exception as e:
+            job.error = f"Error: {str(e)}"
+        finally:
+            self._job_done(job)
+
+        job.status = JOB_COMPLETED if job.result is not None and job.error is None else JOB_FAILED
+        job.finished_at = time.time()
+        self._save(job)
+        metrics.increment(f"jobs.{job.status}")
+        metrics.observe("jobs.run_seconds", job.finished_at - job.started_at)
+
+    async def _track(self, job: Job, events: AsyncGenerator[Dict[str, Any], None]) -> AsyncGenerator[Dict[str, Any], None]:
+        """Pass events through, recording the final result or error on the job"""
+        async for event in events:
+            if event["event"] == "complete":
+                data = json.loads(event["data"])
+                job.result, job.result_kind = data.get("result"), result_kind(data)
+            elif event["event"] == "error":
+                job.error = json.loads(event["data"]).get("message")
+            yield event
+
+    def _job_done(self, job: Job):
+        """Free the job's place in its client's limit"""
+        client_id = job.options.get("client_id", "anonymous")
+        count = self._per_client.get(client_id, 0) - 1
+        if count > 0:
+            self._per_client[client_id] = count
+        else:
+            self._per_client.pop(client_id, None)
+
+    def _interrupted(self, job: Job):
+        """Record a job cut off by shutdown: requeued by the next process when persisted, failed otherwise"""
+        if self.store:
+            job.status, job.started_at, job.result, job.result_kind = JOB_QUEUED, None, None, None
+        else:
+            job.status, job.finished_at = JOB_FAILED, time.time()
+            job.error = "Interrupted by server shutdown"
+        self._save(job)
+        metrics.increment("jobs.interrupted")
+
+    def _save(self, job: Job):
+        if self.store:
+            # Serialized here, since the job keeps changing while the write is pending;
+            # fire and forget: the single writer thread applies saves in order
+            self._store_executor.submit(self._write, job.job_id, SQLiteJobStore.to_row(job))
+
+    def _write(self, job_id: str, row: tuple):
+        try:
+            self.store.save_row(row)
+        except sqlite3.Error as e:
+            print(f"Job store write failed for {job_id}: {str(e)}")
+
+    def _evict(self):
+        """Forget the oldest finished jobs over capacity (they remain in the persistent store)"""
+        for job_id, job in list(self.jobs.items()):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if job.status in FINISHED_STATUSES:
+                del self.jobs[job_id]
+
+    @staticmethod
+    def _progress_event(step: str, message: str, progress: int) -> Dict[str, Any]:
+        data = {"step": step, "message": message, "progress": progress}
+        return {"event": "progress", "data": json.dumps(data, ensure_ascii=False)}
@@ -0,0 +1,82 @@
+# Author: Peng Fei
+# Incremental extraction of array items from a JSON document that is still streaming
+
+import json
+from typing import Any, List, Optional
+
+
+class JSONArrayItemParser:
+    """
+    Emit each element object of a named JSON array as soon as it closes
+
+    Feed the streamed text piece by piece. Only the first array under the key is
+    read; text before it (including code fences) and after it is ignored.
+    """
+
+    def __init__(self, key: str):
+        self._key = json.dumps(key)
+        self._buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add streamed text and return the items completed by it
+
+        Args:
+            text: Next piece of the streamed document
+
+        Returns:
+            List: Newly completed array items, in order
+        """
+        self._buffer += text
+        if not self._in_array and not self._find_array():
+            return []
+
+        items = []
+        buffer = self._buffer
+        while self._position < len(buffer) and not self.done:
+            char = buffer[self._position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._item_start = self._position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the array itself
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._item_start is not None:
+                        try:
+                            items.append(json.loads(buffer[self._item_start:self._position + 1]))
+                        except json.JSONDecodeError:
+                            pass
+                        self._item_start = None
+            self._position += 1
+        return items
+
+    def _find_array(self) -> bool:
+        key_at = self._buffer.find(self._key)
+        if key_at < 0:
+            return False
+        array_at = self._buffer.find("[", key_at + len(self._key))
+        if array_at < 0:
+            return False
+        self._in_array = True
+        self._position = array_at + 1
+        return True
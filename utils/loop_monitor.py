@@ -0,0 +1,116 @@
+# Author: Peng Fei
+# Event-loop lag monitor that reports blocking calls with the stack that caused them
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from utils.metrics import metrics
+
+
+class EventLoopBlockedError(RuntimeError):
+    """Raised in strict mode when the loop was blocked longer than allowed"""
+
+
+class LoopLagMonitor:
+    def __init__(self, interval_ms: float = 50, threshold_ms: float = 200, fail_ms: float = 0):
+        """
+        Args:
+            interval_ms: How often the loop's scheduling delay is sampled
+            threshold_ms: Blocking time after which the loop thread's stack is logged
+            fail_ms: Strict mode; blocking longer than this is recorded as a violation (0 disables)
+        """
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.fail = fail_ms / 1000
+        # Most recent strict-mode violations
+        self.violations: Deque[Dict[str, Any]] = deque(maxlen=100)
+        self._heartbeat = time.monotonic()
+        self._last_stack: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stopped = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start sampling on the running loop, with a watchdog thread that catches blocking as it happens"""
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop sampling and the watchdog"""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+
+    def raise_if_blocked(self):
+        """
+        Fail when strict mode recorded a blocked loop
+
+        Raises:
+            EventLoopBlockedError: With the longest block and the stack that caused it
+        """
+        if not self.violations:
+            return
+        worst = max(self.violations, key=lambda violation: violation["lag_ms"])
+        raise EventLoopBlockedError(
+            f"Event loop blocked {len(self.violations)} time(s), longest {worst['lag_ms']:.0f} ms "
+            f"(limit {self.fail * 1000:.0f} ms):\n{worst['stack'] or '(stack not captured)'}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Recent lag percentiles in milliseconds, for health reporting"""
+        summary = metrics.summary("event_loop.lag_seconds") or {}
+        to_ms = lambda seconds: round(seconds * 1000, 1) if seconds is not None else None
+        return {
+            "lag_ms_p50": to_ms(summary.get("p50")),
+            "lag_ms_p95": to_ms(summary.get("p95")),
+            "lag_ms_max": to_ms(summary.get("max")),
+            "blocked": int(metrics.counter("event_loop.blocked"))
+        }
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._heartbeat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            metrics.observe("event_loop.lag_seconds", lag)
+            if self.fail and lag > self.fail:
+                self.violations.append({"lag_ms": lag * 1000, "stack": self._last_stack, "at": time.time()})
+            self._last_stack = None
+
+    def _watch(self):
+        """Runs in its own thread, so it can look at the loop while the loop is stuck"""
+        capture_after = min(self.threshold, self.fail) if self.fail else self.threshold
+        check_every = max(0.005, capture_after / 4)
+        captured, reported = None, None
+        while not self._stopped.wait(check_every):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < capture_after:
+                continue
+            if captured != heartbeat:
+                # The frames the loop thread is executing right now are the blocking ones
+                captured = heartbeat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                self._last_stack = "".join(traceback.format_stack(frame)) if frame else ""
+            if stalled >= self.threshold and reported != heartbeat:
+                reported = heartbeat
+                metrics.increment("event_loop.blocked")
+                print(
+                    f"Event loop blocked for more than {stalled * 1000:.0f} ms; loop thread stack:\n{self._last_stack}",
+                    file=sys.stderr
+                )
@@ -0,0 +1,113 @@
+# Author: Peng Fei
+# In-process metrics registry for counters, gauges and latency summaries
+
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+# Number of recent observations kept per summary for percentile estimates
+SUMMARY_WINDOW = 1024
+
+
+def _metric_key(name: str, labels: Optional[Dict[str, Any]] = None) -> str:
+    """Build a flat metric key such as name{client=a,stage=parse}"""
+    if not labels:
+        return name
+    label_text = ",".join(f"{key}={labels[key]}" for key in sorted(labels))
+    return f"{name}{{{label_text}}}"
+
+
+class _Summary:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.recent: Deque[float] = deque(maxlen=SUMMARY_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, _Summary] = {}
+
+    def increment(self, name: str, value: float = 1.0, labels: Optional[Dict[str, Any]] = None):
+        """Increase a counter"""
+        with self._lock:
+            self._counters[_metric_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[_metric_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        """Record one observation in a summary (latency, size, ratio)"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary()
+            summary.observe(value)
+
+    def counter(self, name: str, labels: Optional[Dict[str, Any]] = None) -> float:
+        """Get the current value of a counter"""
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0.0)
+
+    def summary(self, name: str, labels: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Get count, sum and percentiles of a summary"""
+        with self._lock:
+            summary = self._summaries.get(_metric_key(name, labels))
+            return summary.to_dict() if summary else None
+
+    def percentile(self, name: str, fraction: float, labels: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """Get a percentile of the recent observations of a summary"""
+        with self._lock:
+            summary = self._summaries.get(_metric_key(name, labels))
+            return summary.percentile(fraction) if summary else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a point-in-time copy of all metrics
+
+        Returns:
+            Dict: Counters, gauges and summaries keyed by metric name
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {key: summary.to_dict() for key, summary in self._summaries.items()},
+            }
+
+
+# Shared registry used across the service
+metrics = MetricsRegistry()
@@ -0,0 +1,156 @@
+# Author: Peng Fei
+# Bounded store of processed results, keyed by content hash, with near-duplicate lookup
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils.similarity_index import SimilarityIndex, minhash
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the (compacted) input text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, max_entries: int = 10000, store_path: str = ""):
+        """
+        Args:
+            max_entries: Results kept; the least recently used are evicted first
+            store_path: SQLite file results are saved to and loaded from; empty keeps them in memory only
+        """
+        self.max_entries = max_entries
+        self.store_path = store_path
+        self.similarity_index = SimilarityIndex(max_entries=max_entries)
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if store_path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored entry for a content hash, or None"""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                self._results.move_to_end(key)
+            return entry
+
+    def put(self, text: str, requirements: Dict[str, Any], partial: bool = False) -> str:
+        """
+        Store the requirements extracted from a text and index it for similarity lookups
+
+        Args:
+            text: Compacted input text
+            requirements: Extracted requirements structure
+            partial: The extraction was cut off; it never replaces a complete result
+
+        Returns:
+            str: Content hash the result is stored under
+        """
+        key = content_hash(text)
+        signature = minhash(text)
+        with self._lock:
+            existing = self._results.get(key)
+            if partial and existing is not None and not existing.get("partial"):
+                return key
+            entry = {"content_hash": key, "requirements": requirements, "stored_at": time.time(), "partial": partial}
+            # Indexed under the same lock, so a concurrent put cannot evict the key before it is indexed
+            for old_key in self._insert(key, entry):
+                self.similarity_index.remove(old_key)
+            self.similarity_index.add(key, signature)
+        return key
+
+    def save(self) -> int:
+        """
+        Write all results to the SQLite store, replacing its previous contents
+
+        Returns:
+            int: Number of results saved
+        """
+        if not self.store_path:
+            return 0
+        with self._lock:
+            entries = list(self._results.values())
+        rows = []
+        for entry in entries:
+            signature = self.similarity_index.signature(entry["content_hash"])
+            if signature is not None:
+                rows.append((
+                    entry["content_hash"], json.dumps(entry["requirements"], ensure_ascii=False),
+                    entry["stored_at"], int(entry.get("partial", False)), signature.tobytes()
+                ))
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM results")
+                connection.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?)", rows)
+        finally:
+            connection.close()
+        return len(rows)
+
+    def _insert(self, key: str, entry: Dict[str, Any]) -> list:
+        """Store an entry as the most recent one; returns the keys evicted to make room"""
+        self._results[key] = entry
+        self._results.move_to_end(key)
+        evicted = []
+        while len(self._results) > self.max_entries:
+            evicted.append(self._results.popitem(last=False)[0])
+        return evicted
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.store_path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "content_hash TEXT PRIMARY KEY, requirements TEXT, stored_at REAL, partial INTEGER, signature BLOB)"
+        )
+        return connection
+
+    def _load(self):
+        """Restore results saved by a previous process, oldest first so recency order is kept"""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT * FROM results ORDER BY stored_at DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+        finally:
+            connection.close()
+        for key, requirements, stored_at, partial, signature in reversed(rows):
+            entry = {
+                "content_hash": key, "requirements": json.loads(requirements),
+                "stored_at": stored_at, "partial": bool(partial)
+            }
+            self._insert(key, entry)
+            self.similarity_index.add(key, array("I", signature))
+
+    def find(self, text: str, min_similarity: float) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored result for the same or a near-duplicate text
+
+        Args:
+            text: Compacted input text
+            min_similarity: Smallest accepted estimated Jaccard similarity
+
+        Returns:
+            Dict: Stored entry plus "similarity" and "exact", or None
+        """
+        entry = self.get(content_hash(text))
+        if entry is not None:
+            return dict(entry, similarity=1.0, exact=True)
+
+        match = self.similarity_index.nearest(minhash(text), min_similarity)
+        if match is None:
+            return None
+        entry = self.get(match[0])
+        # A cut-off extraction of another text is too weak a seed
+        if entry is None or entry.get("partial"):
+            return None
+        return dict(entry, similarity=match[1], exact=False)
@@ -0,0 +1,163 @@
+# Author: Peng Fei
+# Registry of streaming runs with bounded replay buffers for SSE resumption
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, Tuple
+
+from utils.event_queue import BoundedEventQueue
+
+
+def format_event_id(run_id: str, seq: int) -> str:
+    """Build the SSE event id for an event of a run"""
+    return f"{run_id}:{seq}"
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[str, int]]:
+    """
+    Split a Last-Event-ID value into run id and sequence number
+
+    Args:
+        event_id: Value of the Last-Event-ID header
+
+    Returns:
+        Tuple: (run_id, seq), or None if the id is not one of ours
+    """
+    run_id, _, seq = (event_id or "").strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        return None
+    return run_id, int(seq)
+
+
+class StreamRun:
+    def __init__(self, run_id: str, max_events: int, max_queued_events: int = 64):
+        self.run_id = run_id
+        self.events = deque(maxlen=max_events)
+        self.max_queued_events = max_queued_events
+        self.last_seq = 0
+        self.done = False
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: Set[BoundedEventQueue] = set()
+
+    def publish(self, event: Dict[str, Any]):
+        """Append an event to the replay buffer and hand it to every subscriber's queue"""
+        self.last_seq += 1
+        self.events.append((self.last_seq, event))
+        for queue in self._subscribers:
+            queue.put(self.last_seq, event)
+
+    def finish(self):
+        """Mark the run as finished"""
+        self.done = True
+        self.finished_at = time.monotonic()
+        for queue in self._subscribers:
+            queue.close()
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """
+        Replay buffered events after a sequence number, then follow the live run
+
+        Each subscriber reads from its own bounded queue, so a slow client never
+        holds up the producer and only costs max_queued_events of memory.
+
+        Args:
+            after_seq: Last sequence number the client has already received
+
+        Yields:
+            Tuple: (seq, event) for every missed and future event
+        """
+        queue = BoundedEventQueue(self.max_queued_events)
+        for seq, event in self.events:
+            if seq > after_seq:
+                queue.put(seq, event)
+        if self.done:
+            queue.close()
+        else:
+            self._subscribers.add(queue)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self._subscribers.discard(queue)
+
+
+class RunRegistry:
+    def __init__(
+        self,
+        ttl_seconds: float = 300,
+        max_events_per_run: int = 256,
+        max_runs: int = 1000,
+        max_queued_events: int = 64
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_events_per_run = max_events_per_run
+        self.max_runs = max_runs
+        self.max_queued_events = max_queued_events
+        self.runs: "OrderedDict[str, StreamRun]" = OrderedDict()
+
+    def open(self, run_id: str = None) -> StreamRun:
+        """
+        Register a run whose events will be published later
+
+        Args:
+            run_id: Optional run identifier, generated when omitted
+
+        Returns:
+            StreamRun: The registered run; clients may subscribe right away
+        """
+        self._evict()
+        run = StreamRun(run_id or uuid.uuid4().hex, self.max_events_per_run, self.max_queued_events)
+        self.runs[run.run_id] = run
+        return run
+
+    def start(self, events: AsyncGenerator[Dict[str, Any], None], run_id: str = None) -> StreamRun:
+        """
+        Start a run that drains the event generator in the background,
+        independently of any client connection
+
+        Args:
+            events: Producer of the run's events
+            run_id: Optional run identifier, generated when omitted
+
+        Returns:
+            StreamRun: The registered run
+        """
+        run = self.open(run_id)
+        run.task = asyncio.create_task(self.pump(run, events))
+        return run
+
+    def get(self, run_id: str) -> Optional[StreamRun]:
+        """Get an in-flight or recently finished run"""
+        self._evict()
+        return self.runs.get(run_id)
+
+    def active(self) -> List[StreamRun]:
+        """Runs whose producer is still running"""
+        return [run for run in self.runs.values() if run.task is not None and not run.done]
+
+    async def pump(self, run: StreamRun, events: AsyncGenerator[Dict[str, Any], None]):
+        """Publish every event of a generator to a run, then finish it"""
+        try:
+            async for event in events:
+                run.publish(event)
+        finally:
+            run.finish()
+
+    def _evict(self):
+        """Drop finished runs past their TTL, then the oldest finished runs over capacity"""
+        now = time.monotonic()
+        for run_id, run in list(self.runs.items()):
+            if run.done and now - run.finished_at > self.ttl_seconds:
+                del self.runs[run_id]
+        for run_id, run in list(self.runs.items()):
+            if len(self.runs) < self.max_runs:
+                break
+            if run.done:
+                del self.runs[run_id]
@@ -4,6 +4,7 @@
 import uuid
 from datetime import datetime
 from typing import Dict
+from utils.conversation_state import empty_requirements
 
 class SessionManager:
     def __init__(self):
@@ -35,4 +36,14 @@ class SessionManager:
         if session_id in self.sessions:
             self.sessions[session_id]["status"] = "closed"
             return True
-        return False 
\ No newline at end of file
+        return False
+    
+    def get_conversation(self, session_id: str) -> Dict:
+        """Get the conversation state of a session, starting one if needed"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return {}
+        return session["data"].setdefault("conversation", {
+            "requirements": empty_requirements(),
+            "turns": 0
+        })
@@ -0,0 +1,130 @@
+# Author: Peng Fei
+# MinHash signatures and an LSH-banded index for near-duplicate job descriptions
+
+import hashlib
+import re
+import struct
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+SHINGLE_SIZE = 3
+# Each salt yields 16 hash values from one 64-byte BLAKE2b digest
+SIGNATURE_SALTS = (b"jd-minhash-0", b"jd-minhash-1")
+SIGNATURE_SIZE = 16 * len(SIGNATURE_SALTS)
+DIGEST_VALUES = struct.Struct("<16I")
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str) -> set:
+    """
+    Word 3-grams of a text
+
+    Numbers are kept: "3+ years" and "8+ years" are different requirements.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> array:
+    """
+    MinHash signature of a text over word shingles
+
+    Args:
+        text: Text to fingerprint
+
+    Returns:
+        array: SIGNATURE_SIZE unsigned 32-bit values
+    """
+    rows = []
+    for shingle in shingles(text):
+        encoded = shingle.encode("utf-8")
+        values = ()
+        for salt in SIGNATURE_SALTS:
+            values += DIGEST_VALUES.unpack(hashlib.blake2b(encoded, digest_size=64, salt=salt).digest())
+        rows.append(values)
+    return array("I", map(min, zip(*rows)))
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+
+class SimilarityIndex:
+    def __init__(self, max_entries: int = 100000, bands: int = 8):
+        """
+        Args:
+            max_entries: Signatures kept; the oldest are evicted first
+            bands: LSH bands; more bands find less similar pairs but cost memory
+        """
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = SIGNATURE_SIZE // bands
+        # Insertion-ordered, so the first key is the oldest
+        self._signatures: Dict[str, array] = {}
+        self._buckets: Dict[int, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: array) -> List[int]:
+        return [hash((band,) + tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def add(self, key: str, signature: array):
+        """Index a signature under a key, replacing any previous one"""
+        with self._lock:
+            self._remove(key)
+            self._signatures[key] = signature
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, []).append(key)
+            while len(self._signatures) > self.max_entries:
+                self._remove(next(iter(self._signatures)))
+
+    def signature(self, key: str) -> Optional[array]:
+        """Indexed signature of a key, or None"""
+        with self._lock:
+            return self._signatures.get(key)
+
+    def remove(self, key: str):
+        """Drop a key from the index"""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def nearest(self, signature: array, min_similarity: float) -> Optional[Tuple[str, float]]:
+        """
+        Find the most similar indexed text at or above min_similarity
+
+        Only entries sharing a whole band are compared, so lookups touch a handful of
+        candidates regardless of index size.
+
+        Args:
+            signature: Signature to look up
+            min_similarity: Smallest accepted estimated Jaccard similarity
+
+        Returns:
+            Tuple: (key, similarity) of the best match, or None
+        """
+        best = None
+        with self._lock:
+            candidates = {key for band_key in self._band_keys(signature) for key in self._buckets.get(band_key, ())}
+            for key in candidates:
+                score = similarity(signature, self._signatures[key])
+                if score >= min_similarity and (best is None or score > best[1]):
+                    best = (key, score)
+        return best
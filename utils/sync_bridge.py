@@ -0,0 +1,43 @@
+# Author: Peng Fei
+# Consume blocking iterators from async code without stalling the event loop
+
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncGenerator, Iterable, Optional, TypeVar
+
+from utils.usage_tracker import in_current_context
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def iterate_in_thread(iterable: Iterable[T], executor: Optional[Executor] = None) -> AsyncGenerator[T, None]:
+    """
+    Pull each item of a blocking iterator (such as a synchronous completion stream) in a worker thread
+
+    Args:
+        iterable: Blocking iterable
+        executor: Executor to wait in; the loop's default executor when omitted
+
+    Yields:
+        Items of the iterable, in order
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    step = in_current_context(next)
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, step, iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        # Stops the upstream generation when the consumer gives up early
+        close = getattr(iterable, "close", None) or getattr(iterator, "close", None)
+        if close:
+            try:
+                close()
+            except ValueError:
+                # Cancelled while a worker thread is still advancing the generator
+                pass
@@ -0,0 +1,236 @@
+# Author: Peng Fei
+# Token usage and cost accounting per request, session and client
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils.fair_scheduler import client_label
+from utils.metrics import metrics
+from utils.profiler import run_attributed
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar("usage_scope", default=None)
+
+
+def in_current_context(function: Callable) -> Callable:
+    """
+    Bind a function to the caller's context, so calls made from worker threads
+    are still attributed to the current request, in usage and in its profile
+
+    Args:
+        function: Function to run in an executor or thread pool
+
+    Returns:
+        Callable: Wrapper that runs the function in a copy of the current context
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # Each call gets its own copy; a context cannot be entered by two threads at once
+        return context.copy().run(run_attributed, function, *args, **kwargs)
+    return run
+
+
+class UsageTotals:
+    __slots__ = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd")
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost_usd = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost_usd: float, calls: int = 1, cached_tokens: int = 0):
+        self.calls += calls
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.cost_usd += cost_usd
+
+    def merge(self, other: "UsageTotals"):
+        self.add(other.prompt_tokens, other.completion_tokens, other.cost_usd, other.calls, other.cached_tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6)
+        }
+
+
+class UsageScope:
+    """Usage of one request, filled in by every model call made while it is current"""
+
+    def __init__(self, request_id: str, client: Optional[str], session_id: Optional[str]):
+        self.request_id = request_id
+        self.client = client
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.totals = UsageTotals()
+        self.by_stage: Dict[str, UsageTotals] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            self.totals.to_dict(),
+            request_id=self.request_id,
+            client=self.client,
+            session_id=self.session_id,
+            by_stage={stage: totals.to_dict() for stage, totals in self.by_stage.items()}
+        )
+
+
+class UsageTracker:
+    def __init__(self, max_keys: int = 10000, log_path: str = ""):
+        """
+        Args:
+            max_keys: Clients and sessions kept in memory each; the least recently used are dropped
+            log_path: JSON Lines file finished requests are flushed to; empty keeps aggregates only
+        """
+        self.max_keys = max_keys
+        self.log_path = log_path
+        self.totals = UsageTotals()
+        self.by_client: "OrderedDict[str, UsageTotals]" = OrderedDict()
+        self.by_session: "OrderedDict[str, UsageTotals]" = OrderedDict()
+        self._pending = deque(maxlen=max_keys)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def scope(self, client_id: str = None, session_id: str = None) -> Iterator[UsageScope]:
+        """
+        Attribute model calls made inside the block to one request
+
+        Args:
+            client_id: Client the request belongs to
+            session_id: Conversation session, when already known
+
+        Yields:
+            UsageScope: The request's running usage
+        """
+        scope = UsageScope(uuid.uuid4().hex, client_label(client_id) if client_id else None, session_id)
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            try:
+                _current_scope.reset(token)
+            except ValueError:
+                # Generator finalized from another context
+                pass
+            if self.log_path:
+                with self._lock:
+                    self._pending.append(dict(scope.to_dict(), started_at=scope.started_at, finished_at=time.time()))
+
+    def current(self) -> Optional[UsageScope]:
+        """Usage scope of the current request, if any"""
+        return _current_scope.get()
+
+    def set_session(self, session_id: str):
+        """Attribute the current request, including calls already made, to a session"""
+        scope = _current_scope.get()
+        if scope is None or scope.session_id == session_id:
+            return
+        scope.session_id = session_id
+        with self._lock:
+            self._totals_for(self.by_session, session_id).merge(scope.totals)
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cost_usd: Optional[float],
+        cached_tokens: int = 0
+    ):
+        """
+        Account one model call to the current request, its session and client, and the totals
+
+        Args:
+            stage: Pipeline stage of the call
+            model: Model that served it
+            prompt_tokens: Prompt tokens used
+            completion_tokens: Completion tokens used
+            cost_usd: Cost of the call, None when the model has no known price
+            cached_tokens: Prompt tokens served from the provider's prompt cache
+        """
+        usage = (prompt_tokens, completion_tokens, cost_usd or 0.0, 1, cached_tokens)
+        scope = _current_scope.get()
+        with self._lock:
+            self.totals.add(*usage)
+            if scope is None:
+                return
+            scope.totals.add(*usage)
+            stage_totals = scope.by_stage.get(stage)
+            if stage_totals is None:
+                stage_totals = scope.by_stage[stage] = UsageTotals()
+            stage_totals.add(*usage)
+            if scope.client:
+                self._totals_for(self.by_client, scope.client).add(*usage)
+            if scope.session_id:
+                self._totals_for(self.by_session, scope.session_id).add(*usage)
+
+    def report(self, client: str = None, session_id: str = None) -> Dict[str, Any]:
+        """
+        Aggregated usage, overall or for one client or session
+
+        Args:
+            client: Client id or label to report on
+            session_id: Session to report on
+
+        Returns:
+            Dict: Totals, plus per-client usage when no filter is given
+        """
+        with self._lock:
+            if session_id:
+                totals = self.by_session.get(session_id)
+                return {"session_id": session_id, "usage": totals.to_dict() if totals else None}
+            if client:
+                totals = self.by_client.get(client) or self.by_client.get(client_label(client))
+                return {"client": client, "usage": totals.to_dict() if totals else None}
+            return {
+                "totals": self.totals.to_dict(),
+                "clients": {label: totals.to_dict() for label, totals in self.by_client.items()},
+                "sessions_tracked": len(self.by_session)
+            }
+
+    def flush(self) -> int:
+        """
+        Append finished requests to the usage log and publish totals as metrics
+
+        Returns:
+            int: Number of request records written
+        """
+        with self._lock:
+            records = list(self._pending)
+            self._pending.clear()
+            totals = self.totals.to_dict()
+        for key in ("prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"):
+            metrics.set_gauge(f"usage.{key}", totals[key])
+        if records and self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as log:
+                for record in records:
+                    log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(records)
+
+    def _totals_for(self, table: "OrderedDict[str, UsageTotals]", key: str) -> UsageTotals:
+        totals = table.get(key)
+        if totals is None:
+            totals = table[key] = UsageTotals()
+            if len(table) > self.max_keys:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return totals
+
+
+# Shared tracker fed by every model call
+usage_tracker = UsageTracker()